@@ -1,68 +1,377 @@
 from flask import Flask, request, jsonify
+from contextlib import contextmanager
 import sys
 import os
+if sys.version_info < (3, 10):
+    sys.exit("The Chronicle NPC server needs Python 3.10 or newer")
 # Disable ChromaDB telemetry FIRST
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
-from src.npc_generator import NPCGenerator
-from src.dialogue_engine import DialogueEngine
+# Only light imports here - LangChain, Chroma and the stores load in the background
+from config.settings import STARTUP_WARM_ON_BOOT, MODEL_WARMUP_ON_START, TRACE_RECORD_PATH
 from models.npc_model import DialogueContext
+from src.service_registry import ServiceRegistry
+from src.request_profiler import RequestProfiler
 app = Flask(__name__)
-# Initialize your NPC system
-npc_generator = NPCGenerator()
-dialogue_engine = DialogueEngine()
-@app.route('/create_npc', methods=['POST'])
-def create_npc():
-    """Create a new NPC - Unity hits this endpoint"""
-    data = request.json
+if TRACE_RECORD_PATH:
+    from src.traffic_trace import TraceRecorder
+    TraceRecorder(TRACE_RECORD_PATH).install(app)
+RequestProfiler().install(app)  # no-op unless PROFILE_REQUESTS / PROFILE_ALLOW_HEADER
+
+def _build_storage(_):
+    from src.npc_storage import NPCStorage
+    return NPCStorage()
+
+def _build_npc_generator(registry):
+    from src.npc_generator import NPCGenerator
+    return NPCGenerator(storage=registry.services['storage'])
+
+def _build_dialogue_engine(registry):
+    from src.dialogue_engine import DialogueEngine
+    return DialogueEngine(storage=registry.services['storage'])
+
+def _build_dialogue_retention(registry):
+    from src.dialogue_retention import DialogueRetention, build_summarizer
+    retention = DialogueRetention(registry.services['storage'],
+                                  summarizer=build_summarizer(registry.services['dialogue_engine'].router))
+    retention.start_background()
+    return retention
+
+def _build_shards(_):
+    from src.shard_manager import ShardManager
+    from src.npc_generator import NPCGenerator
+    from src.dialogue_engine import DialogueEngine
+    from src.dialogue_retention import DialogueRetention, RetentionPolicy, build_summarizer
+
+    def open_slot(storage):
+        engine = DialogueEngine(storage=storage)
+        # Each slot archives inside its own directory, so snapshots carry their cold history
+        retention = DialogueRetention(storage,
+                                      policy=RetentionPolicy(archive_dir=os.path.join(storage.data_dir, "archive")),
+                                      summarizer=build_summarizer(engine.router))
+        retention.start_background()  # stopped by ShardManager when the shard closes
+        return {
+            'storage': storage,
+            'npc_generator': NPCGenerator(storage=storage),
+            'dialogue_engine': engine,
+            'dialogue_retention': retention
+        }
+    return ShardManager(on_open=open_slot)
+
+def _warm_models(_):
+    from src.model_warmup import ModelWarmup
+    return ModelWarmup().warm()
+
+# Initialize your NPC system (deferred; one storage shared by every service)
+services = ServiceRegistry()
+services.add_import('langchain_ollama')
+services.add_import('langchain_chroma')
+services.add_import('src.npc_storage')
+services.add_service('storage', _build_storage)
+services.add_service('npc_generator', _build_npc_generator)
+services.add_service('dialogue_engine', _build_dialogue_engine)
+services.add_service('dialogue_retention', _build_dialogue_retention)
+services.add_service('shards', _build_shards)
+if MODEL_WARMUP_ON_START:
+    services.add_service('model_warmup', _warm_models)
+if STARTUP_WARM_ON_BOOT:
+    services.start()
+
+@contextmanager
+def slot_services(save_slot=None):
+    """Service lookup for a save slot's shard, or the default storage when no slot is given"""
+    if not save_slot:
+        yield services.get
+        return
+    with services.get('shards').use(save_slot) as shard:
+        yield shard.services.__getitem__
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness - the process is up and serving requests"""
+    return jsonify({'success': True, 'status': 'alive'})
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness - storage and models are warm; 503 until then"""
+    services.start()
+    status = services.status()
+    status['models'] = services.services.get('model_warmup')
+    return jsonify({'success': status['ready'], **status}), 200 if status['ready'] else 503
+@app.route('/warm_models', methods=['POST'])
+def warm_models():
+    """Reload and pin the models, e.g. after Ollama was restarted or idled out"""
     try:
-        npc_id = npc_generator.generate_npc(
+        from src.model_warmup import ModelWarmup
+        report = ModelWarmup().warm()
+        return jsonify({'success': report['all_warm'], 'report': report})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+@app.route('/ollama_endpoints', methods=['GET'])
+def ollama_endpoints():
+    """Routing stats per Ollama endpoint; ?check=1 probes them first"""
+    try:
+        from src.ollama_pool import get_llm_pool, get_embedding_pool
+        pools = {'llm': get_llm_pool(), 'embedding': get_embedding_pool()}
+        if request.args.get('check'):
+            stats = {name: pool.check_health() for name, pool in pools.items()}
+        else:
+            stats = {name: pool.stats() for name, pool in pools.items()}
+        return jsonify({'success': True, **stats})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+@app.route('/model_tiers', methods=['GET'])
+def model_tiers():
+    """Per-tier model, call count and latency percentiles"""
+    try:
+        stats = services.get('dialogue_engine').get_model_tier_stats()
+        return jsonify({'success': True, 'tiers': stats})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Hit rates of the search, summary and ambient caches (?save_slot= for a slot's shard)"""
+    try:
+        with slot_services(request.args.get('save_slot')) as get:
+            caches = {
+                'search_npcs': get('storage').search_cache.stats(),
+                'npc_summary': get('npc_generator').summary_cache.stats(),
+                'ambient_dialogue': get('dialogue_engine').ambient.cache.stats()
+            }
+        return jsonify({'success': True, 'caches': caches})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+@app.route('/debug/memory', methods=['GET'])
+def debug_memory():
+    """Process memory and per-subsystem footprint; ?types=1 adds live object counts by type"""
+    try:
+        from src.memory_report import process_memory, object_type_counts, get_tracemalloc_tracker
+        from src.npc_locks import npc_lock_stats
+        subsystems = {}
+        # Only services that already started, so this never blocks on warm-up
+        for name in ('storage', 'npc_generator', 'dialogue_engine', 'shards'):
+            service = services.services.get(name)
+            if hasattr(service, 'memory_usage'):
+                subsystems[name] = service.memory_usage()
+        subsystems['npc_locks'] = npc_lock_stats()
+        from src.dialogue_session import get_dialogue_sessions
+        subsystems['dialogue_sessions'] = get_dialogue_sessions().memory_usage()
+        report = {
+            'process': process_memory(),
+            'subsystems': subsystems,
+            'tracemalloc': get_tracemalloc_tracker().status()
+        }
+        if request.args.get('types'):
+            report['object_types'] = object_type_counts(int(request.args.get('limit', 25)))
+        return jsonify({'success': True, **report})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+@app.route('/debug/memory/tracemalloc', methods=['POST'])
+def debug_tracemalloc():
+    """tracemalloc control: action = start | snapshot | top | diff | stop"""
+    try:
+        from src.memory_report import get_tracemalloc_tracker
+        tracker = get_tracemalloc_tracker()
+        data = request.json or {}
+        action = data.get('action', 'snapshot')
+        limit = int(data.get('limit', 20))
+        group_by = data.get('group_by', 'lineno')
+        if action == 'start':
+            return jsonify({'success': True, **tracker.start(data.get('frames'))})
+        if action == 'stop':
+            return jsonify({'success': True, **tracker.stop()})
+        if action == 'snapshot':
+            name = tracker.snapshot(data.get('name'))
+            return jsonify({'success': True, 'snapshot': name, 'top': tracker.top(name, limit, group_by)})
+        if action == 'top':
+            return jsonify({'success': True, 'top': tracker.top(data['name'], limit, group_by)})
+        if action == 'diff':
+            diff = tracker.diff(data['base'], data.get('target'), limit, group_by)
+            return jsonify({'success': True, 'base': data['base'], 'diff': diff})
+        return jsonify({'success': False, 'error': f"Unknown action '{action}'"})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def _respond(handler, data):
+    """Run an operation and wrap its result the way every endpoint replies"""
+    try:
+        return jsonify({'success': True, **handler(data or {})})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def _create_npc(data):
+    with slot_services(data.get('save_slot')) as get:
+        npc_id = get('npc_generator').generate_npc(
             data['character_params'],
             data['world_settings'],
             data['behavior_params'],
             data.get('custom_prompt', '')
         )
-        return jsonify({'success': True, 'npc_id': npc_id})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
-@app.route('/talk_to_npc', methods=['POST'])
-def talk_to_npc():
-    """Talk to an NPC - Unity hits this endpoint"""
-    data = request.json
-    try:
-        context = DialogueContext(
-            dialogue_type=data.get('dialogue_type', 'GREETING'),
-            dialogue_stage=data.get('dialogue_stage', 'FIRST_MEET'),
-            mood=data.get('mood', 'Neutral'),
-            player_reputation=data.get('player_reputation', 'Unknown'),
-            quest_state=data.get('quest_state', 'Not Given')
-        )
-        response = dialogue_engine.generate_dialogue(
+    return {'npc_id': npc_id}
+
+def _talk_to_npc(data):
+    context = DialogueContext(
+        dialogue_type=data.get('dialogue_type', 'GREETING'),
+        dialogue_stage=data.get('dialogue_stage', 'FIRST_MEET'),
+        mood=data.get('mood', 'Neutral'),
+        player_reputation=data.get('player_reputation', 'Unknown'),
+        quest_state=data.get('quest_state', 'Not Given')
+    )
+    with slot_services(data.get('save_slot')) as get:
+        response = get('dialogue_engine').generate_dialogue(
             data['npc_id'],
             data['player_input'],
             context
         )
-        return jsonify({'success': True, 'response': response})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+    return {'response': response}
+
+def _ambient_dialogue(data):
+    with slot_services(data.get('save_slot')) as get:
+        return get('dialogue_engine').generate_ambient_dialogue(
+            data['npc_ids'],
+            data.get('scene_context', {}),
+            mode=data.get('mode', 'concurrent'),
+            persist=data.get('persist', False)
+        )
+
+def _update_npc(data):
+    updates = data['updates'] if 'updates' in data else [data]
+    # Several patches for the same NPC are merged in arrival order
+    patches = {}
+    for update in updates:
+        npc_patch = patches.setdefault(update['npc_id'], {})
+        for section, values in update['patch'].items():
+            npc_patch.setdefault(section, {}).update(values)
+    with slot_services(data.get('save_slot')) as get:
+        return {'results': get('storage').update_npcs(patches)}
+
+def _get_npc_summary(data):
+    with slot_services(data.get('save_slot')) as get:
+        return {'summary': get('npc_generator').get_npc_summary(data['npc_id'])}
+
+def _search_npcs(data):
+    with slot_services(data.get('save_slot')) as get:
+        npcs = get('storage').search_npcs(
+            data.get('query', ''),
+            limit=data.get('limit', 5),
+            filters=data.get('filters'),
+            offset=data.get('offset', 0),
+            include_payload=data.get('include_payload', False),
+            mode=data.get('mode', 'vector')
+        )
+    return {'npcs': npcs}
+
+def _conversation_patterns(data):
+    with slot_services(data.get('save_slot')) as get:
+        return {'patterns': get('dialogue_engine').patterns.analyze(data['npc_id'])}
+
+def _compact_dialogues(data):
+    npc_ids = [data['npc_id']] if data.get('npc_id') else None
+    with slot_services(data.get('save_slot')) as get:
+        return {'report': get('dialogue_retention').compact(npc_ids).to_dict()}
+
+@app.route('/create_npc', methods=['POST'])
+def create_npc():
+    """Create a new NPC - Unity hits this endpoint"""
+    return _respond(_create_npc, request.json)
+@app.route('/talk_to_npc', methods=['POST'])
+def talk_to_npc():
+    """Talk to an NPC - Unity hits this endpoint"""
+    return _respond(_talk_to_npc, request.json)
+@app.route('/ambient_dialogue', methods=['POST'])
+def ambient_dialogue():
+    """Background chatter for a crowd of NPCs - Unity hits this when a scene loads"""
+    return _respond(_ambient_dialogue, request.json)
+@app.route('/update_npc', methods=['POST'])
+def update_npc():
+    """Patch NPC state in place - Unity hits this endpoint every turn if needed"""
+    return _respond(_update_npc, request.json)
 @app.route('/get_npc_summary/<npc_id>', methods=['GET'])
 def get_npc_summary(npc_id):
     """Get NPC information - Unity hits this endpoint"""
-    try:
-        summary = npc_generator.get_npc_summary(npc_id)
-        return jsonify({'success': True, 'summary': summary})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+    return _respond(_get_npc_summary, {'npc_id': npc_id, 'save_slot': request.args.get('save_slot')})
+@app.route('/conversation_patterns/<npc_id>', methods=['GET'])
+def conversation_patterns(npc_id):
+    """Recurring topics and mood trend for an NPC's conversations"""
+    return _respond(_conversation_patterns, {'npc_id': npc_id, 'save_slot': request.args.get('save_slot')})
 @app.route('/search_npcs', methods=['POST'])
 def search_npcs():
     """Search for NPCs - Unity hits this endpoint"""
+    return _respond(_search_npcs, request.json)
+@app.route('/compact_dialogues', methods=['POST'])
+def compact_dialogues():
+    """Run dialogue retention now, for one NPC or all of them"""
+    return _respond(_compact_dialogues, request.json)
+@app.route('/batch', methods=['POST'])
+def batch():
+    """Run many operations in one round-trip; independent ones run concurrently.
+
+    Body: {"ops": [{"id": "a", "op": "create_npc", "args": {...}},
+                   {"id": "b", "op": "talk_to_npc", "args": {"npc_id": "$a.npc_id", ...}}],
+           "save_slot": optional default for every op}
+    Accepts/returns msgpack (application/x-msgpack) and gzip when the client asks.
+    """
+    from src.batch_executor import BatchExecutor, decode_body, encode_body
+    try:
+        data = decode_body(request.get_data(), request.content_type, request.headers.get('Content-Encoding'))
+        results = BatchExecutor(BATCH_OPERATIONS).run(data.get('ops') or [], save_slot=data.get('save_slot'))
+        payload = {'success': all(r['success'] for r in results), 'results': results}
+    except Exception as e:
+        payload = {'success': False, 'error': str(e)}
+    body, headers = encode_body(payload, request.headers.get('Accept', ''), request.headers.get('Accept-Encoding', ''))
+    return app.response_class(body, headers=headers)
+
+# Operations reachable through /batch (same handlers as the single endpoints)
+BATCH_OPERATIONS = {
+    'create_npc': _create_npc,
+    'talk_to_npc': _talk_to_npc,
+    'ambient_dialogue': _ambient_dialogue,
+    'update_npc': _update_npc,
+    'get_npc_summary': _get_npc_summary,
+    'search_npcs': _search_npcs,
+    'conversation_patterns': _conversation_patterns,
+    'compact_dialogues': _compact_dialogues
+}
+
+def dialogue_session(ws):
+    """Persistent conversation: open once, then stream tokens turn by turn (see src/dialogue_session.py)"""
+    from src.dialogue_session import serve_websocket
+    serve_websocket(ws, slot_services)
+try:
+    from flask_sock import Sock
+    Sock(app).route('/dialogue_session')(dialogue_session)
+except ImportError:
+    print("⚠️ flask-sock not installed; the /dialogue_session WebSocket is disabled")
+@app.route('/dialogue_sessions', methods=['GET'])
+def list_dialogue_sessions():
+    """Open WebSocket dialogue sessions"""
+    try:
+        from src.dialogue_session import get_dialogue_sessions
+        return jsonify({'success': True, 'sessions': get_dialogue_sessions().list_sessions()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+@app.route('/save_slots', methods=['GET'])
+def list_save_slots():
+    """Save-slot shards on disk, whether they are open, and their snapshots"""
+    try:
+        return jsonify({'success': True, 'save_slots': services.get('shards').list_shards()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+@app.route('/save_slots/snapshot', methods=['POST'])
+def snapshot_save_slot():
+    """Save game: clone a slot's storage into a named snapshot"""
     data = request.json
     try:
-        npcs = npc_generator.storage.search_npcs(
-            data['query'],
-            limit=data.get('limit', 5)
-        )
-        return jsonify({'success': True, 'npcs': npcs})
+        result = services.get('shards').snapshot(data['save_slot'], data.get('name'))
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+@app.route('/save_slots/restore', methods=['POST'])
+def restore_save_slot():
+    """Load game: replace a slot's storage with one of its snapshots"""
+    data = request.json
+    try:
+        result = services.get('shards').restore(data['save_slot'], data['name'])
+        return jsonify({'success': True, **result})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 if __name__ == '__main__':
@@ -0,0 +1,69 @@
+"""Bake common dialogue lines into an asset Unity can look up offline.
+
+Example:
+    python bake_dialogue.py --faction "The Crimson Blades" --variants 3
+    python bake_dialogue.py --npc-ids npc_1a2b3c4d npc_5e6f7a8b --moods Wary,Friendly
+"""
+import argparse
+import os
+import sys
+
+# Disable ChromaDB telemetry FIRST
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+sys.path.append(os.path.dirname(__file__))
+
+from config.settings import BAKE_OUTPUT_PATH, BAKE_VARIANTS
+from src.dialogue_engine import DialogueEngine
+from src.dialogue_baker import DialogueBaker
+
+def csv(value: str):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate dialogue tables for Unity")
+    parser.add_argument("--npc-ids", nargs="*", help="NPCs to bake (default: all matching the filters)")
+    parser.add_argument("--faction")
+    parser.add_argument("--location")
+    parser.add_argument("--dialogue-types", type=csv)
+    parser.add_argument("--stages", type=csv)
+    parser.add_argument("--moods", type=csv)
+    parser.add_argument("--reputations", type=csv)
+    parser.add_argument("--variants", type=int, default=BAKE_VARIANTS)
+    parser.add_argument("--output", default=BAKE_OUTPUT_PATH)
+    args = parser.parse_args()
+
+    engine = DialogueEngine()
+
+    npc_ids = args.npc_ids
+    if not npc_ids:
+        filters = {k: v for k, v in {"faction": args.faction, "location": args.location}.items() if v}
+        npc_ids, page = [], 500
+        while True:
+            batch = engine.storage.records.list_npcs(filters or None, limit=page, offset=len(npc_ids))
+            npc_ids.extend(npc['npc_id'] for npc in batch)
+            if len(batch) < page:
+                break
+
+    if not npc_ids:
+        print("❌ No NPCs to bake")
+        return
+
+    baker = DialogueBaker(
+        engine,
+        dialogue_types=args.dialogue_types,
+        dialogue_stages=args.stages,
+        moods=args.moods,
+        reputations=args.reputations,
+        variants=args.variants
+    )
+    table = baker.bake(npc_ids)
+    baker.write(table, args.output)
+
+    stats = table['stats']
+    print(f"\n✅ Baked {stats['unique_lines']} unique lines for {stats['npcs']} NPCs "
+          f"({stats['cells_per_npc']} contexts each) in {stats['duration_seconds']}s")
+    print(f"📦 Written to {args.output} ({os.path.getsize(args.output) // 1024} KB)")
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,22 @@ import os
 # Disable ChromaDB telemetry to prevent capture() argument errors - nawab ye change mat karna nhito model load nhi hoh rhe
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 
+def _env_list(name: str, default: str):
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
 # Ollama Configuration
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
 OLLAMA_EMBEDDING_MODEL = os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
+OLLAMA_KEEP_ALIVE = int(os.getenv("OLLAMA_KEEP_ALIVE", "1800"))  # seconds a model stays loaded, -1 pins it
+MODEL_WARMUP_ON_START = os.getenv("MODEL_WARMUP_ON_START", "true").lower() == "true"
+MODEL_WARMUP_TIMEOUT = float(os.getenv("MODEL_WARMUP_TIMEOUT", "120"))  # a cold load can take a while
+
+# Ollama endpoint pools (comma-separated; e.g. one instance per socket)
+OLLAMA_LLM_ENDPOINTS = _env_list("OLLAMA_LLM_ENDPOINTS", OLLAMA_BASE_URL)
+OLLAMA_EMBEDDING_ENDPOINTS = _env_list("OLLAMA_EMBEDDING_ENDPOINTS", ",".join(OLLAMA_LLM_ENDPOINTS))
+OLLAMA_HEALTH_CHECK_INTERVAL = float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL", "10"))  # seconds
+OLLAMA_HEALTH_CHECK_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_CHECK_TIMEOUT", "2"))
 
 # ChromaDB Configuration - SAME as Chronicle project
 CHROMA_HOST = os.getenv("CHROMA_HOST", "http://localhost:8000")
@@ -21,3 +33,169 @@ MAX_SEARCH_RESULTS = 5
 # Dialogue Generation Settings
 DIALOGUE_TEMPERATURE = 0.7
 NPC_ENHANCEMENT_TEMPERATURE = 0.8
+
+# Local Storage Layout
+NPC_DATA_DIR = os.getenv("NPC_DATA_DIR", "./npc_data")
+RECORD_STORE_PATH = os.getenv("RECORD_STORE_PATH", os.path.join(NPC_DATA_DIR, "records.db"))
+
+# Interaction counters are coalesced in memory and flushed in batches
+INTERACTION_FLUSH_THRESHOLD = int(os.getenv("INTERACTION_FLUSH_THRESHOLD", "20"))
+INTERACTION_FLUSH_INTERVAL = float(os.getenv("INTERACTION_FLUSH_INTERVAL", "5.0"))
+
+# Dialogue Retention & Compaction
+DIALOGUE_RETENTION_KEEP_RECENT = int(os.getenv("DIALOGUE_RETENTION_KEEP_RECENT", "50"))
+DIALOGUE_COMPACTION_BATCH = int(os.getenv("DIALOGUE_COMPACTION_BATCH", "25"))
+DIALOGUE_COMPACTION_MIN_AGE_HOURS = float(os.getenv("DIALOGUE_COMPACTION_MIN_AGE_HOURS", "24"))
+DIALOGUE_COMPACTION_INTERVAL = float(os.getenv("DIALOGUE_COMPACTION_INTERVAL", "3600"))  # seconds, 0 disables
+DIALOGUE_ARCHIVE_DIR = os.getenv("DIALOGUE_ARCHIVE_DIR", os.path.join(NPC_DATA_DIR, "archive"))
+DIALOGUE_SUMMARY_TIER = os.getenv("DIALOGUE_SUMMARY_TIER", "")  # model tier that writes summaries; empty = extractive, no LLM call
+
+# Long-term Memory Recall
+MEMORY_RECALL_TOP_K = int(os.getenv("MEMORY_RECALL_TOP_K", "4"))
+MEMORY_RECALL_CANDIDATES = int(os.getenv("MEMORY_RECALL_CANDIDATES", "12"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "300"))
+MEMORY_RECENCY_HALF_LIFE_HOURS = float(os.getenv("MEMORY_RECENCY_HALF_LIFE_HOURS", "72"))
+MEMORY_RECENCY_WEIGHT = float(os.getenv("MEMORY_RECENCY_WEIGHT", "0.3"))
+
+# Conversation patterns (topic clusters over the stored dialogue embeddings)
+PATTERN_SIMILARITY = float(os.getenv("PATTERN_SIMILARITY", "0.82"))  # cosine needed to join a topic
+PATTERN_MIN_REPEATS = int(os.getenv("PATTERN_MIN_REPEATS", "3"))  # exchanges before a topic counts as recurring
+PATTERN_MAX_CLUSTERS = int(os.getenv("PATTERN_MAX_CLUSTERS", "64"))  # per NPC; beyond this, join the nearest
+PATTERN_HISTORY_LIMIT = int(os.getenv("PATTERN_HISTORY_LIMIT", "2000"))  # newest exchanges read on first analysis
+PATTERN_MOOD_WINDOW = int(os.getenv("PATTERN_MOOD_WINDOW", "5"))  # exchanges compared for the mood trend
+PATTERN_CACHE_NPCS = int(os.getenv("PATTERN_CACHE_NPCS", "1024"))  # NPCs whose analysis stays in memory
+
+# Vector Index (HNSW) Settings - applied when a collection is first created.
+# Use tune_index.py to measure recall/latency before changing these.
+NPC_INDEX_SETTINGS = {
+    "hnsw:space": os.getenv("NPC_INDEX_SPACE", "l2"),
+    "hnsw:M": int(os.getenv("NPC_INDEX_M", "16")),
+    "hnsw:construction_ef": int(os.getenv("NPC_INDEX_CONSTRUCTION_EF", "100")),
+    "hnsw:search_ef": int(os.getenv("NPC_INDEX_SEARCH_EF", "10")),
+}
+DIALOGUE_INDEX_SETTINGS = {
+    "hnsw:space": os.getenv("DIALOGUE_INDEX_SPACE", "l2"),
+    "hnsw:M": int(os.getenv("DIALOGUE_INDEX_M", "16")),
+    "hnsw:construction_ef": int(os.getenv("DIALOGUE_INDEX_CONSTRUCTION_EF", "100")),
+    "hnsw:search_ef": int(os.getenv("DIALOGUE_INDEX_SEARCH_EF", "10")),
+}
+
+# Concurrency
+NPC_LOCK_TIMEOUT = float(os.getenv("NPC_LOCK_TIMEOUT", "120"))  # seconds a turn waits for the same NPC
+
+# Ambient Chatter (background barks for crowds)
+AMBIENT_MAX_WORKERS = int(os.getenv("AMBIENT_MAX_WORKERS", "4"))
+AMBIENT_PROMPT_BATCH_SIZE = int(os.getenv("AMBIENT_PROMPT_BATCH_SIZE", "8"))  # NPCs per multi-NPC prompt
+AMBIENT_CACHE_SIZE = int(os.getenv("AMBIENT_CACHE_SIZE", "2048"))
+AMBIENT_CACHE_TTL = float(os.getenv("AMBIENT_CACHE_TTL", "600"))  # seconds
+
+# Read caches (invalidated by NPC writes; TTL only bounds staleness from outside writers)
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))  # 0 disables
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))  # seconds
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "1024"))  # 0 disables
+
+# Offline NPC-to-NPC Simulation
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", str(os.cpu_count() or 2)))
+SIMULATION_TURNS = int(os.getenv("SIMULATION_TURNS", "4"))
+SIMULATION_CHECKPOINT_EVERY = int(os.getenv("SIMULATION_CHECKPOINT_EVERY", "16"))  # conversations per bulk write
+SIMULATION_CHECKPOINT_PATH = os.getenv("SIMULATION_CHECKPOINT_PATH", os.path.join(NPC_DATA_DIR, "simulation_checkpoint.json"))
+
+# Dialogue Baking (pre-generated lines for offline lookup in Unity)
+# Defaults are the option lists of DialogueGeneratorWindow.cs - Unity looks lines
+# up by these exact strings, so change both together.
+BAKE_DIALOGUE_TYPES = _env_list("BAKE_DIALOGUE_TYPES", "Quest Introduction,Idle Chatter,Warning,Farewell")
+BAKE_DIALOGUE_STAGES = _env_list("BAKE_DIALOGUE_STAGES", "Beginning,Middle,End")
+BAKE_MOODS = _env_list("BAKE_MOODS", "Wary,Friendly,Suspicious,Excited")
+BAKE_REPUTATIONS = _env_list("BAKE_REPUTATIONS", "Respected,Neutral,Feared,Unknown")
+BAKE_VARIANTS = int(os.getenv("BAKE_VARIANTS", "3"))
+BAKE_WORKERS = int(os.getenv("BAKE_WORKERS", "4"))
+# The player line each baked dialogue type answers, keyed upper-case with spaces
+# as underscores; every baked type needs one
+BAKE_PLAYER_PROMPTS = {
+    "QUEST_INTRODUCTION": "Do you have any work for me?",
+    "IDLE_CHATTER": "How are things around here?",
+    "WARNING": "Is something wrong?",
+    "FAREWELL": "Farewell for now.",
+    "GREETING": "Hello there.",
+    "TRADE": "What do you have for sale?",
+    "SERVICE": "What services do you offer?",
+    "QUEST": "Do you have any work for me?"
+}
+BAKE_OUTPUT_PATH = os.getenv(
+    "BAKE_OUTPUT_PATH",
+    "./unity_packages/com.chronicle.dialogueGenerator/Resources/BakedDialogue.json"
+)
+
+# API Server Startup
+STARTUP_WARM_ON_BOOT = os.getenv("STARTUP_WARM_ON_BOOT", "true").lower() == "true"  # false: warm on first request
+STARTUP_REQUEST_TIMEOUT = float(os.getenv("STARTUP_REQUEST_TIMEOUT", "30"))  # seconds a request waits for warm-up
+
+# Model Tiering (which model answers which kind of dialogue)
+# num_predict caps the generated tokens; swap the fast model for e.g. "llama3.2:1b"
+MODEL_TIERS = {
+    "fast": {
+        "model": os.getenv("MODEL_TIER_FAST", OLLAMA_MODEL),
+        "temperature": 0.7,
+        "num_predict": int(os.getenv("MODEL_TIER_FAST_TOKENS", "80")),
+    },
+    "standard": {
+        "model": os.getenv("MODEL_TIER_STANDARD", OLLAMA_MODEL),
+        "temperature": DIALOGUE_TEMPERATURE,
+        "num_predict": int(os.getenv("MODEL_TIER_STANDARD_TOKENS", "200")),
+    },
+    "quest": {
+        "model": os.getenv("MODEL_TIER_QUEST", OLLAMA_MODEL),
+        "temperature": DIALOGUE_TEMPERATURE,
+        "num_predict": int(os.getenv("MODEL_TIER_QUEST_TOKENS", "400")),
+    },
+    "ambient": {
+        "model": os.getenv("MODEL_TIER_FAST", OLLAMA_MODEL),
+        "temperature": 0.9,
+        "num_predict": int(os.getenv("MODEL_TIER_AMBIENT_TOKENS", "400")),  # single_prompt mode packs several NPCs
+    },
+}
+MODEL_DEFAULT_TIER = os.getenv("MODEL_DEFAULT_TIER", "standard")
+AMBIENT_MODEL_TIER = os.getenv("AMBIENT_MODEL_TIER", "ambient")
+
+# First matching rule wins. Types/stages are matched upper-cased with spaces as
+# underscores and may use * wildcards; importance is minor < normal < major.
+NPC_IMPORTANCE_LEVELS = ["minor", "normal", "major"]
+DIALOGUE_TIER_RULES = [
+    {"tier": "quest", "dialogue_types": ["QUEST*"]},
+    {"tier": "quest", "min_importance": "major", "dialogue_stages": ["NEGOTIATION", "MIDDLE", "CLIMAX"]},
+    {"tier": "fast", "dialogue_types": ["GREETING", "FAREWELL", "IDLE*", "BARK"], "max_importance": "normal"},
+]
+MODEL_TIER_LATENCY_WINDOW = int(os.getenv("MODEL_TIER_LATENCY_WINDOW", "500"))  # samples kept per tier
+
+# Save-slot / world shards (each gets its own Chroma indexes and record store)
+SHARD_ROOT = os.getenv("SHARD_ROOT", os.path.join(NPC_DATA_DIR, "shards"))
+SHARD_SNAPSHOT_ROOT = os.getenv("SHARD_SNAPSHOT_ROOT", os.path.join(NPC_DATA_DIR, "snapshots"))
+SHARD_MAX_OPEN = int(os.getenv("SHARD_MAX_OPEN", "4"))
+SHARD_IDLE_SECONDS = float(os.getenv("SHARD_IDLE_SECONDS", "600"))  # 0 keeps idle shards open
+
+# Traffic recording for load tests (replay with load_test.py); empty disables
+TRACE_RECORD_PATH = os.getenv("TRACE_RECORD_PATH", "")
+
+# Per-request profiling: "sample" (stack sampling), "trace" (every call) or empty.
+# With PROFILE_ALLOW_HEADER a single request can opt in via "X-Profile: sample|trace".
+# Both are off by default: any client could otherwise slow requests down and fill the disk.
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "").lower()
+PROFILE_ALLOW_HEADER = os.getenv("PROFILE_ALLOW_HEADER", "false").lower() == "true"
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))  # seconds between samples
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", os.path.join(NPC_DATA_DIR, "profiles"))
+
+# Memory diagnostics (/debug/memory)
+MEMORY_SIZE_SAMPLE = int(os.getenv("MEMORY_SIZE_SAMPLE", "256"))  # entries deep-sized per container, then extrapolated
+MEMORY_TRACEMALLOC_FRAMES = int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", "10"))
+MEMORY_SNAPSHOT_LIMIT = int(os.getenv("MEMORY_SNAPSHOT_LIMIT", "8"))  # tracemalloc snapshots kept for diffs
+
+# /batch endpoint
+BATCH_MAX_OPS = int(os.getenv("BATCH_MAX_OPS", "64"))
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))  # ops of one batch running at once
+BATCH_GZIP_MIN_BYTES = int(os.getenv("BATCH_GZIP_MIN_BYTES", "1024"))  # smaller responses are sent uncompressed
+
+# WebSocket dialogue sessions (/dialogue_session, needs flask-sock)
+DIALOGUE_SESSION_MAX = int(os.getenv("DIALOGUE_SESSION_MAX", "256"))  # open sessions per process
+DIALOGUE_SESSION_IDLE_SECONDS = float(os.getenv("DIALOGUE_SESSION_IDLE_SECONDS", "900"))  # closed after this long without a message
+DIALOGUE_SESSION_HISTORY = int(os.getenv("DIALOGUE_SESSION_HISTORY", "3"))  # recent exchanges pinned for the prompt
+DIALOGUE_SESSION_RECALL = os.getenv("DIALOGUE_SESSION_RECALL", "true").lower() == "true"  # false: skip the per-turn memory embedding
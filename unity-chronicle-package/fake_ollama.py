@@ -0,0 +1,166 @@
+"""Local stand-in for the Ollama HTTP API, for load tests.
+
+Answers /api/chat, /api/generate, /api/embed, /api/embeddings and /api/tags
+with canned text and deterministic hashed embeddings after a configurable
+delay, so api_server can be loaded without GPUs or real models.
+
+Example:
+    python fake_ollama.py --port 11435 --chat-latency 0.4 --token-latency 0.01
+    OLLAMA_BASE_URL=http://localhost:11435 python api_server.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LINES = [
+    "Aye, the roads have been quiet lately, too quiet if you ask me.",
+    "Welcome, traveler. Mind the mud, the rains came early this year.",
+    "I've work for anyone with a steady hand and a closed mouth.",
+    "Prices are what they are. Take it or leave it, friend.",
+    "Strange lights over the ridge again last night. Nobody talks about it.",
+]
+
+ENHANCEMENT = {
+    "enhanced_backstory": "Raised on the frontier, they learned early that trust is earned.",
+    "personality_details": "Guarded but fair; warms up to those who keep their word.",
+    "relationships": {"the innkeeper": "old friend"},
+    "secrets": ["Owes a debt to the thieves' guild"],
+    "dialogue_style": "Short sentences, dry humour",
+    "motivations": "Keep the town safe and the coin flowing",
+    "fears": "Losing the people they protect"
+}
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    config = None  # argparse namespace, set in main()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/api/tags"):
+            self._json({'models': [{'name': name} for name in self.config.models]})
+        elif self.path.startswith("/api/ps"):
+            self._json({'models': []})
+        else:
+            self._json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/chat":
+            prompt = " ".join(m.get('content', '') for m in payload.get('messages', []))
+            self._generate(payload, prompt, chat=True)
+        elif self.path == "/api/generate":
+            self._generate(payload, payload.get('prompt', ''), chat=False)
+        elif self.path == "/api/embed":
+            inputs = payload.get('input', '')
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._sleep(self.config.embed_latency)
+            self._json({'model': payload.get('model'), 'embeddings': [embed(t, self.config.dim) for t in inputs]})
+        elif self.path == "/api/embeddings":
+            self._sleep(self.config.embed_latency)
+            self._json({'embedding': embed(payload.get('prompt', ''), self.config.dim)})
+        elif self.path in ("/api/show", "/api/pull"):
+            self._json({'status': 'success'})
+        else:
+            self._json({'error': 'not found'}, status=404)
+
+    def _generate(self, payload, prompt: str, chat: bool):
+        if random.random() < self.config.error_rate:
+            self._json({'error': 'simulated failure'}, status=500)
+            return
+
+        text = self._reply(prompt)
+        tokens = text.split(" ") if text else []
+        self._sleep(self.config.chat_latency)
+
+        def chunk(piece: str, done: bool):
+            body = {'model': payload.get('model'), 'created_at': datetime.now(timezone.utc).isoformat(), 'done': done}
+            if chat:
+                body['message'] = {'role': 'assistant', 'content': piece}
+            else:
+                body['response'] = piece
+            if done:
+                body.update({'done_reason': 'stop', 'eval_count': len(tokens), 'prompt_eval_count': len(prompt.split())})
+            return body
+
+        if payload.get('stream', True):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                self._sleep(self.config.token_latency)
+                self._write_chunk(json.dumps(chunk(token if i == 0 else " " + token, False)) + "\n")
+            self._write_chunk(json.dumps(chunk("", True)) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self._sleep(self.config.token_latency * len(tokens))
+            self._json(chunk(text, True))
+
+    def _reply(self, prompt: str) -> str:
+        if not prompt:
+            return ""  # model load request
+        if "ENHANCED_BACKSTORY" in prompt:
+            return json.dumps(ENHANCEMENT)
+        if "JSON object" in prompt:
+            return "{}"
+        return random.choice(LINES)
+
+    def _write_chunk(self, data: str):
+        raw = data.encode("utf-8")
+        self.wfile.write(f"{len(raw):X}\r\n".encode() + raw + b"\r\n")
+        self.wfile.flush()
+
+    def _json(self, body, status: int = 200):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(random.uniform(0.5, 1.5) * seconds if self.config.jitter else seconds)
+
+def embed(text: str, dim: int):
+    """Deterministic bag-of-words hash embedding, L2-normalised"""
+    vector = [0.0] * dim
+    for word in text.lower().split():
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for load tests")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--chat-latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="seconds per streamed token")
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of generations that fail")
+    parser.add_argument("--jitter", action="store_true", help="randomise latencies by +/-50%%")
+    parser.add_argument("--dim", type=int, default=768, help="embedding size (nomic-embed-text is 768)")
+    parser.add_argument("--models", default="llama3,nomic-embed-text")
+    args = parser.parse_args()
+    args.models = [m.strip() for m in args.models.split(",") if m.strip()]
+
+    FakeOllamaHandler.config = args
+    server = ThreadingHTTPServer((args.host, args.port), FakeOllamaHandler)
+    print(f"🧪 Fake Ollama on http://{args.host}:{args.port} "
+          f"(chat {args.chat_latency}s + {args.token_latency}s/token, embed {args.embed_latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Replay a recorded request trace against api_server and report latencies.
+
+Record a trace by starting the server with TRACE_RECORD_PATH set, then replay
+it, usually against a server pointed at fake_ollama.py so the numbers measure
+our code rather than the model:
+
+    python fake_ollama.py --chat-latency 0.3 &
+    OLLAMA_BASE_URL=http://localhost:11435 python api_server.py &
+    python load_test.py npc_data/trace.jsonl --concurrency 16 --speedup 4
+
+NPC ids created during the replay are mapped onto the ids recorded in the
+trace, so later talk/update/summary requests hit the new NPCs.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import requests
+
+sys.path.append(os.path.dirname(__file__))
+
+from src.traffic_trace import endpoint_name, read_trace
+
+BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+_NPC_ID = re.compile(r"npc_[0-9a-f]+")
+
+class IdMap:
+    """Recorded npc_id -> npc_id created by this replay"""
+
+    def __init__(self, recorded_ids):
+        self._events = {npc_id: threading.Event() for npc_id in recorded_ids}
+        self._ids: Dict[str, Optional[str]] = {}
+
+    def resolve(self, npc_id: str, timeout: float) -> Optional[str]:
+        event = self._events.get(npc_id)
+        if event is None:
+            return npc_id  # existed before the recording started
+        if not event.wait(timeout):
+            return None
+        return self._ids.get(npc_id)
+
+    def created(self, recorded_id: str, new_id: Optional[str]):
+        if recorded_id in self._events:
+            self._ids[recorded_id] = new_id
+            self._events[recorded_id].set()
+
+class Replayer:
+    def __init__(self, base_url: str, concurrency: int, speedup: float, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.speedup = speedup
+        self.timeout = timeout
+        self._local = threading.local()
+        self.results: List[Dict[str, Any]] = []
+        self._results_lock = threading.Lock()
+
+    def run(self, entries: List[Dict[str, Any]]) -> float:
+        """Replay entries on their recorded schedule (scaled); returns wall time"""
+        entries = sorted(entries, key=lambda e: e.get('offset', 0))
+        self.ids = IdMap(e['created_npc_id'] for e in entries if e.get('created_npc_id'))
+        first = entries[0].get('offset', 0) if entries else 0
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for entry in entries:
+                if self.speedup > 0:
+                    due = started + (entry.get('offset', 0) - first) / self.speedup
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                pool.submit(self._send, entry)
+        return time.perf_counter() - started
+
+    def _send(self, entry: Dict[str, Any]):
+        name = endpoint_name(entry['method'], entry['path'])
+        result = {'endpoint': name, 'status': None, 'ok': False, 'latency_ms': None}
+        try:
+            path, query, body = self._rewrite(entry)
+            url = f"{self.base_url}{path}" + (f"?{query}" if query else "")
+            sent = time.perf_counter()
+            response = self._session().request(entry['method'], url, json=body, timeout=self.timeout)
+            result['latency_ms'] = (time.perf_counter() - sent) * 1000
+            result['status'] = response.status_code
+
+            payload = None
+            if 'json' in response.headers.get('Content-Type', ''):
+                payload = response.json()
+            success = payload.get('success') if isinstance(payload, dict) else None
+            result['ok'] = response.status_code < 400 and success is not False
+            if not result['ok']:
+                result['error'] = (payload or {}).get('error') if isinstance(payload, dict) else response.text[:200]
+            if entry.get('created_npc_id'):
+                new_id = payload.get('npc_id') if isinstance(payload, dict) else None
+                self.ids.created(entry['created_npc_id'], new_id)
+        except Exception as e:
+            result['error'] = str(e)
+            if entry.get('created_npc_id'):
+                self.ids.created(entry['created_npc_id'], None)
+        with self._results_lock:
+            self.results.append(result)
+
+    def _rewrite(self, entry: Dict[str, Any]):
+        """Swap recorded npc ids for the ones created in this run"""
+        def swap(match):
+            new_id = self.ids.resolve(match.group(0), self.timeout)
+            if new_id is None:
+                raise RuntimeError(f"NPC {match.group(0)} was not created in this replay")
+            return new_id
+
+        body = entry.get('body')
+        if body is not None:
+            body = json.loads(_NPC_ID.sub(swap, json.dumps(body)))
+        return _NPC_ID.sub(swap, entry['path']), _NPC_ID.sub(swap, entry.get('query') or ""), body
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))  # nearest rank
+    return values[index]
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    groups = defaultdict(list)
+    for result in results:
+        groups[result['endpoint']].append(result)
+    groups['ALL'] = list(results)
+
+    report = {'wall_seconds': round(wall_seconds, 2), 'endpoints': {}}
+    for name, items in sorted(groups.items()):
+        latencies = sorted(r['latency_ms'] for r in items if r['latency_ms'] is not None)
+        errors = sum(1 for r in items if not r['ok'])
+        histogram = [0] * (len(BUCKETS_MS) + 1)
+        for latency in latencies:
+            histogram[next((i for i, b in enumerate(BUCKETS_MS) if latency <= b), len(BUCKETS_MS))] += 1
+        error_samples = sorted({str(r.get('error')) for r in items if not r['ok']})[:3]
+        report['endpoints'][name] = {
+            'count': len(items),
+            'errors': errors,
+            'error_rate': round(errors / len(items), 4) if items else 0.0,
+            'throughput_rps': round(len(items) / wall_seconds, 2) if wall_seconds else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p90_ms': round(percentile(latencies, 90), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'max_ms': round(latencies[-1], 1) if latencies else 0.0,
+            'histogram': dict(zip([f"<={b}ms" for b in BUCKETS_MS] + ["+inf"], histogram)),
+            'error_samples': error_samples
+        }
+    return report
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n📊 Replay finished in {report['wall_seconds']}s\n")
+    print(f"{'endpoint':<40} {'count':>6} {'err%':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for name, stats in report['endpoints'].items():
+        print(f"{name:<40} {stats['count']:>6} {stats['error_rate'] * 100:>5.1f}% {stats['throughput_rps']:>7} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}")
+
+    for name, stats in report['endpoints'].items():
+        if name == 'ALL' or not stats['count']:
+            continue
+        print(f"\n{name}")
+        peak = max(stats['histogram'].values()) or 1
+        for bucket, count in stats['histogram'].items():
+            print(f"  {bucket:>9} | {'#' * round(30 * count / peak):<30} {count}")
+        for error in stats['error_samples']:
+            print(f"  ⚠️ {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded api_server trace")
+    parser.add_argument("trace", help="JSONL trace written by TRACE_RECORD_PATH")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--concurrency", type=int, default=8, help="max requests in flight")
+    parser.add_argument("--speedup", type=float, default=1.0,
+                        help="replay N times faster than recorded; 0 sends as fast as possible")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the trace this many times back to back")
+    parser.add_argument("--endpoints", help="comma-separated substrings; only replay matching endpoints "
+                             "(NPC creation is always kept so ids resolve)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--report", help="also write the report as JSON here")
+    args = parser.parse_args()
+
+    entries = list(read_trace(args.trace))
+    if args.endpoints:
+        wanted = [w.strip() for w in args.endpoints.split(",") if w.strip()]
+        entries = [e for e in entries
+                   if e.get('created_npc_id') or any(w in endpoint_name(e['method'], e['path']) for w in wanted)]
+    if not entries:
+        print("❌ Nothing to replay")
+        return
+
+    replayer = Replayer(args.url, args.concurrency, args.speedup, args.timeout)
+    print(f"🔁 Replaying {len(entries)} requests x{args.repeat} against {args.url} "
+          f"(concurrency {args.concurrency}, speedup {args.speedup or 'max'})")
+    wall = sum(replayer.run(entries) for _ in range(args.repeat))
+
+    report = summarize(replayer.results, wall)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
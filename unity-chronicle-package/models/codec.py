@@ -0,0 +1,104 @@
+"""Single serialization path for the model dataclasses.
+
+Records are plain dicts with ISO timestamps plus a schema version under
+``_v``; ``dumps``/``loads`` turn them into JSON text using orjson when it is
+installed and the standard library otherwise, so rows stay readable by both.
+"""
+import json
+from dataclasses import fields
+from datetime import datetime
+from typing import Dict, Any, Callable, Type, TypeVar, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SCHEMA_VERSION = 1
+VERSION_KEY = "_v"
+
+T = TypeVar("T")
+
+# class name -> {from_version: upgrade(record) -> record}; unversioned rows are version 0
+MIGRATIONS: Dict[str, Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]]] = {}
+
+_codecs: Dict[type, Tuple[Callable, Callable]] = {}
+
+def _compile(cls: type) -> Tuple[Callable, Callable]:
+    """Generate an encoder and a fast-path decoder for one model class.
+
+    Like dataclasses itself, the code is generated once per class so the hot
+    path is a single dict display / constructor call with no per-field loop.
+    """
+    codec = _codecs.get(cls)
+    if codec is not None:
+        return codec
+
+    model_fields = fields(cls)
+    datetimes = {f.name for f in model_fields if 'datetime' in str(f.type)}
+
+    encode_items = [f"'{VERSION_KEY}': {SCHEMA_VERSION}"]
+    decode_args = []
+    for f in model_fields:
+        if f.name in datetimes:
+            encode_items.append(f"'{f.name}': None if o.{f.name} is None else o.{f.name}.isoformat()")
+            decode_args.append(f"{f.name}=_dt(v) if (v := r['{f.name}']).__class__ is str else v")
+        else:
+            encode_items.append(f"'{f.name}': o.{f.name}")
+            decode_args.append(f"{f.name}=r['{f.name}']")
+
+    source = (
+        f"def encode(o):\n    return {{{', '.join(encode_items)}}}\n"
+        f"def decode(r):\n    return cls({', '.join(decode_args)})\n"
+    )
+    namespace = {'cls': cls, '_dt': datetime.fromisoformat}
+    exec(source, namespace)
+    codec = _codecs[cls] = (namespace['encode'], namespace['decode'])
+    return codec
+
+def to_record(obj) -> Dict[str, Any]:
+    """Model instance -> versioned dict ready to store"""
+    return _compile(type(obj))[0](obj)
+
+def from_record(cls: Type[T], record: Dict[str, Any]) -> T:
+    """Stored dict -> model instance, upgrading old versions and ignoring unknown keys"""
+    version = record.get(VERSION_KEY, 0)
+    if version == SCHEMA_VERSION or cls.__name__ not in MIGRATIONS:
+        try:
+            return _compile(cls)[1](record)
+        except KeyError:
+            pass  # a field is missing; let the slow path apply defaults
+
+    for step in range(version, SCHEMA_VERSION):
+        upgrade = MIGRATIONS.get(cls.__name__, {}).get(step)
+        if upgrade:
+            record = upgrade(dict(record))
+
+    kwargs = {}
+    for f in fields(cls):
+        if f.name in record:
+            value = record[f.name]
+            if isinstance(value, str) and 'datetime' in str(f.type):
+                value = datetime.fromisoformat(value)
+            kwargs[f.name] = value
+    return cls(**kwargs)
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+if orjson is not None:
+    def dumps(record: Dict[str, Any]) -> str:
+        return orjson.dumps(record, default=_default).decode("utf-8")
+
+    def loads(raw) -> Dict[str, Any]:
+        return orjson.loads(raw)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(",", ":"), ensure_ascii=False)
+
+    def dumps(record: Dict[str, Any]) -> str:
+        return _encoder.encode(record)
+
+    def loads(raw) -> Dict[str, Any]:
+        return json.loads(raw)
@@ -1,29 +1,26 @@
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Any
 from datetime import datetime
 
-@dataclass
+from models.codec import to_record
+
+# Stored lines nobody said to the player; kept out of player history and recall
+NON_PLAYER_DIALOGUE_TYPES = ("AMBIENT", "NPC_CONVERSATION")
+
+@dataclass(slots=True)
 class DialogueEntry:
     npc_id: str
     player_input: str
     npc_response: str
-    context: Dict[str, any]
+    context: Dict[str, Any]
     timestamp: datetime = field(default_factory=datetime.now)
     dialogue_type: str = "CONVERSATION"
     mood: str = "Neutral"
     
-    def to_dict(self) -> Dict:
-        return {
-            'npc_id': self.npc_id,
-            'player_input': self.player_input,
-            'npc_response': self.npc_response,
-            'context': self.context,
-            'timestamp': self.timestamp.isoformat(),
-            'dialogue_type': self.dialogue_type,
-            'mood': self.mood
-        }
+    def to_dict(self) -> Dict[str, Any]:
+        return to_record(self)
 
-@dataclass
+@dataclass(slots=True)
 class ConversationHistory:
     npc_id: str
     entries: List[DialogueEntry] = field(default_factory=list)
@@ -1,9 +1,10 @@
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional, Any
 from datetime import datetime
-import json
 
-@dataclass
+from models.codec import to_record
+
+@dataclass(slots=True)
 class NPCCharacter:
     # Basic Identity
     name: str
@@ -23,6 +24,13 @@ class NPCCharacter:
     traits_flaws: List[str] = field(default_factory=list)
     relationships: Dict[str, str] = field(default_factory=dict)
     
+    # LLM Enhancement (filled in by NPCGenerator)
+    personality_details: str = ""
+    dialogue_style: str = ""
+    motivations: str = ""
+    fears: str = ""
+    secrets: List[str] = field(default_factory=list)
+    
     # Generated Data
     npc_id: str = ""
     created_at: datetime = field(default_factory=datetime.now)
@@ -30,26 +38,9 @@ class NPCCharacter:
     interaction_count: int = 0
     
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            'npc_id': self.npc_id,
-            'name': self.name,
-            'gender': self.gender,
-            'age': self.age,
-            'race_species': self.race_species,
-            'personality': self.personality,
-            'alignment': self.alignment,
-            'profession_role': self.profession_role,
-            'faction': self.faction,
-            'skills': self.skills,
-            'backstory': self.backstory,
-            'traits_flaws': self.traits_flaws,
-            'relationships': self.relationships,
-            'created_at': self.created_at.isoformat(),
-            'last_interaction': self.last_interaction.isoformat() if self.last_interaction else None,
-            'interaction_count': self.interaction_count
-        }
+        return to_record(self)
 
-@dataclass
+@dataclass(slots=True)
 class WorldSettings:
     world_theme: str = "Medieval Fantasy"
     location: str = "Village"
@@ -58,7 +49,7 @@ class WorldSettings:
     tech_level: str = "Low-Tech"
     environment: str = "Temperate"
 
-@dataclass
+@dataclass(slots=True)
 class DialogueContext:
     dialogue_type: str = "GREETING"
     dialogue_stage: str = "FIRST_MEET"
@@ -67,7 +58,7 @@ class DialogueContext:
     quest_state: str = "Not Given"
     conditions: List[str] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=True)
 class NPCBehavior:
     gives_quest: bool = False
     quest_id: Optional[str] = None
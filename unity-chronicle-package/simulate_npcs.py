@@ -0,0 +1,52 @@
+"""Let NPCs talk to each other while the player is away.
+
+Pairs NPCs by faction or location, runs multi-turn conversations in a process
+pool and stores them in npc_dialogues. Interrupted runs resume from the
+checkpoint unless --reset is given.
+
+Example:
+    python simulate_npcs.py --pair-by location --rounds 2 --workers 8
+"""
+import argparse
+import os
+import sys
+
+# Disable ChromaDB telemetry FIRST
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+sys.path.append(os.path.dirname(__file__))
+
+from config.settings import SIMULATION_WORKERS, SIMULATION_TURNS
+from src.npc_storage import NPCStorage
+from src.npc_simulation import NPCSimulationRunner
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline NPC-to-NPC conversation simulation")
+    parser.add_argument("--pair-by", choices=["faction", "location"], default="faction")
+    parser.add_argument("--rounds", type=int, default=1, help="partner reshuffles per group")
+    parser.add_argument("--turns", type=int, default=SIMULATION_TURNS)
+    parser.add_argument("--workers", type=int, default=SIMULATION_WORKERS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--faction", help="only simulate NPCs of this faction")
+    parser.add_argument("--location", help="only simulate NPCs in this location")
+    parser.add_argument("--reset", action="store_true", help="ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    filters = {k: v for k, v in {"faction": args.faction, "location": args.location}.items() if v}
+
+    runner = NPCSimulationRunner(NPCStorage(), workers=args.workers, turns=args.turns)
+    summary = runner.run(
+        pair_by=args.pair_by,
+        rounds=args.rounds,
+        seed=args.seed,
+        filters=filters or None,
+        reset=args.reset
+    )
+
+    print(f"\n✅ Run {summary['run_id']}: {summary['conversations']} conversations, "
+          f"{summary['dialogues_written']} dialogue lines stored in {summary['duration_seconds']}s")
+    if summary['failed']:
+        print(f"⚠️ {summary['failed']} conversations failed; run the same command again to retry them")
+
+if __name__ == "__main__":
+    main()
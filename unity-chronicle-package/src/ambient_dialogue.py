@@ -0,0 +1,187 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from config.settings import (
+    AMBIENT_MAX_WORKERS, AMBIENT_PROMPT_BATCH_SIZE, AMBIENT_CACHE_SIZE, AMBIENT_CACHE_TTL
+)
+from models.dialogue_model import DialogueEntry
+from src.lru_cache import LRUCache
+from src.npc_storage import NPCStorage
+
+AMBIENT_MODES = ("concurrent", "single_prompt")
+
+BARK_PROMPT = ChatPromptTemplate.from_template("""
+You are {name}, a {race_species} {profession_role} ({personality}).
+Scene: {scene}
+
+Say ONE short line of background chatter (max 15 words) that someone passing by might overhear.
+Stay in character. No quotes, no narration, just the line.
+""")
+
+CROWD_PROMPT = ChatPromptTemplate.from_template("""
+Scene: {scene}
+
+These characters are present:
+{characters}
+
+For EACH character write ONE short line of background chatter (max 15 words) that someone
+passing by might overhear. Stay in character, no narration.
+
+Respond ONLY with JSON mapping each id to its line:
+{{"<id>": "<line>", ...}}
+""")
+
+def scene_fingerprint(scene_context: Dict[str, Any]) -> str:
+    """Stable key for a scene state"""
+    raw = json.dumps(scene_context or {}, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+class AmbientDialogueGenerator:
+    """Background barks for crowds of NPCs.
+
+    Lines are generated concurrently (one small prompt per NPC) or a few NPCs
+    per prompt, cached per (NPC, scene state), and only persisted on request.
+    """
+
+    def __init__(self, llm, storage: NPCStorage,
+                 max_workers: int = AMBIENT_MAX_WORKERS,
+                 prompt_batch_size: int = AMBIENT_PROMPT_BATCH_SIZE):
+        self.llm = llm
+        self.storage = storage
+        self.max_workers = max_workers
+        self.prompt_batch_size = prompt_batch_size
+        self.cache = LRUCache(maxsize=AMBIENT_CACHE_SIZE, ttl=AMBIENT_CACHE_TTL)
+
+    def generate(self, npc_ids: List[str], scene_context: Dict[str, Any],
+                 mode: str = "concurrent", persist: bool = False,
+                 use_cache: bool = True) -> Dict[str, Any]:
+        """Generate one ambient line per NPC for a scene.
+
+        Returns {'lines': {npc_id: line}, 'missing': [...], 'failed': [...], 'cached': n}.
+        NPCs whose generation failed get a placeholder line that is neither
+        cached nor persisted, so the next request tries the model again.
+        """
+        if mode not in AMBIENT_MODES:
+            raise ValueError(f"Unknown ambient mode '{mode}'")
+
+        scene_key = scene_fingerprint(scene_context)
+        unique_ids = list(dict.fromkeys(npc_ids))
+        lines: Dict[str, str] = {}
+
+        to_generate = []
+        for npc_id in unique_ids:
+            cached = self.cache.get((npc_id, scene_key)) if use_cache else None
+            if cached is not None:
+                lines[npc_id] = cached
+            else:
+                to_generate.append(npc_id)
+        cached_count = len(lines)
+
+        records = self.storage.records.get_npcs(to_generate)
+        missing = [npc_id for npc_id in to_generate if npc_id not in records]
+        failed = []
+
+        if records:
+            if mode == "single_prompt":
+                generated = self._generate_grouped(records, scene_context)
+            else:
+                generated = self._generate_concurrent(records, scene_context)
+
+            failed = [npc_id for npc_id in records if not generated.get(npc_id)]
+            generated = {npc_id: line for npc_id, line in generated.items() if line}
+            for npc_id, line in generated.items():
+                lines[npc_id] = line
+                self.cache.set((npc_id, scene_key), line)
+            for npc_id in failed:
+                lines[npc_id] = f"*{records[npc_id]['npc']['name']} mutters something under their breath.*"
+
+            if persist and generated:
+                mood = (scene_context or {}).get('mood', 'Neutral')
+                self.storage.store_dialogues([
+                    DialogueEntry(
+                        npc_id=npc_id,
+                        player_input="",
+                        npc_response=line,
+                        context={'scene': scene_context or {}},
+                        dialogue_type="AMBIENT",
+                        mood=mood
+                    )
+                    for npc_id, line in generated.items()
+                ])
+
+        return {
+            'lines': {npc_id: lines[npc_id] for npc_id in unique_ids if npc_id in lines},
+            'missing': missing,
+            'failed': failed,
+            'cached': cached_count
+        }
+
+    def _generate_concurrent(self, records: Dict[str, Dict[str, Any]],
+                             scene_context: Dict[str, Any]) -> Dict[str, Optional[str]]:
+        scene_text = self._scene_text(scene_context)
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            futures = {
+                npc_id: pool.submit(self._bark, record['npc'], scene_text)
+                for npc_id, record in records.items()
+            }
+            return {npc_id: future.result() for npc_id, future in futures.items()}
+
+    def _generate_grouped(self, records: Dict[str, Dict[str, Any]],
+                          scene_context: Dict[str, Any]) -> Dict[str, str]:
+        """A few NPCs per prompt; anything the model drops is retried one by one"""
+        scene_text = self._scene_text(scene_context)
+        npc_ids = list(records)
+        groups = [npc_ids[i:i + self.prompt_batch_size]
+                  for i in range(0, len(npc_ids), max(1, self.prompt_batch_size))]
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            results = pool.map(lambda group: self._crowd(group, records, scene_text), groups)
+            lines = {}
+            for group_lines in results:
+                lines.update(group_lines)
+
+        leftovers = {npc_id: records[npc_id] for npc_id in npc_ids if not lines.get(npc_id)}
+        if leftovers:
+            lines.update(self._generate_concurrent(leftovers, scene_context))
+        return lines
+
+    def _bark(self, npc: Dict[str, Any], scene_text: str) -> Optional[str]:
+        prompt = BARK_PROMPT.format(
+            name=npc['name'],
+            race_species=npc.get('race_species', 'Human'),
+            profession_role=npc.get('profession_role', 'Citizen'),
+            personality=', '.join(npc.get('personality', [])) or 'ordinary',
+            scene=scene_text
+        )
+        try:
+            return self.llm.invoke(prompt).content.strip().strip('"')
+        except Exception as e:
+            print(f"Error generating ambient line for {npc['name']}: {e}")
+            return None
+
+    def _crowd(self, group: List[str], records: Dict[str, Dict[str, Any]], scene_text: str) -> Dict[str, str]:
+        characters = "\n".join(
+            f"- id={npc_id}: {records[npc_id]['npc']['name']}, "
+            f"{records[npc_id]['npc'].get('profession_role', 'Citizen')} "
+            f"({', '.join(records[npc_id]['npc'].get('personality', [])) or 'ordinary'})"
+            for npc_id in group
+        )
+        prompt = CROWD_PROMPT.format(scene=scene_text, characters=characters)
+        try:
+            content = self.llm.invoke(prompt).content.strip()
+            if content.startswith('```'):
+                content = content.strip('`').removeprefix('json').strip()
+            parsed = json.loads(content)
+            return {npc_id: str(parsed[npc_id]).strip() for npc_id in group if parsed.get(npc_id)}
+        except Exception as e:
+            print(f"⚠️ Multi-NPC ambient prompt failed, falling back to per-NPC prompts: {e}")
+            return {}
+
+    def _scene_text(self, scene_context: Dict[str, Any]) -> str:
+        if not scene_context:
+            return "An ordinary moment."
+        return "; ".join(f"{key}: {value}" for key, value in scene_context.items())
@@ -0,0 +1,160 @@
+import gzip
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from config.settings import BATCH_MAX_OPS, BATCH_MAX_WORKERS, BATCH_GZIP_MIN_BYTES
+
+try:
+    import msgpack
+except ImportError:  # optional; JSON is always available
+    msgpack = None
+
+MSGPACK_TYPE = "application/x-msgpack"
+_REFERENCE = re.compile(r"^\$([A-Za-z0-9_-]+)\.(.+)$")  # "$<op id>.<result field>[.<field>...]"
+
+class BatchError(ValueError):
+    """The batch itself is malformed (as opposed to one of its operations failing)"""
+
+class BatchExecutor:
+    """Runs a list of heterogeneous operations, concurrently where they are independent.
+
+    An op waits for the ops it depends on, either listed in ``depends_on`` or
+    referenced from its args as "$<id>.<field>" (e.g. "$new_npc.npc_id"). Ops
+    on the same npc_id also run in the order given. Everything else runs in
+    parallel. Dependencies must point to earlier ops, so there are no cycles.
+    """
+
+    def __init__(self, operations: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]],
+                 max_workers: int = BATCH_MAX_WORKERS, max_ops: int = BATCH_MAX_OPS):
+        self.operations = operations
+        self.max_workers = max(1, max_workers)
+        self.max_ops = max_ops
+
+    def run(self, ops: List[Dict[str, Any]], save_slot: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Execute the batch; results come back in request order with per-op status"""
+        plan = self._plan(ops)
+        futures: Dict[str, Future] = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(plan) or 1),
+                                thread_name_prefix="batch-op") as pool:
+            # Submitted in order: an op's dependencies are always ahead of it in
+            # the queue, so a worker never waits on something that cannot start
+            for op_id, name, args, depends_on in plan:
+                deps = {dep: futures[dep] for dep in depends_on}
+                futures[op_id] = pool.submit(self._execute, op_id, name, args, deps, save_slot)
+        return [futures[op_id].result() for op_id, *_ in plan]
+
+    def _plan(self, ops: List[Dict[str, Any]]) -> List[tuple]:
+        if not isinstance(ops, list) or not ops:
+            raise BatchError("'ops' must be a non-empty list")
+        if len(ops) > self.max_ops:
+            raise BatchError(f"Batch has {len(ops)} ops; the limit is {self.max_ops}")
+
+        plan = []
+        seen = set()
+        last_for_npc: Dict[str, str] = {}
+        for index, op in enumerate(ops):
+            op_id = str(op.get('id', index))
+            name = op.get('op')
+            args = op.get('args') or {}
+            if op_id in seen:
+                raise BatchError(f"Duplicate op id '{op_id}'")
+            if name not in self.operations:
+                raise BatchError(f"Op '{op_id}': unknown operation '{name}'")
+            if not isinstance(args, dict):
+                raise BatchError(f"Op '{op_id}': 'args' must be an object")
+
+            depends_on = [str(dep) for dep in op.get('depends_on', [])] + self._references(args)
+            for npc_id in self._npc_ids(args):
+                if npc_id in last_for_npc:
+                    depends_on.append(last_for_npc[npc_id])
+                last_for_npc[npc_id] = op_id
+            unknown = [dep for dep in depends_on if dep not in seen]
+            if unknown:
+                raise BatchError(f"Op '{op_id}' depends on '{unknown[0]}', which is not an earlier op")
+
+            seen.add(op_id)
+            plan.append((op_id, name, args, sorted(set(depends_on))))
+        return plan
+
+    def _execute(self, op_id: str, name: str, args: Dict[str, Any],
+                 deps: Dict[str, Future], save_slot: Optional[str]) -> Dict[str, Any]:
+        result = {'id': op_id, 'op': name}
+        dep_results = {dep: future.result() for dep, future in deps.items()}
+        failed = [dep for dep, dep_result in dep_results.items() if not dep_result['success']]
+        if failed:
+            return {**result, 'success': False, 'status': 'skipped',
+                    'error': f"Dependency '{failed[0]}' failed"}
+        started = time.perf_counter()  # time spent waiting on dependencies is not the op's
+        try:
+            args = self._resolve(args, dep_results)
+            if save_slot and 'save_slot' not in args:
+                args = {**args, 'save_slot': save_slot}
+            output = self.operations[name](args)
+            result.update({'success': True, 'status': 'ok', 'result': output})
+        except Exception as e:
+            result.update({'success': False, 'status': 'error', 'error': str(e)})
+        result['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    def _references(self, value: Any) -> List[str]:
+        if isinstance(value, str):
+            match = _REFERENCE.match(value)
+            return [match.group(1)] if match else []
+        if isinstance(value, dict):
+            return [ref for item in value.values() for ref in self._references(item)]
+        if isinstance(value, list):
+            return [ref for item in value for ref in self._references(item)]
+        return []
+
+    def _resolve(self, value: Any, dep_results: Dict[str, Dict[str, Any]]) -> Any:
+        """Replace "$id.field" strings with values from earlier results"""
+        if isinstance(value, str):
+            match = _REFERENCE.match(value)
+            if not match:
+                return value
+            resolved = dep_results[match.group(1)]['result']
+            for key in match.group(2).split("."):
+                resolved = resolved[int(key)] if isinstance(resolved, list) else resolved[key]
+            return resolved
+        if isinstance(value, dict):
+            return {key: self._resolve(item, dep_results) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._resolve(item, dep_results) for item in value]
+        return value
+
+    def _npc_ids(self, args: Dict[str, Any]) -> List[str]:
+        """Literal NPC ids an op touches (references are ordered by their dependency already)"""
+        ids = [args.get('npc_id')] + list(args.get('npc_ids') or [])
+        ids += [update.get('npc_id') for update in args.get('updates') or [] if isinstance(update, dict)]
+        return sorted({npc_id for npc_id in ids if isinstance(npc_id, str) and not _REFERENCE.match(npc_id)})
+
+def decode_body(raw: bytes, content_type: Optional[str], content_encoding: Optional[str]) -> Dict[str, Any]:
+    """Request body as a dict; gzip and msgpack are optional on the way in too"""
+    if content_encoding and "gzip" in content_encoding.lower():
+        raw = gzip.decompress(raw)
+    if content_type and MSGPACK_TYPE in content_type:
+        if msgpack is None:
+            raise BatchError("msgpack body sent but msgpack is not installed on the server")
+        data = msgpack.unpackb(raw, raw=False)
+    else:
+        data = json.loads(raw or b"{}")
+    if not isinstance(data, dict):
+        raise BatchError("Batch body must be an object with an 'ops' list")
+    return data
+
+def encode_body(payload: Dict[str, Any], accept: str, accept_encoding: str) -> Tuple[bytes, Dict[str, str]]:
+    """Serialize a response as msgpack or JSON, gzipped when the client accepts it and it pays off"""
+    if msgpack is not None and MSGPACK_TYPE in accept:
+        body = msgpack.packb(payload, default=str, use_bin_type=True)
+        headers = {'Content-Type': MSGPACK_TYPE}
+    else:
+        body = json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+        headers = {'Content-Type': "application/json"}
+    if "gzip" in accept_encoding.lower() and len(body) >= BATCH_GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=5)
+        headers['Content-Encoding'] = "gzip"
+    headers['Vary'] = "Accept, Accept-Encoding"
+    return body, headers
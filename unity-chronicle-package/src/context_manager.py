@@ -1,38 +1,55 @@
+import threading
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from models.dialogue_model import DialogueEntry, ConversationHistory
 from models.npc_model import NPCCharacter, DialogueContext
 from src.npc_storage import NPCStorage
+from src.npc_locks import NPCLockRegistry
+from src.memory_report import estimate_sizeof
+from src.conversation_patterns import ConversationPatterns
 
 class ContextManager:
-    def __init__(self, storage: NPCStorage):
+    def __init__(self, storage: NPCStorage, locks: Optional[NPCLockRegistry] = None,
+                 patterns: Optional[ConversationPatterns] = None):
         self.storage = storage
+        self.patterns = patterns or ConversationPatterns(storage)
         self.active_contexts: Dict[str, Dict[str, Any]] = {}
+        # Per-NPC locks guard build/read-modify-write; the dict lock only guards the mapping
+        self.locks = locks or storage.locks
+        self._contexts_lock = threading.Lock()
     
     def get_npc_context(self, npc_id: str) -> Dict[str, Any]:
-        """Get comprehensive context for an NPC"""
-        if npc_id not in self.active_contexts:
-            self.active_contexts[npc_id] = self._build_npc_context(npc_id)
-        
-        return self.active_contexts[npc_id]
+        """Get comprehensive context for an NPC (a snapshot; use update_npc_context to change it)"""
+        with self.locks.hold(npc_id):
+            return dict(self._get_or_build(npc_id))
     
     def update_npc_context(self, npc_id: str, new_info: Dict[str, Any]):
         """Update NPC context with new information"""
-        if npc_id not in self.active_contexts:
-            self.active_contexts[npc_id] = self._build_npc_context(npc_id)
-        
-        self.active_contexts[npc_id].update(new_info)
-        self.active_contexts[npc_id]['last_updated'] = datetime.now()
+        with self.locks.hold(npc_id):
+            # Copy-on-write so snapshots handed out earlier never change underneath readers
+            context = {**self._get_or_build(npc_id), **new_info, 'last_updated': datetime.now()}
+            with self._contexts_lock:
+                self.active_contexts[npc_id] = context
+    
+    def _get_or_build(self, npc_id: str) -> Dict[str, Any]:
+        """Caller holds the NPC lock, so a context is built at most once"""
+        with self._contexts_lock:
+            context = self.active_contexts.get(npc_id)
+        if context is None:
+            context = self._build_npc_context(npc_id)
+            with self._contexts_lock:
+                self.active_contexts[npc_id] = context
+        return context
     
     def get_relationship_context(self, npc_id: str) -> str:
         """Get relationship level and history summary"""
-        history = self.storage.get_npc_dialogue_history(npc_id, limit=20)
+        stats = self.storage.get_interaction_stats(npc_id)
+        total_interactions = stats['interaction_count']
         
-        if not history:
+        if not total_interactions:
             return "This is your first meeting."
         
-        total_interactions = len(history)
-        recent_mood = history[0].mood if history else "neutral"
+        recent_mood = stats['last_mood'] or "neutral"
         
         if total_interactions >= 15:
             relationship = "close friend"
@@ -60,26 +77,8 @@ class ContextManager:
         return "\n".join(summary_parts)
     
     def detect_conversation_patterns(self, npc_id: str) -> List[str]:
-        """Detect patterns in conversation history"""
-        history = self.storage.get_npc_dialogue_history(npc_id, limit=10)
-        patterns = []
-        
-        if not history:
-            return patterns
-        
-        # Detect repeated topics
-        topics = [entry.player_input.lower() for entry in history]
-        if any(topics.count(topic) > 1 for topic in topics):
-            patterns.append("Player tends to ask about similar topics")
-        
-        # Detect mood patterns
-        moods = [entry.mood for entry in history]
-        if moods.count('angry') > len(moods) * 0.3:
-            patterns.append("Conversations often become tense")
-        elif moods.count('happy') > len(moods) * 0.5:
-            patterns.append("Usually positive interactions")
-        
-        return patterns
+        """Recurring topics and mood trends across the NPC's whole dialogue history"""
+        return self.patterns.describe(npc_id)
     
     def _build_npc_context(self, npc_id: str) -> Dict[str, Any]:
         """Build initial context for an NPC"""
@@ -92,6 +91,7 @@ class ContextManager:
             'relationship_context': self.get_relationship_context(npc_id),
             'conversation_summary': self.get_conversation_summary(npc_id),
             'conversation_patterns': self.detect_conversation_patterns(npc_id),
+            'long_term_memory': [s['summary'] for s in self.storage.get_dialogue_summaries(npc_id, limit=3)],
             'last_updated': datetime.now(),
             'session_start': datetime.now()
         }
@@ -112,9 +112,17 @@ class ContextManager:
     
     def clear_context(self, npc_id: str):
         """Clear context for an NPC"""
-        if npc_id in self.active_contexts:
-            del self.active_contexts[npc_id]
+        with self.locks.hold(npc_id):
+            with self._contexts_lock:
+                self.active_contexts.pop(npc_id, None)
     
     def get_all_active_contexts(self) -> Dict[str, Dict[str, Any]]:
         """Get all active contexts"""
-        return self.active_contexts.copy()
+        with self._contexts_lock:
+            return {npc_id: dict(context) for npc_id, context in self.active_contexts.items()}
+    
+    def memory_usage(self) -> Dict[str, Any]:
+        """Number of cached contexts and their approximate size"""
+        with self._contexts_lock:
+            contexts = list(self.active_contexts.items())
+        return {'contexts': len(contexts), 'approx_bytes': estimate_sizeof(contexts, len(contexts))}
@@ -0,0 +1,231 @@
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from config.settings import (
+    PATTERN_SIMILARITY, PATTERN_MIN_REPEATS, PATTERN_MAX_CLUSTERS,
+    PATTERN_HISTORY_LIMIT, PATTERN_MOOD_WINDOW, PATTERN_CACHE_NPCS
+)
+from models.dialogue_model import NON_PLAYER_DIALOGUE_TYPES
+from src.npc_storage import NPCStorage
+from src.lru_cache import LRUCache
+from src.memory_report import estimate_sizeof
+
+# Rough emotional valence per mood, for the trend; unknown moods count as neutral
+MOOD_VALENCE = {
+    'happy': 1.0, 'friendly': 1.0, 'grateful': 1.0, 'excited': 1.0, 'amused': 0.5, 'calm': 0.5,
+    'neutral': 0.0, 'curious': 0.0,
+    'suspicious': -0.5, 'sad': -0.5, 'afraid': -0.5, 'fearful': -0.5, 'annoyed': -0.5,
+    'angry': -1.0, 'hostile': -1.0
+}
+
+class _PatternState:
+    """Incremental analysis for one NPC: topic clusters and mood history"""
+
+    __slots__ = ('lock', 'watermark', 'since', 'seen', 'sums', 'unit', 'counts',
+                 'labels', 'first_seen', 'last_seen', 'moods', 'mood_counts', 'analyzed')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.watermark = None  # (count, newest timestamp) from the record store at last sync
+        self.since: Optional[str] = None
+        self.seen = set()  # ids stored at exactly ``since``, already analyzed
+        self.sums: Optional[np.ndarray] = None  # k x d, summed unit vectors per topic
+        self.unit: Optional[np.ndarray] = None  # k x d, normalized centroids
+        self.counts: List[int] = []
+        self.labels: List[str] = []
+        self.first_seen: List[str] = []
+        self.last_seen: List[str] = []
+        self.moods = deque(maxlen=max(PATTERN_MOOD_WINDOW * 2, 50))
+        self.mood_counts: Counter = Counter()
+        self.analyzed = 0
+
+class ConversationPatterns:
+    """Recurring topics and mood trends per NPC, built from stored dialogue.
+
+    Reuses the vectors Chroma already holds for npc_dialogues, so nothing is
+    re-embedded. Exchanges with the player (NPC-to-NPC chatter and ambient
+    barks are skipped) are clustered online (leader clustering): an exchange
+    joins the most similar topic if the cosine similarity clears
+    ``similarity``, otherwise it starts a new topic. Similarities against all
+    topics are one matrix-vector product.
+
+    State is kept per NPC and updated incrementally. Each call first compares
+    a cheap (count, newest timestamp) watermark from the record store, and only
+    reads and clusters exchanges it has not seen. Compacted exchanges keep
+    counting towards their topics.
+    """
+
+    def __init__(self, storage: NPCStorage,
+                 similarity: float = PATTERN_SIMILARITY,
+                 min_repeats: int = PATTERN_MIN_REPEATS,
+                 max_clusters: int = PATTERN_MAX_CLUSTERS,
+                 history_limit: int = PATTERN_HISTORY_LIMIT,
+                 mood_window: int = PATTERN_MOOD_WINDOW):
+        self.storage = storage
+        self.similarity = similarity
+        self.min_repeats = min_repeats
+        self.max_clusters = max_clusters
+        self.history_limit = history_limit
+        self.mood_window = mood_window
+
+        self._states = LRUCache(maxsize=PATTERN_CACHE_NPCS)
+        self._states_lock = threading.Lock()
+
+    def describe(self, npc_id: str) -> List[str]:
+        """Short pattern lines for the prompt (empty when nothing stands out)"""
+        try:
+            state = self._sync(npc_id)
+        except Exception as e:
+            print(f"⚠️ Pattern analysis failed for NPC {npc_id}: {e}")
+            return []
+
+        with state.lock:
+            patterns = [
+                f"Player keeps returning to \"{theme['label']}\" ({theme['count']} times)"
+                for theme in self._themes(state)[:3]
+            ]
+            total = sum(state.mood_counts.values())
+            if total:
+                if state.mood_counts['angry'] > total * 0.3:
+                    patterns.append("Conversations often become tense")
+                elif state.mood_counts['happy'] > total * 0.5:
+                    patterns.append("Usually positive interactions")
+            trend = self._mood_trend(state)
+            if trend['trend'] == 'warming':
+                patterns.append("Recent conversations have been warming up")
+            elif trend['trend'] == 'cooling':
+                patterns.append("Recent conversations have been getting tenser")
+        return patterns
+
+    def analyze(self, npc_id: str) -> Dict[str, Any]:
+        """Full report: every recurring topic, mood tallies and the trend"""
+        state = self._sync(npc_id)
+        with state.lock:
+            return {
+                'npc_id': npc_id,
+                'exchanges_analyzed': state.analyzed,
+                'topics': len(state.counts),
+                'recurring_topics': self._themes(state),
+                'mood_counts': dict(state.mood_counts),
+                'mood_trend': self._mood_trend(state)
+            }
+
+    def forget(self, npc_id: str):
+        self._states.invalidate(npc_id)
+
+    def memory_usage(self) -> Dict[str, Any]:
+        with self._states._lock:
+            states = [entry[1] for entry in self._states._data.values()]
+        vectors = sum(state.sums.nbytes * 2 for state in states if state.sums is not None)
+        return {
+            'npcs': len(states),
+            'topics': sum(len(state.counts) for state in states),
+            'approx_bytes': vectors + estimate_sizeof(
+                [(state.seen, state.labels, list(state.moods)) for state in states], len(states))
+        }
+
+    # ------------------------------------------------------------ Helpers
+
+    def _state(self, npc_id: str) -> _PatternState:
+        with self._states_lock:
+            state = self._states.get(npc_id)
+            if state is None:
+                state = _PatternState()
+                self._states.set(npc_id, state)
+            return state
+
+    def _sync(self, npc_id: str) -> _PatternState:
+        state = self._state(npc_id)
+        with state.lock:
+            watermark = self.storage.records.dialogue_watermark(npc_id)
+            if watermark == state.watermark:
+                return state
+
+            since = datetime.fromisoformat(state.since) if state.since else None
+            # Only exchanges with the player: NPC chatter and barks would surface as
+            # "Player keeps returning to ..." and skew the mood tallies
+            rows = self.storage.records.get_dialogues(npc_id, limit=self.history_limit, since=since,
+                                                      exclude_types=NON_PLAYER_DIALOGUE_TYPES)
+            fresh = [row for row in reversed(rows)  # oldest first
+                     if row['dialogue_id'] not in state.seen and row.get('player_input')]
+
+            if fresh:
+                vectors = self._vectors([row['dialogue_id'] for row in fresh])
+                for row in fresh:
+                    vector = vectors.get(row['dialogue_id'])
+                    if vector is not None:
+                        self._assign(state, vector, row)
+                    mood = (row.get('mood') or 'Neutral').lower()
+                    state.moods.append(MOOD_VALENCE.get(mood, 0.0))
+                    state.mood_counts[mood] += 1
+                state.analyzed += len(fresh)
+
+            if rows:
+                # The next read starts at this timestamp (inclusive), so only
+                # the ids sharing it need remembering
+                newest = rows[0]['timestamp']
+                if newest != state.since:
+                    state.since, state.seen = newest, set()
+                state.seen.update(row['dialogue_id'] for row in rows if row['timestamp'] == newest)
+            state.watermark = watermark
+            return state
+
+    def _vectors(self, dialogue_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored embeddings for these exchanges, unit-normalized"""
+        result = self.storage.dialogue_store.get(ids=dialogue_ids, include=["embeddings"])
+        embeddings = result.get('embeddings')
+        if embeddings is None or not len(embeddings):
+            return {}
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1.0, norms)
+        return dict(zip(result['ids'], matrix))
+
+    def _assign(self, state: _PatternState, vector: np.ndarray, row: Dict[str, Any]):
+        timestamp = row.get('timestamp', "")
+        if state.unit is not None and state.unit.shape[1] == vector.shape[0]:
+            similarities = state.unit @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity or len(state.counts) >= self.max_clusters:
+                state.sums[best] += vector
+                state.unit[best] = state.sums[best] / (np.linalg.norm(state.sums[best]) or 1.0)
+                state.counts[best] += 1
+                state.last_seen[best] = timestamp
+                return
+        elif state.unit is not None:
+            return  # embedding model changed dimension; old topics stay, new vectors are skipped
+
+        row_vector = vector[np.newaxis, :]
+        state.sums = row_vector.copy() if state.sums is None else np.vstack([state.sums, row_vector])
+        state.unit = row_vector.copy() if state.unit is None else np.vstack([state.unit, row_vector])
+        state.counts.append(1)
+        label = " ".join(row['player_input'].split())
+        state.labels.append(label if len(label) <= 60 else label[:57] + "...")
+        state.first_seen.append(timestamp)
+        state.last_seen.append(timestamp)
+
+    def _themes(self, state: _PatternState) -> List[Dict[str, Any]]:
+        themes = [
+            {'label': state.labels[i], 'count': count,
+             'first_seen': state.first_seen[i], 'last_seen': state.last_seen[i]}
+            for i, count in enumerate(state.counts) if count >= self.min_repeats
+        ]
+        return sorted(themes, key=lambda theme: (theme['count'], theme['last_seen']), reverse=True)
+
+    def _mood_trend(self, state: _PatternState) -> Dict[str, Any]:
+        moods = list(state.moods)
+        window = self.mood_window
+        if len(moods) < window * 2:
+            return {'trend': 'unknown', 'recent_valence': None, 'previous_valence': None}
+        recent = float(np.mean(moods[-window:]))
+        previous = float(np.mean(moods[-2 * window:-window]))
+        trend = 'steady'
+        if recent - previous >= 0.5:
+            trend = 'warming'
+        elif recent - previous <= -0.5:
+            trend = 'cooling'
+        return {'trend': trend, 'recent_valence': round(recent, 2), 'previous_valence': round(previous, 2)}
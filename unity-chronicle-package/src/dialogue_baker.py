@@ -0,0 +1,120 @@
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from config.settings import (
+    BAKE_DIALOGUE_TYPES, BAKE_DIALOGUE_STAGES, BAKE_MOODS, BAKE_REPUTATIONS,
+    BAKE_VARIANTS, BAKE_WORKERS, BAKE_PLAYER_PROMPTS
+)
+from models.npc_model import DialogueContext
+
+BAKE_FORMAT_VERSION = 2
+AXES = ("dialogue_type", "dialogue_stage", "mood", "player_reputation")
+
+class DialogueBaker:
+    """Pre-generates variant lines per NPC over a grid of dialogue contexts.
+
+    The output asset is compact, indexed JSON:
+        axes           - the values of each grid axis, in order
+        player_prompts - dialogue_type -> the canned player line the cells answer
+        strings        - deduplicated line table
+        npcs           - npc_id -> {"name", "lines": {"t.s.m.r": [string indices]}}
+    where "t.s.m.r" are indices into the axes. Unity serves a baked line only when
+    the player said nothing or the canned prompt; anything else goes to the live LLM.
+    """
+
+    def __init__(self, dialogue_engine,
+                 dialogue_types: Optional[List[str]] = None,
+                 dialogue_stages: Optional[List[str]] = None,
+                 moods: Optional[List[str]] = None,
+                 reputations: Optional[List[str]] = None,
+                 variants: int = BAKE_VARIANTS,
+                 workers: int = BAKE_WORKERS):
+        self.engine = dialogue_engine
+        self.axes = {
+            "dialogue_type": dialogue_types or BAKE_DIALOGUE_TYPES,
+            "dialogue_stage": dialogue_stages or BAKE_DIALOGUE_STAGES,
+            "mood": moods or BAKE_MOODS,
+            "player_reputation": reputations or BAKE_REPUTATIONS
+        }
+        self.variants = max(1, variants)
+        self.workers = max(1, workers)
+
+        unprompted = [t for t in self.axes['dialogue_type'] if self._player_prompt(t) is None]
+        if unprompted:
+            raise ValueError(f"No BAKE_PLAYER_PROMPTS entry for dialogue type(s): {', '.join(unprompted)}")
+
+    def bake(self, npc_ids: List[str]) -> Dict[str, Any]:
+        """Generate the table for the given NPCs"""
+        strings: List[str] = []
+        string_index: Dict[str, int] = {}
+        npcs: Dict[str, Any] = {}
+        started = time.perf_counter()
+
+        grid = list(itertools.product(*(range(len(self.axes[axis])) for axis in AXES)))
+
+        for npc_id in npc_ids:
+            npc_data = self.engine.storage.get_npc(npc_id)
+            if not npc_data:
+                print(f"⚠️ Skipping unknown NPC {npc_id}")
+                continue
+
+            print(f"🍞 Baking {len(grid) * self.variants} lines for {npc_data['npc']['name']}...")
+            jobs = [(cell, variant) for cell in grid for variant in range(self.variants)]
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                generated = list(pool.map(lambda job: self._generate(npc_data, job[0]), jobs))
+
+            lines: Dict[str, List[int]] = {}
+            for (cell, _), line in zip(jobs, generated):
+                if not line:
+                    continue
+                if line not in string_index:
+                    string_index[line] = len(strings)
+                    strings.append(line)
+                key = ".".join(str(i) for i in cell)
+                bucket = lines.setdefault(key, [])
+                if string_index[line] not in bucket:
+                    bucket.append(string_index[line])
+
+            npcs[npc_id] = {'name': npc_data['npc']['name'], 'lines': lines}
+
+        return {
+            'version': BAKE_FORMAT_VERSION,
+            'generated_at': datetime.now().isoformat(),
+            'axes': self.axes,
+            'player_prompts': {t: self._player_prompt(t) for t in self.axes['dialogue_type']},
+            'strings': strings,
+            'npcs': npcs,
+            'stats': {
+                'npcs': len(npcs),
+                'cells_per_npc': len(grid),
+                'unique_lines': len(strings),
+                'duration_seconds': round(time.perf_counter() - started, 2)
+            }
+        }
+
+    def write(self, table: Dict[str, Any], path: str):
+        """Write the asset without whitespace to keep it small"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(table, f, ensure_ascii=False, separators=(",", ":"))
+
+    def _player_prompt(self, dialogue_type: str) -> Optional[str]:
+        return BAKE_PLAYER_PROMPTS.get(dialogue_type.strip().upper().replace(" ", "_"))
+
+    def _generate(self, npc_data: Dict[str, Any], cell: tuple) -> str:
+        values = {axis: self.axes[axis][i] for axis, i in zip(AXES, cell)}
+        context = DialogueContext(**values)
+        player_input = self._player_prompt(values['dialogue_type'])
+        try:
+            return self.engine.generate_reply(npc_data, player_input, context, [])
+        except Exception as e:
+            # Nothing is baked for this cell; Unity asks the live model instead
+            print(f"⚠️ Bake failed for {npc_data['npc']['name']} {'/'.join(values.values())}: {e}")
+            return ""
@@ -1,23 +1,28 @@
 from typing import Dict, Any, List, Optional
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
-from datetime import datetime
 import json
 
+from config.settings import AMBIENT_MODEL_TIER
 from models.dialogue_model import DialogueEntry, ConversationHistory
 from models.npc_model import DialogueContext
 from src.npc_storage import NPCStorage
+from src.model_router import ModelRouter
+from src.memory_recall import MemoryRecall
+from src.conversation_patterns import ConversationPatterns
+from src.ambient_dialogue import AmbientDialogueGenerator
 
 class DialogueEngine:
-    def __init__(self, model_name: str = "llama3"):
-        self.llm = ChatOllama(
-            model=model_name,
-            base_url="http://localhost:11434",
-            temperature=0.7
-        )
+    def __init__(self, model_name: Optional[str] = None, storage: Optional[NPCStorage] = None):
+        # Per-turn model choice by dialogue type/stage and NPC importance; an
+        # explicit model_name overrides the default tier, otherwise MODEL_TIERS decides
+        self.router = ModelRouter(default_model=model_name) if model_name else ModelRouter()
         
-        self.storage = NPCStorage()
-        print(f"Dialogue Engine initialized with {model_name}")
+        self.storage = storage or NPCStorage()
+        self.memory = MemoryRecall(self.storage)
+        self.patterns = ConversationPatterns(self.storage)
+        self.locks = self.storage.locks
+        self.ambient = AmbientDialogueGenerator(self.router.client(AMBIENT_MODEL_TIER), self.storage)
+        print(f"Dialogue Engine initialized with {self.router.tiers[self.router.default_tier]['model']}")
     
     
     def generate_dialogue(self, 
@@ -25,22 +30,48 @@ class DialogueEngine:
                          player_input: str,
                          dialogue_context: DialogueContext,
                          additional_context: Dict[str, Any] = None) -> str:
-        """Generate NPC response to player input"""
-        
+        """Generate NPC response to player input.
+
+        Turns for the same NPC run one at a time in arrival order so history
+        reads and the dialogue write never interleave; other NPCs run in parallel.
+        """
+        with self.locks.hold(npc_id):
+            return self._generate_turn(npc_id, player_input, dialogue_context, additional_context)
+    
+    def _generate_turn(self,
+                       npc_id: str,
+                       player_input: str,
+                       dialogue_context: DialogueContext,
+                       additional_context: Dict[str, Any] = None) -> str:
         # Get NPC data
         npc_data = self.storage.get_npc(npc_id)
         if not npc_data:
             return "ERROR: NPC not found"
         
-        # Get conversation history
-        dialogue_history = self.storage.get_npc_dialogue_history(npc_id, limit=5)
+        # Get conversation history (most recent first)
+        dialogue_history = self.storage.get_npc_dialogue_history(npc_id, limit=3)
+        
+        # Recall older exchanges relevant to what the player just said
+        memories = self.recall_memories(npc_id, player_input, dialogue_history)
+        
+        # Recurring topics and mood trend (incremental; cheap when nothing changed)
+        patterns = self.patterns.describe(npc_id)
         
         # Generate response
         npc_response = self._generate_contextual_response(
-            npc_data, player_input, dialogue_context, dialogue_history, additional_context
+            npc_data, player_input, dialogue_context, dialogue_history, additional_context, memories, patterns
         )
         
-        # Store the dialogue
+        self.store_turn(npc_id, player_input, npc_response, dialogue_context, additional_context)
+        return npc_response
+    
+    def store_turn(self,
+                   npc_id: str,
+                   player_input: str,
+                   npc_response: str,
+                   dialogue_context: DialogueContext,
+                   additional_context: Dict[str, Any] = None) -> DialogueEntry:
+        """Persist one exchange and count the interaction (caller holds the NPC lock)"""
         dialogue_entry = DialogueEntry(
             npc_id=npc_id,
             player_input=player_input,
@@ -57,21 +88,69 @@ class DialogueEngine:
             mood=dialogue_context.mood
         )
         
-        self.storage.store_dialogue(dialogue_entry)
+        # The interaction count is written in the same transaction as the exchange
+        self.storage.store_dialogue(dialogue_entry, count_interaction=True)
         
-        # Update NPC interaction count
-        self._update_npc_interaction(npc_id)
-        
-        return npc_response
+        return dialogue_entry
+    
+    def generate_ambient_dialogue(self,
+                                  npc_ids: List[str],
+                                  scene_context: Dict[str, Any],
+                                  mode: str = "concurrent",
+                                  persist: bool = False) -> Dict[str, Any]:
+        """Generate short background lines for a crowd of NPCs in one call"""
+        return self.ambient.generate(npc_ids, scene_context, mode=mode, persist=persist)
+    
+    def memory_usage(self) -> Dict[str, Any]:
+        """Caches owned by the engine (storage is reported separately)"""
+        return {'ambient_cache': self.ambient.cache.memory_usage(),
+                'conversation_patterns': self.patterns.memory_usage()}
+    
+    def get_model_tier_stats(self) -> Dict[str, Any]:
+        """Calls, errors and latency per model tier"""
+        return self.router.stats()
     
     def _generate_contextual_response(self, 
                                     npc_data: Dict[str, Any],
                                     player_input: str,
                                     context: DialogueContext,
                                     history: List[DialogueEntry],
-                                    additional_context: Dict[str, Any] = None) -> str:
-        """Generate contextually appropriate response"""
-        
+                                    additional_context: Dict[str, Any] = None,
+                                    memories: List[Dict[str, Any]] = None,
+                                    patterns: List[str] = None) -> str:
+        """Generate contextually appropriate response (an in-character fallback if the model fails)"""
+        try:
+            return self.generate_reply(
+                npc_data, player_input, context, history, additional_context, memories, patterns
+            )
+        except Exception as e:
+            print(f"Error generating dialogue: {e}")
+            return f"*{npc_data['npc']['name']} seems distracted and doesn't respond clearly.*"
+    
+    def generate_reply(self,
+                       npc_data: Dict[str, Any],
+                       player_input: str,
+                       context: DialogueContext,
+                       history: List[DialogueEntry],
+                       additional_context: Dict[str, Any] = None,
+                       memories: List[Dict[str, Any]] = None,
+                       patterns: List[str] = None) -> str:
+        """The model's reply for one turn; raises when the model call fails"""
+        formatted_prompt = self.build_prompt(
+            npc_data, player_input, context, history, additional_context, memories, patterns
+        )
+        tier = self.router.select(context, npc_data)
+        return self.router.invoke(tier, formatted_prompt).content.strip()
+    
+    def build_prompt(self,
+                     npc_data: Dict[str, Any],
+                     player_input: str,
+                     context: DialogueContext,
+                     history: List[DialogueEntry],
+                     additional_context: Dict[str, Any] = None,
+                     memories: List[Dict[str, Any]] = None,
+                     patterns: List[str] = None) -> str:
+        """Full dialogue prompt for one turn"""
         npc = npc_data['npc']
         world = npc_data['world']
         behavior = npc_data['behavior']
@@ -81,9 +160,11 @@ class DialogueEngine:
         if history:
             history_text = "\n".join([
                 f"Player: {entry.player_input}\n{npc['name']}: {entry.npc_response}"
-                for entry in reversed(history[-3:])  # Last 3 exchanges
+                for entry in reversed(history[:3])  # Last 3 exchanges, oldest first
             ])
         
+        memories_text = self.memory.format_memories(memories, npc['name']) if memories else ""
+        
         dialogue_prompt = ChatPromptTemplate.from_template("""
 You are {name}, a {race_species} {profession_role} in {location} ({world_theme}).
 
@@ -117,6 +198,12 @@ BEHAVIOR NOTES:
 - Available Services: {available_services}
 - Trade Items: {trade_items}
 
+RELEVANT MEMORIES (older conversations related to what the player is saying):
+{memories}
+
+CONVERSATION PATTERNS:
+{patterns}
+
 CONVERSATION HISTORY:
 {history}
 
@@ -135,11 +222,13 @@ INSTRUCTIONS:
 7. Response should be 1-3 sentences unless the situation calls for more
 8. Use your dialogue style and speech patterns
 9. Consider your fears and motivations in your response
+10. Draw on relevant memories only when they fit naturally
+11. If the player keeps returning to a topic, you may react to that as {name} would
 
 RESPOND AS {name}:
 """)
         
-        formatted_prompt = dialogue_prompt.format(
+        return dialogue_prompt.format(
             name=npc['name'],
             race_species=npc['race_species'],
             profession_role=npc['profession_role'],
@@ -149,9 +238,9 @@ RESPOND AS {name}:
             alignment=npc['alignment'],
             faction=npc['faction'],
             backstory=npc['backstory'][:300] + "..." if len(npc['backstory']) > 300 else npc['backstory'],
-            dialogue_style=npc.get('dialogue_style', 'Standard'),
-            motivations=npc.get('motivations', 'Unknown'),
-            fears=npc.get('fears', 'Unknown'),
+            dialogue_style=npc.get('dialogue_style') or 'Standard',
+            motivations=npc.get('motivations') or 'Unknown',
+            fears=npc.get('fears') or 'Unknown',
             skills=', '.join(npc['skills']),
             environment=world['environment'],
             tech_level=world['tech_level'],
@@ -167,22 +256,26 @@ RESPOND AS {name}:
             available_services=', '.join(behavior['available_services']),
             trade_items=', '.join(behavior['trade_items']),
             history=history_text or "This is your first conversation.",
+            memories=memories_text or "Nothing comes to mind.",
+            patterns="\n".join(f"- {pattern}" for pattern in patterns) if patterns else "Nothing stands out yet.",
             additional_context=json.dumps(additional_context or {}, indent=2),
             player_input=player_input
         )
-        
+    
+    def recall_memories(self, npc_id: str, player_input: str,
+                         history: List[DialogueEntry]) -> List[Dict[str, Any]]:
+        """Embed the player input once for this turn and recall related past exchanges"""
+        if not history:
+            return []
         try:
-            response = self.llm.invoke(formatted_prompt)
-            return response.content.strip()
+            query_embedding = self.storage.embeddings.embed_query(player_input)
         except Exception as e:
-            print(f"Error generating dialogue: {e}")
-            return f"*{npc['name']} seems distracted and doesn't respond clearly.*"
-    
-    def _update_npc_interaction(self, npc_id: str):
-        """Update NPC interaction count and last interaction time"""
-        # This would update the NPC's metadata in storage
-        # For now, we'll just log it
-        print(f"📝 Updated interaction count for NPC {npc_id}")
+            print(f"⚠️ Could not embed player input for memory recall: {e}")
+            return []
+        
+        # Exchanges already in the prompt's recent history are not repeated
+        shown = {entry.timestamp.isoformat() for entry in history}
+        return self.memory.recall(npc_id, query_embedding, exclude_timestamps=shown)
     
     def get_conversation_summary(self, npc_id: str) -> str:
         """Get a summary of the conversation with an NPC"""
@@ -0,0 +1,252 @@
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Callable
+
+from langchain_core.documents import Document
+
+from config.settings import (
+    DIALOGUE_RETENTION_KEEP_RECENT, DIALOGUE_COMPACTION_BATCH,
+    DIALOGUE_COMPACTION_MIN_AGE_HOURS, DIALOGUE_COMPACTION_INTERVAL, DIALOGUE_ARCHIVE_DIR,
+    DIALOGUE_SUMMARY_TIER
+)
+from models.dialogue_model import NON_PLAYER_DIALOGUE_TYPES
+from src.npc_storage import NPCStorage
+
+@dataclass
+class RetentionPolicy:
+    keep_recent: int = DIALOGUE_RETENTION_KEEP_RECENT        # raw exchanges kept per NPC
+    batch_size: int = DIALOGUE_COMPACTION_BATCH              # exchanges collapsed into one summary
+    min_age_hours: float = DIALOGUE_COMPACTION_MIN_AGE_HOURS # never compact younger exchanges
+    archive_dir: str = DIALOGUE_ARCHIVE_DIR
+
+@dataclass
+class CompactionReport:
+    npcs_compacted: int = 0
+    dialogues_archived: int = 0
+    summaries_created: int = 0
+    archived_bytes: int = 0     # compressed bytes appended to cold storage
+    reclaimed_bytes: int = 0    # raw text, payload and vector bytes removed from hot storage
+    duration_seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def extractive_summary(npc_id: str, dialogues: List[Dict[str, Any]]) -> str:
+    """Cheap summary of a batch of exchanges without an LLM call"""
+    start = dialogues[0]['timestamp'][:10]
+    end = dialogues[-1]['timestamp'][:10]
+    moods = Counter(d.get('mood', 'Neutral') for d in dialogues)
+    types = Counter(d.get('dialogue_type', 'CONVERSATION') for d in dialogues)
+
+    topics = []
+    for d in dialogues:
+        topic = d['player_input'].strip()[:60]
+        if topic and topic.lower() not in (t.lower() for t in topics):
+            topics.append(topic)
+        if len(topics) >= 5:
+            break
+
+    return "\n".join([
+        f"Memory of {len(dialogues)} earlier exchanges ({start} to {end}).",
+        f"Moods: {', '.join(f'{m} x{c}' for m, c in moods.most_common())}",
+        f"Dialogue types: {', '.join(f'{t} x{c}' for t, c in types.most_common())}",
+        f"Player talked about: {' | '.join(topics)}",
+        f"Last thing the NPC said: {dialogues[-1]['npc_response'][:160]}"
+    ])
+
+def make_llm_summarizer(llm) -> Callable[[str, List[Dict[str, Any]]], str]:
+    """Summarizer that asks the chat model, falling back to the extractive one"""
+    def summarize(npc_id: str, dialogues: List[Dict[str, Any]]) -> str:
+        transcript = "\n".join(
+            f"Player: {d['player_input']}\nNPC: {d['npc_response']}" for d in dialogues
+        )
+        prompt = (
+            "Summarize these past exchanges between a player and an NPC in 3-5 sentences, "
+            "from the NPC's point of view. Keep names, promises, quests and feelings.\n\n"
+            f"{transcript}\n\nSUMMARY:"
+        )
+        try:
+            return llm.invoke(prompt).content.strip()
+        except Exception as e:
+            print(f"⚠️ LLM summary failed, using extractive summary: {e}")
+            return extractive_summary(npc_id, dialogues)
+
+    return summarize
+
+def build_summarizer(router=None, tier: str = DIALOGUE_SUMMARY_TIER) -> Callable[[str, List[Dict[str, Any]]], str]:
+    """LLM summarizer on the given model tier when one is configured, else the extractive one"""
+    if tier and router is not None:
+        return make_llm_summarizer(router.client(tier))
+    return extractive_summary
+
+class DialogueRetention:
+    """Keeps npc_dialogues bounded.
+
+    Per NPC, the newest ``keep_recent`` exchanges stay raw. Older exchanges are
+    appended to a gzip JSONL archive, collapsed into summarized memory records
+    and removed from the vector index.
+    """
+
+    def __init__(self, storage: NPCStorage, policy: Optional[RetentionPolicy] = None,
+                 summarizer: Optional[Callable[[str, List[Dict[str, Any]]], str]] = None):
+        self.storage = storage
+        self.policy = policy or RetentionPolicy()
+        self.summarizer = summarizer or extractive_summary
+        self.last_report: Optional[CompactionReport] = None
+
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def compact(self, npc_ids: Optional[List[str]] = None) -> CompactionReport:
+        """Compact the given NPCs, or every NPC over the retention window"""
+        report = CompactionReport()
+        started = time.perf_counter()
+
+        with self._run_lock:
+            if npc_ids is None:
+                npc_ids = self.storage.records.npcs_over_retention(self.policy.keep_recent)
+
+            for npc_id in npc_ids:
+                if self._stop.is_set() and threading.current_thread() is self._worker:
+                    break  # stop_background() is waiting; the rest waits for the next run
+                try:
+                    if self._compact_npc(npc_id, report):
+                        report.npcs_compacted += 1
+                except Exception as e:
+                    report.errors.append(f"{npc_id}: {e}")
+                    print(f"⚠️ Compaction failed for NPC {npc_id}: {e}")
+
+        report.duration_seconds = round(time.perf_counter() - started, 3)
+        self.last_report = report
+        if report.dialogues_archived:
+            print(f"🗜️ Compacted {report.dialogues_archived} dialogues into {report.summaries_created} "
+                  f"summaries, reclaimed ~{report.reclaimed_bytes // 1024} KB")
+        return report
+
+    def start_background(self, interval: float = DIALOGUE_COMPACTION_INTERVAL):
+        """Run compaction periodically on a daemon thread"""
+        if interval <= 0 or (self._worker and self._worker.is_alive()):
+            return
+
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.compact()
+
+        self._worker = threading.Thread(target=loop, name="dialogue-compaction", daemon=True)
+        self._worker.start()
+
+    def stop_background(self):
+        """Stop the periodic run, waiting for the NPC being compacted to finish"""
+        self._stop.set()
+        worker = self._worker
+        if worker and worker.is_alive() and worker is not threading.current_thread():
+            worker.join()
+
+    def read_archive(self, npc_id: str):
+        """Iterate archived raw dialogues for an NPC, oldest first"""
+        path = self._archive_path(npc_id)
+        if not os.path.exists(path):
+            return
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def _compact_npc(self, npc_id: str, report: CompactionReport) -> bool:
+        cutoff = datetime.now() - timedelta(hours=self.policy.min_age_hours)
+        candidates = self.storage.records.get_compactable_dialogues(npc_id, self.policy.keep_recent, cutoff)
+
+        # Only full batches, so every summary covers the same span of history
+        batch_size = max(1, self.policy.batch_size)
+        usable = len(candidates) - len(candidates) % batch_size
+        if not usable:
+            return False
+
+        for i in range(0, usable, batch_size):
+            batch = candidates[i:i + batch_size]
+            dialogue_ids = [d['dialogue_id'] for d in batch]
+
+            # 1. Measure what leaves the hot index
+            hot = self.storage.dialogue_store.get(ids=dialogue_ids, include=["documents", "embeddings"])
+            embeddings = hot.get('embeddings')
+            if embeddings is None:
+                embeddings = []
+            reclaimed = sum(len(json.dumps(d)) for d in batch)
+            for document, embedding in zip(hot.get('documents') or [], embeddings):
+                reclaimed += len((document or "").encode("utf-8")) + len(embedding) * 4
+
+            # 2. Summarized memory record replaces the player exchanges; NPC-to-NPC
+            # chatter and ambient barks are archived and dropped without one
+            exchanges = [d for d in batch if d.get('dialogue_type') not in NON_PLAYER_DIALOGUE_TYPES]
+            if exchanges:
+                self._summarize_batch(npc_id, exchanges, dialogue_ids)
+                report.summaries_created += 1
+            else:
+                self.storage.records.delete_dialogues(dialogue_ids)
+
+            # 3. Cold archive only once the swap has committed, so a failed batch
+            # is never archived twice. The raw vectors go last: until the
+            # archive is written they are the only other copy of the text.
+            report.archived_bytes += self._archive(npc_id, batch)
+            self.storage.dialogue_store.delete(ids=dialogue_ids)
+
+            report.reclaimed_bytes += reclaimed
+            report.dialogues_archived += len(batch)
+
+        return True
+
+    def _summarize_batch(self, npc_id: str, exchanges: List[Dict[str, Any]], dialogue_ids: List[str]):
+        """Write the summary of ``exchanges`` and swap it in for every row of the batch"""
+        summary_id = f"summary_{uuid.uuid4().hex[:8]}"
+        summary_text = self.summarizer(npc_id, exchanges)
+        summary_data = {
+            'npc_id': npc_id,
+            'summary': summary_text,
+            'start_time': exchanges[0]['timestamp'],
+            'end_time': exchanges[-1]['timestamp'],
+            'exchange_count': len(exchanges),
+            'moods': dict(Counter(d.get('mood', 'Neutral') for d in exchanges))
+        }
+        self.storage.dialogue_store.add_documents([Document(
+            page_content=summary_text,
+            metadata={
+                "npc_id": npc_id,
+                "dialogue_id": summary_id,
+                "type": "dialogue_summary",
+                "timestamp": summary_data['end_time'],
+                "start_time": summary_data['start_time'],
+                "exchange_count": len(exchanges)
+            }
+        )], ids=[summary_id])
+        try:
+            self.storage.records.replace_with_summary(dialogue_ids, summary_id, summary_data)
+        except Exception:
+            # Rows stay hot and get summarized again next run; don't leave a twin summary behind
+            self.storage.dialogue_store.delete(ids=[summary_id])
+            raise
+
+    def _archive(self, npc_id: str, dialogues: List[Dict[str, Any]]) -> int:
+        """Append raw dialogues to the NPC's gzip JSONL archive, returns bytes written"""
+        os.makedirs(self.policy.archive_dir, exist_ok=True)
+        path = self._archive_path(npc_id)
+        size_before = os.path.getsize(path) if os.path.exists(path) else 0
+
+        # Each append is a new gzip member; gzip readers stream them back to back
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for d in dialogues:
+                f.write(json.dumps(d) + "\n")
+
+        return os.path.getsize(path) - size_before
+
+    def _archive_path(self, npc_id: str) -> str:
+        return os.path.join(self.policy.archive_dir, f"{npc_id}.jsonl.gz")
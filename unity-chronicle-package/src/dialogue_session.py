@@ -0,0 +1,242 @@
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+from config.settings import (
+    DIALOGUE_SESSION_MAX, DIALOGUE_SESSION_IDLE_SECONDS, DIALOGUE_SESSION_HISTORY, DIALOGUE_SESSION_RECALL
+)
+from models.codec import to_record, VERSION_KEY
+from models.dialogue_model import DialogueEntry
+from models.npc_model import DialogueContext
+from src.memory_report import estimate_sizeof
+
+CONTEXT_FIELDS = ('dialogue_type', 'dialogue_stage', 'mood', 'player_reputation', 'quest_state', 'conditions')
+
+class SessionLimitReached(RuntimeError):
+    """Too many dialogue sessions are open in this process"""
+
+class DialogueSession:
+    """One open conversation with an NPC.
+
+    The NPC record, dialogue context, model tier and recent history are loaded
+    once and kept in memory, so a turn only recalls memories (optional) and
+    calls the model. The engine is passed per call so a save slot's shard can
+    be closed and reopened between turns without breaking the session.
+    """
+
+    def __init__(self, npc_id: str, save_slot: Optional[str] = None,
+                 context: Optional[DialogueContext] = None,
+                 additional_context: Optional[Dict[str, Any]] = None):
+        self.session_id = f"sess_{uuid.uuid4().hex[:12]}"
+        self.npc_id = npc_id
+        self.save_slot = save_slot
+        self.context = context or DialogueContext()
+        self.additional_context = dict(additional_context or {})
+
+        self.npc_data: Optional[Dict[str, Any]] = None
+        self.history: List[DialogueEntry] = []
+        self.tier: Optional[str] = None
+        self.turns = 0
+        self.opened_at = datetime.now()
+        self.last_active = time.monotonic()
+
+    def load(self, engine):
+        """(Re)read the NPC record and recent history from storage"""
+        npc_data = engine.storage.get_npc(self.npc_id)
+        if not npc_data:
+            raise KeyError(f"NPC {self.npc_id} not found")
+        self.npc_data = npc_data
+        self.history = engine.storage.get_npc_dialogue_history(self.npc_id, limit=DIALOGUE_SESSION_HISTORY)
+        self.tier = engine.router.select(self.context, npc_data)
+
+    def update_context(self, engine, changes: Dict[str, Any]):
+        """Apply DialogueContext field changes (mood, stage...) and re-pick the model tier"""
+        for key in CONTEXT_FIELDS:
+            if key in changes:
+                setattr(self.context, key, changes[key])
+        if isinstance(changes.get('additional_context'), dict):
+            self.additional_context.update(changes['additional_context'])
+        self.tier = engine.router.select(self.context, self.npc_data)
+
+    def turn(self, engine, player_input: str, on_token: Callable[[str], None]) -> str:
+        """Stream one NPC reply through ``on_token`` and store the exchange"""
+        self.last_active = time.monotonic()
+        with engine.locks.hold(self.npc_id):
+            memories = engine.recall_memories(self.npc_id, player_input, self.history) if DIALOGUE_SESSION_RECALL else []
+            prompt = engine.build_prompt(
+                self.npc_data, player_input, self.context, self.history, self.additional_context, memories,
+                engine.patterns.describe(self.npc_id)
+            )
+
+            pieces = []
+            try:
+                for piece in engine.router.stream(self.tier, prompt):
+                    pieces.append(piece)
+                    on_token(piece)
+            except Exception as e:
+                if pieces:
+                    raise  # the client already shows a partial line; don't store it
+                print(f"Error generating dialogue: {e}")
+                pieces = [f"*{self.npc_data['npc']['name']} seems distracted and doesn't respond clearly.*"]
+                on_token(pieces[0])
+            response = "".join(pieces).strip()
+
+            entry = engine.store_turn(self.npc_id, player_input, response, self.context, self.additional_context)
+            self.history = ([entry] + self.history)[:DIALOGUE_SESSION_HISTORY]
+            self.turns += 1
+        self.last_active = time.monotonic()
+        return response
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'npc_id': self.npc_id,
+            'npc_name': self.npc_data['npc']['name'] if self.npc_data else None,
+            'save_slot': self.save_slot,
+            'tier': self.tier,
+            'context': {k: v for k, v in to_record(self.context).items() if k != VERSION_KEY},
+            'additional_context': self.additional_context,
+            'turns': self.turns,
+            'opened_at': self.opened_at.isoformat(),
+            'idle_seconds': round(time.monotonic() - self.last_active, 1)
+        }
+
+class DialogueSessionManager:
+    """Open sessions in this process, capped at ``max_sessions``"""
+
+    def __init__(self, max_sessions: int = DIALOGUE_SESSION_MAX):
+        self.max_sessions = max_sessions
+        self._sessions: Dict[str, DialogueSession] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def open(self, npc_id: str, save_slot: Optional[str] = None,
+             context: Optional[DialogueContext] = None,
+             additional_context: Optional[Dict[str, Any]] = None) -> DialogueSession:
+        session = DialogueSession(npc_id, save_slot, context, additional_context)
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitReached(f"{self.max_sessions} dialogue sessions already open")
+            self._sessions[session.session_id] = session
+            self.opened += 1
+        return session
+
+    def close(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [session.describe() for session in sessions]
+
+    def memory_usage(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        pinned = [(s.npc_data, s.history, s.additional_context) for s in sessions]
+        return {'sessions': len(sessions), 'opened_total': self.opened,
+                'approx_bytes': estimate_sizeof(pinned, len(pinned))}
+
+_manager: Optional[DialogueSessionManager] = None
+_manager_lock = threading.Lock()
+
+def get_dialogue_sessions() -> DialogueSessionManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = DialogueSessionManager()
+        return _manager
+
+def _context_from(message: Dict[str, Any]) -> DialogueContext:
+    return DialogueContext(**{key: message[key] for key in CONTEXT_FIELDS if key in message})
+
+def serve_websocket(ws, slot_services, manager: Optional[DialogueSessionManager] = None,
+                    idle_seconds: float = DIALOGUE_SESSION_IDLE_SECONDS):
+    """Drive one WebSocket connection (one session) until it closes.
+
+    Client -> server (JSON text frames):
+        {"type": "open", "npc_id", "save_slot"?, <DialogueContext fields>?, "additional_context"?}
+        {"type": "turn", "player_input", "turn_id"?, "context"?: {<changes>}}
+        {"type": "context", <DialogueContext fields / additional_context to change>}
+        {"type": "refresh"}   re-read the NPC record and history (e.g. after /update_npc)
+        {"type": "close"}
+    Server -> client:
+        opened / context / refreshed (session description), token {turn_id, text},
+        turn_end {turn_id, response, tier, duration_ms}, error {error, turn_id}, closed
+    """
+    manager = manager or get_dialogue_sessions()
+    session: Optional[DialogueSession] = None
+
+    def send(message: Dict[str, Any]):
+        ws.send(json.dumps(message, default=str))
+
+    try:
+        while True:
+            raw = ws.receive(timeout=idle_seconds or None)
+            if raw is None:
+                send({'type': 'closed', 'reason': 'idle'})
+                break
+            try:
+                message = json.loads(raw)
+                if not isinstance(message, dict):
+                    raise ValueError("Messages must be JSON objects")
+            except ValueError as e:
+                send({'type': 'error', 'error': str(e)})
+                continue
+
+            kind = message.get('type')
+            try:
+                if kind == 'open':
+                    if session is not None:
+                        raise ValueError("A session is already open on this connection")
+                    session = manager.open(message['npc_id'], message.get('save_slot'),
+                                           _context_from(message), message.get('additional_context'))
+                    try:
+                        with slot_services(session.save_slot) as get:
+                            session.load(get('dialogue_engine'))
+                    except Exception:
+                        manager.close(session.session_id)
+                        session = None
+                        raise
+                    print(f"💬 Opened dialogue session {session.session_id} with {session.npc_id}")
+                    send({'type': 'opened', **session.describe()})
+                elif kind == 'close':
+                    send({'type': 'closed', 'reason': 'client'})
+                    break
+                elif session is None:
+                    raise ValueError("Send an 'open' message first")
+                elif kind == 'turn':
+                    turn_id = message.get('turn_id', session.turns + 1)
+                    started = time.perf_counter()
+                    with slot_services(session.save_slot) as get:
+                        engine = get('dialogue_engine')
+                        if message.get('context'):
+                            session.update_context(engine, message['context'])
+                        response = session.turn(
+                            engine, message['player_input'],
+                            lambda piece: send({'type': 'token', 'turn_id': turn_id, 'text': piece})
+                        )
+                    send({'type': 'turn_end', 'turn_id': turn_id, 'response': response, 'tier': session.tier,
+                          'duration_ms': round((time.perf_counter() - started) * 1000, 1)})
+                elif kind == 'context':
+                    with slot_services(session.save_slot) as get:
+                        session.update_context(get('dialogue_engine'), message)
+                    send({'type': 'context', **session.describe()})
+                elif kind == 'refresh':
+                    with slot_services(session.save_slot) as get:
+                        session.load(get('dialogue_engine'))
+                    send({'type': 'refreshed', **session.describe()})
+                else:
+                    raise ValueError(f"Unknown message type '{kind}'")
+            except Exception as e:
+                send({'type': 'error', 'error': str(e), 'turn_id': message.get('turn_id')})
+    except Exception as e:
+        # The client went away mid-message; nothing left to tell it
+        print(f"💬 Dialogue session connection ended: {e}")
+    finally:
+        if session is not None:
+            manager.close(session.session_id)
+            print(f"💬 Closed dialogue session {session.session_id} after {session.turns} turns")
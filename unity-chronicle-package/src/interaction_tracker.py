@@ -0,0 +1,132 @@
+import atexit
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from config.settings import INTERACTION_FLUSH_THRESHOLD, INTERACTION_FLUSH_INTERVAL
+from src.record_store import RecordStore
+
+def _add_event(deltas: Dict[str, Dict[str, Any]], npc_id: str, mood: str, timestamp_iso: str):
+    delta = deltas.setdefault(npc_id, {
+        'count': 0, 'last_interaction': '', 'last_mood': None, 'moods': {}
+    })
+    delta['count'] += 1
+    if timestamp_iso >= delta['last_interaction']:
+        delta['last_interaction'] = timestamp_iso
+        delta['last_mood'] = mood
+    delta['moods'][mood] = delta['moods'].get(mood, 0) + 1
+
+def interaction_deltas(events: Iterable[Tuple[str, str, datetime]]) -> Dict[str, Dict[str, Any]]:
+    """Deltas for RecordStore.apply_interaction_deltas from (npc_id, mood, timestamp) events"""
+    deltas: Dict[str, Dict[str, Any]] = {}
+    for npc_id, mood, timestamp in events:
+        _add_event(deltas, npc_id, mood, timestamp.isoformat())
+    return deltas
+
+class InteractionTracker:
+    """Per-NPC interaction counters with write coalescing.
+
+    ``record`` only touches an in-memory delta; deltas are flushed to the
+    record store as one atomic batch once enough events pile up, on a timer,
+    when the storage closes (shard eviction included), or at interpreter exit.
+    Reads merge persisted and pending values so they are always exact.
+
+    Pending deltas do not survive a crash: up to ``flush_threshold`` events or
+    ``flush_interval`` seconds of them can be lost. Dialogue turns therefore
+    don't go through here - NPCStorage.store_dialogues(count_interactions=True)
+    writes their counters in the same transaction as the exchange itself.
+    """
+
+    def __init__(self, records: RecordStore,
+                 flush_threshold: int = INTERACTION_FLUSH_THRESHOLD,
+                 flush_interval: float = INTERACTION_FLUSH_INTERVAL):
+        self.records = records
+        self.flush_threshold = flush_threshold
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._pending_events = 0
+        self._stop = threading.Event()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="interaction-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def record(self, npc_id: str, mood: str, timestamp: Optional[datetime] = None):
+        """Count one interaction with an NPC"""
+        timestamp_iso = (timestamp or datetime.now()).isoformat()
+
+        with self._lock:
+            _add_event(self._pending, npc_id, mood, timestamp_iso)
+            self._pending_events += 1
+            due = self._pending_events >= self.flush_threshold
+
+        if due:
+            self.flush()
+
+    def get_stats(self, npc_id: str) -> Dict[str, Any]:
+        """Current counters for an NPC, including not-yet-flushed interactions"""
+        # Holding the flush lock keeps a concurrent flush from moving the delta
+        # between the two reads
+        with self._flush_lock:
+            stats = self.records.get_interaction_stats(npc_id)
+            with self._lock:
+                delta = self._pending.get(npc_id)
+                if delta:
+                    delta = {**delta, 'moods': dict(delta['moods'])}
+
+        if delta:
+            stats['interaction_count'] += delta['count']
+            if not stats['last_interaction'] or delta['last_interaction'] >= stats['last_interaction']:
+                stats['last_interaction'] = delta['last_interaction']
+                stats['last_mood'] = delta['last_mood']
+            for mood, count in delta['moods'].items():
+                stats['mood_counts'][mood] = stats['mood_counts'].get(mood, 0) + count
+
+        return stats
+
+    def flush(self):
+        """Write all pending deltas in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_events = 0
+
+            if not pending:
+                return
+
+            try:
+                self.records.apply_interaction_deltas(pending)
+            except Exception as e:
+                print(f"⚠️ Failed to flush interaction counters: {e}")
+                self._requeue(pending)
+
+    def memory_usage(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'pending_npcs': len(self._pending), 'pending_events': self._pending_events}
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def _requeue(self, pending: Dict[str, Dict[str, Any]]):
+        """Merge deltas back so a failed flush is retried later"""
+        with self._lock:
+            for npc_id, delta in pending.items():
+                self._pending_events += delta['count']
+                current = self._pending.get(npc_id)
+                if not current:
+                    self._pending[npc_id] = delta
+                    continue
+                current['count'] += delta['count']
+                if delta['last_interaction'] > current['last_interaction']:
+                    current['last_interaction'] = delta['last_interaction']
+                    current['last_mood'] = delta['last_mood']
+                for mood, count in delta['moods'].items():
+                    current['moods'][mood] = current['moods'].get(mood, 0) + count
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
@@ -0,0 +1,127 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+
+from src.memory_report import estimate_sizeof
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def normalize_name(name: str) -> str:
+    return " ".join(tokenize(name))
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over NPC searchable text.
+
+    Also keeps a normalized-name lookup so exact name queries ("Barnaby")
+    resolve with a dictionary hit instead of an embedding call.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)  # term -> {doc_id: tf}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._names: Dict[str, set] = defaultdict(set)
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, doc_id: str, text: str, metadata: Dict[str, Any]):
+        """Index (or re-index) a document"""
+        with self._lock:
+            self.remove(doc_id)
+
+            terms = Counter(tokenize(text))
+            for term, tf in terms.items():
+                self._postings[term][doc_id] = tf
+            self._doc_terms[doc_id] = terms
+            self._doc_lengths[doc_id] = sum(terms.values())
+            self._total_length += self._doc_lengths[doc_id]
+
+            self._metadata[doc_id] = dict(metadata)
+            self._names[normalize_name(metadata.get('name', ''))].add(doc_id)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            terms = self._doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+            for term in terms:
+                postings = self._postings[term]
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._doc_lengths.pop(doc_id)
+
+            metadata = self._metadata.pop(doc_id, {})
+            name_key = normalize_name(metadata.get('name', ''))
+            self._names[name_key].discard(doc_id)
+            if not self._names[name_key]:
+                del self._names[name_key]
+
+    def exact_name_matches(self, query: str, filters: Optional[Dict[str, str]] = None) -> List[str]:
+        """Ids of documents whose name equals the query (case/punctuation-insensitive)"""
+        with self._lock:
+            ids = sorted(self._names.get(normalize_name(query), ()))
+            return [doc_id for doc_id in ids if self._matches(doc_id, filters)]
+
+    def search(self, query: str, limit: int,
+               filters: Optional[Dict[str, str]] = None) -> List[Tuple[str, float]]:
+        """Top documents by BM25 score"""
+        query_terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs or not query_terms:
+                return []
+            avg_length = self._total_length / n_docs
+
+            scores: Dict[str, float] = defaultdict(float)
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            ranked = sorted(
+                ((doc_id, score) for doc_id, score in scores.items() if self._matches(doc_id, filters)),
+                key=lambda item: item[1],
+                reverse=True
+            )
+            return ranked[:limit]
+
+    def memory_usage(self) -> Dict[str, Any]:
+        """Document/term counts and approximate bytes of the postings and per-doc tables"""
+        with self._lock:
+            postings = list(self._postings.items())
+            docs = [(doc_id, terms, self._metadata.get(doc_id)) for doc_id, terms in self._doc_terms.items()]
+            names = len(self._names)
+        return {
+            'documents': len(docs),
+            'terms': len(postings),
+            'postings': sum(len(p) for _, p in postings),
+            'names': names,
+            'approx_bytes': estimate_sizeof(postings, len(postings)) + estimate_sizeof(docs, len(docs))
+        }
+
+    def get_metadata(self, doc_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._metadata.get(doc_id, {}))
+
+    def _matches(self, doc_id: str, filters: Optional[Dict[str, str]]) -> bool:
+        if not filters:
+            return True
+        metadata = self._metadata.get(doc_id, {})
+        return all(metadata.get(key) == value for key, value in filters.items())
@@ -0,0 +1,112 @@
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set
+
+from config.settings import (
+    MEMORY_RECALL_TOP_K, MEMORY_RECALL_CANDIDATES, MEMORY_TOKEN_BUDGET,
+    MEMORY_RECENCY_HALF_LIFE_HOURS, MEMORY_RECENCY_WEIGHT
+)
+from models.dialogue_model import NON_PLAYER_DIALOGUE_TYPES
+from src.npc_storage import NPCStorage
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) - good enough for budgeting"""
+    return max(1, len(text) // 4)
+
+class MemoryRecall:
+    """Pulls the past exchanges most relevant to the current player line.
+
+    One ANN query per turn against npc_dialogues (filtered to the NPC's player
+    exchanges and summaries), using an
+    embedding of the player input the caller computed once for the turn.
+    Candidates are re-ranked by similarity and recency and packed into a token
+    budget.
+    """
+
+    def __init__(self, storage: NPCStorage,
+                 top_k: int = MEMORY_RECALL_TOP_K,
+                 candidates: int = MEMORY_RECALL_CANDIDATES,
+                 token_budget: int = MEMORY_TOKEN_BUDGET,
+                 recency_half_life_hours: float = MEMORY_RECENCY_HALF_LIFE_HOURS,
+                 recency_weight: float = MEMORY_RECENCY_WEIGHT):
+        self.storage = storage
+        self.top_k = top_k
+        self.candidates = max(candidates, top_k)
+        self.token_budget = token_budget
+        self.recency_half_life_hours = recency_half_life_hours
+        self.recency_weight = recency_weight
+
+    def recall(self, npc_id: str, query_embedding: List[float],
+               exclude_timestamps: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        """Top memories for an NPC, best first, within the token budget"""
+        exclude_timestamps = exclude_timestamps or set()
+
+        try:
+            results = self.storage.dialogue_store.similarity_search_by_vector_with_relevance_scores(
+                embedding=query_embedding,
+                k=self.candidates,
+                filter=self._where(npc_id)
+            )
+        except Exception as e:
+            print(f"⚠️ Memory recall failed for NPC {npc_id}: {e}")
+            return []
+
+        space = (self.storage.dialogue_store._collection.metadata or {}).get("hnsw:space", "l2")
+        now = datetime.now()
+        scored = []
+        for doc, distance in results:
+            metadata = doc.metadata
+            timestamp = metadata.get('timestamp')
+            if not timestamp or timestamp in exclude_timestamps:
+                continue
+
+            similarity = self._similarity(distance, space)
+            age_hours = max(0.0, (now - datetime.fromisoformat(timestamp)).total_seconds() / 3600)
+            recency = 0.5 ** (age_hours / self.recency_half_life_hours)
+
+            scored.append({
+                'text': doc.page_content,
+                'timestamp': timestamp,
+                'type': metadata.get('type', 'dialogue'),
+                'similarity': similarity,
+                'score': (1 - self.recency_weight) * similarity + self.recency_weight * recency
+            })
+
+        scored.sort(key=lambda m: m['score'], reverse=True)
+
+        selected, used_tokens = [], 0
+        for memory in scored:
+            if len(selected) >= self.top_k:
+                break
+            tokens = estimate_tokens(memory['text'])
+            if used_tokens + tokens > self.token_budget:
+                continue
+            selected.append(memory)
+            used_tokens += tokens
+
+        return selected
+
+    def format_memories(self, memories: List[Dict[str, Any]], npc_name: str) -> str:
+        """Render recalled memories for the dialogue prompt, oldest first"""
+        lines = []
+        for memory in sorted(memories, key=lambda m: m['timestamp']):
+            when = memory['timestamp'][:10]
+            text = memory['text'].replace("\nNPC:", f"\n{npc_name}:")
+            lines.append(f"[{when}] {text}")
+        return "\n".join(lines)
+
+    def _where(self, npc_id: str) -> Dict[str, Any]:
+        """The NPC's exchanges with the player plus its summaries (summaries carry no dialogue_type)"""
+        return {"$and": [
+            {"npc_id": npc_id},
+            {"$or": [
+                {"type": "dialogue_summary"},
+                {"dialogue_type": {"$nin": list(NON_PLAYER_DIALOGUE_TYPES)}}
+            ]}
+        ]}
+
+    def _similarity(self, distance: float, space: str) -> float:
+        """Map a Chroma distance onto [0, 1], higher is more similar"""
+        if space in ("cosine", "ip"):
+            # Chroma reports 1 - cos/dot for these spaces
+            return min(1.0, max(0.0, 1.0 - distance))
+        return 1.0 / (1.0 + max(distance, 0.0))
@@ -0,0 +1,173 @@
+import gc
+import os
+import random
+import sys
+import threading
+import tracemalloc
+import types
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+
+from config.settings import MEMORY_SIZE_SAMPLE, MEMORY_TRACEMALLOC_FRAMES, MEMORY_SNAPSHOT_LIMIT
+
+# Shared infrastructure, not data owned by the container being measured
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType, threading.Thread)
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Bytes held by an object and everything it references (shared objects counted once)"""
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _OPAQUE):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item, 0)
+        if isinstance(item, (str, bytes, bytearray, int, float, bool)) or item is None:
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            if hasattr(item, '__dict__'):
+                stack.append(vars(item))
+            for slot in getattr(type(item), '__slots__', ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return size
+
+def estimate_sizeof(items: Iterable[Any], count: int, sample: int = MEMORY_SIZE_SAMPLE) -> int:
+    """Deep size of a random sample of ``items`` scaled up to ``count`` entries.
+
+    Exact when count <= sample; keeps a diagnostics call cheap on large caches.
+    """
+    items = list(items)
+    if not items:
+        return 0
+    picked = items if len(items) <= sample else random.sample(items, sample)
+    seen: set = set()
+    measured = sum(deep_sizeof(item, seen) for item in picked)
+    return int(measured * count / len(picked))
+
+def directory_size(path: str) -> int:
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+def process_memory() -> Dict[str, Any]:
+    """Resident/peak memory of this process plus GC counters"""
+    report: Dict[str, Any] = {'pid': os.getpid(), 'gc_counts': gc.get_count(), 'gc_objects': len(gc.get_objects())}
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM", "VmSize"):
+                    report[key.lower() + "_bytes"] = int(value.split()[0]) * 1024
+    except OSError:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report['vmhwm_bytes'] = peak if sys.platform == "darwin" else peak * 1024
+        except ImportError:
+            pass
+    return report
+
+def object_type_counts(limit: int = 25) -> List[Dict[str, Any]]:
+    """Most common live object types (walks every GC-tracked object; slow on big heaps)"""
+    counts = Counter(type(obj).__qualname__ for obj in gc.get_objects())
+    return [{'type': name, 'count': count} for name, count in counts.most_common(limit)]
+
+class TracemallocTracker:
+    """Named tracemalloc snapshots and diffs between them.
+
+    Tracing slows allocation-heavy code noticeably, so it is off until started
+    and only the last ``limit`` snapshots are kept.
+    """
+
+    def __init__(self, frames: int = MEMORY_TRACEMALLOC_FRAMES, limit: int = MEMORY_SNAPSHOT_LIMIT):
+        self.frames = frames
+        self.limit = limit
+        self._snapshots: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, frames: Optional[int] = None) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or self.frames)
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            names = list(self._snapshots)
+        return {'tracing': tracing, 'frames': tracemalloc.get_traceback_limit() if tracing else 0,
+                'traced_bytes': current, 'traced_peak_bytes': peak, 'snapshots': names}
+
+    def snapshot(self, name: Optional[str] = None) -> str:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; start it first")
+        name = name or datetime.now().strftime("snap_%H%M%S_%f")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        with self._lock:
+            self._snapshots[name] = snapshot
+            self._snapshots.move_to_end(name)
+            while len(self._snapshots) > self.limit:
+                self._snapshots.popitem(last=False)
+        return name
+
+    def top(self, name: str, limit: int = 20, group_by: str = "lineno") -> List[Dict[str, Any]]:
+        stats = self._get(name).statistics(group_by)
+        return [self._stat(stat) for stat in stats[:limit]]
+
+    def diff(self, base: str, target: Optional[str] = None, limit: int = 20,
+             group_by: str = "lineno") -> List[Dict[str, Any]]:
+        """Largest growth from ``base`` to ``target`` (a fresh snapshot when omitted)"""
+        target = target or self.snapshot()
+        stats = self._get(target).compare_to(self._get(base), group_by)
+        return [self._stat(stat, diff=True) for stat in stats[:limit]]
+
+    def _get(self, name: str) -> tracemalloc.Snapshot:
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+        if snapshot is None:
+            raise KeyError(f"Unknown snapshot '{name}'")
+        return snapshot
+
+    def _stat(self, stat, diff: bool = False) -> Dict[str, Any]:
+        frame = stat.traceback[0]
+        entry = {
+            'location': f"{frame.filename}:{frame.lineno}",
+            'size_bytes': stat.size,
+            'count': stat.count,
+            'traceback': [f"{f.filename}:{f.lineno}" for f in stat.traceback][:self.frames]
+        }
+        if diff:
+            entry['size_diff_bytes'] = stat.size_diff
+            entry['count_diff'] = stat.count_diff
+        return entry
+
+_tracker: Optional[TracemallocTracker] = None
+
+def get_tracemalloc_tracker() -> TracemallocTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = TracemallocTracker()
+    return _tracker
@@ -0,0 +1,177 @@
+import fnmatch
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterator
+
+from config.settings import (
+    MODEL_TIERS, MODEL_DEFAULT_TIER, DIALOGUE_TIER_RULES,
+    NPC_IMPORTANCE_LEVELS, MODEL_TIER_LATENCY_WINDOW, OLLAMA_KEEP_ALIVE
+)
+from models.npc_model import DialogueContext
+from src.ollama_pool import PooledChatModel, get_llm_pool
+
+def _normalize(value: str) -> str:
+    return (value or "").strip().upper().replace(" ", "_")
+
+class TierStats:
+    def __init__(self, window: int):
+        self.calls = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.latencies = deque(maxlen=window)
+
+    def to_dict(self) -> Dict[str, Any]:
+        samples = sorted(self.latencies)
+
+        def percentile(p: float):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'fallbacks': self.fallbacks,
+            'avg_ms': round(sum(samples) / len(samples) * 1000, 1) if samples else None,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95)
+        }
+
+class TierClient:
+    """invoke() for one tier that records latency; drop-in for an llm"""
+
+    def __init__(self, router: "ModelRouter", tier: str):
+        self.router = router
+        self.tier = tier
+
+    def invoke(self, input, **kwargs):
+        return self.router.invoke(self.tier, input, **kwargs)
+
+class ModelRouter:
+    """Picks a model tier per dialogue turn and keeps per-tier latency stats.
+
+    Rules (DIALOGUE_TIER_RULES) are matched in order against the dialogue
+    type/stage and the NPC's importance; the first match wins, otherwise the
+    default tier answers. A failing tier falls back to the default tier so a
+    missing small model degrades to slower answers instead of no answers.
+    """
+
+    def __init__(self, tiers: Optional[Dict[str, Dict[str, Any]]] = None,
+                 rules: Optional[List[Dict[str, Any]]] = None,
+                 default_tier: str = MODEL_DEFAULT_TIER,
+                 default_model: Optional[str] = None):
+        tiers = {name: dict(config) for name, config in (tiers or MODEL_TIERS).items()}
+        if default_tier not in tiers:
+            raise ValueError(f"Default tier '{default_tier}' is not configured")
+        if default_model:
+            tiers[default_tier]['model'] = default_model
+
+        self.tiers = tiers
+        self.rules = rules if rules is not None else DIALOGUE_TIER_RULES
+        self.default_tier = default_tier
+
+        pool = get_llm_pool()
+        self._models = {
+            name: PooledChatModel(pool, keep_alive=OLLAMA_KEEP_ALIVE, **config)
+            for name, config in tiers.items()
+        }
+        self._stats = {name: TierStats(MODEL_TIER_LATENCY_WINDOW) for name in tiers}
+        self._lock = threading.Lock()
+
+    def importance(self, npc_data: Dict[str, Any]) -> str:
+        """Explicit 'importance' on the NPC, else quest givers are major"""
+        explicit = (npc_data.get('npc') or {}).get('importance')
+        if explicit in NPC_IMPORTANCE_LEVELS:
+            return explicit
+        return "major" if (npc_data.get('behavior') or {}).get('gives_quest') else "normal"
+
+    def select(self, context: DialogueContext, npc_data: Dict[str, Any]) -> str:
+        """Tier for one dialogue turn"""
+        dialogue_type = _normalize(context.dialogue_type)
+        dialogue_stage = _normalize(context.dialogue_stage)
+        level = NPC_IMPORTANCE_LEVELS.index(self.importance(npc_data))
+
+        for rule in self.rules:
+            if rule.get('tier') not in self.tiers:
+                continue
+            if 'dialogue_types' in rule and not any(
+                    fnmatch.fnmatchcase(dialogue_type, _normalize(p)) for p in rule['dialogue_types']):
+                continue
+            if 'dialogue_stages' in rule and not any(
+                    fnmatch.fnmatchcase(dialogue_stage, _normalize(p)) for p in rule['dialogue_stages']):
+                continue
+            if 'min_importance' in rule and level < NPC_IMPORTANCE_LEVELS.index(rule['min_importance']):
+                continue
+            if 'max_importance' in rule and level > NPC_IMPORTANCE_LEVELS.index(rule['max_importance']):
+                continue
+            return rule['tier']
+        return self.default_tier
+
+    def client(self, tier: str) -> TierClient:
+        if tier not in self.tiers:
+            raise ValueError(f"Unknown model tier '{tier}'")
+        return TierClient(self, tier)
+
+    def invoke(self, tier: str, input, **kwargs):
+        """Invoke a tier's model, falling back to the default tier on failure"""
+        started = time.perf_counter()
+        try:
+            response = self._models[tier].invoke(input, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self._stats[tier].calls += 1
+                self._stats[tier].errors += 1
+            if tier == self.default_tier:
+                raise
+            print(f"⚠️ Model tier '{tier}' failed ({e}), falling back to '{self.default_tier}'")
+            with self._lock:
+                self._stats[tier].fallbacks += 1
+            return self.invoke(self.default_tier, input, **kwargs)
+
+        with self._lock:
+            stats = self._stats[tier]
+            stats.calls += 1
+            stats.latencies.append(time.perf_counter() - started)
+        return response
+
+    def stream(self, tier: str, input, **kwargs) -> Iterator[str]:
+        """Stream a tier's reply as text pieces.
+
+        Falls back to the default tier only if nothing was emitted yet; a stream
+        that breaks midway raises, since the caller already showed part of it.
+        """
+        started = time.perf_counter()
+        emitted = False
+        try:
+            for chunk in self._models[tier].stream(input, **kwargs):
+                if chunk.content:
+                    emitted = True
+                    yield chunk.content
+        except Exception as e:
+            with self._lock:
+                self._stats[tier].calls += 1
+                self._stats[tier].errors += 1
+            if emitted or tier == self.default_tier:
+                raise
+            print(f"⚠️ Model tier '{tier}' failed ({e}), falling back to '{self.default_tier}'")
+            with self._lock:
+                self._stats[tier].fallbacks += 1
+            yield from self.stream(self.default_tier, input, **kwargs)
+            return
+
+        with self._lock:
+            stats = self._stats[tier]
+            stats.calls += 1
+            stats.latencies.append(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {
+                    'model': self.tiers[name].get('model'),
+                    'num_predict': self.tiers[name].get('num_predict'),
+                    **self._stats[name].to_dict()
+                }
+                for name in self.tiers
+            }
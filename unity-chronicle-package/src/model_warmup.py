@@ -0,0 +1,81 @@
+import time
+from typing import Dict, Any, List, Optional
+
+import requests
+
+from config.settings import (
+    OLLAMA_LLM_ENDPOINTS, OLLAMA_EMBEDDING_ENDPOINTS, OLLAMA_MODEL, OLLAMA_EMBEDDING_MODEL,
+    OLLAMA_KEEP_ALIVE, MODEL_WARMUP_TIMEOUT, MODEL_TIERS
+)
+
+class ModelWarmup:
+    """Preloads Ollama models so the first player interaction doesn't pay the load.
+
+    Each model gets two tiny requests: the first (cold) includes loading the
+    weights, the second (warm) is what a loaded model costs. Both carry
+    keep_alive so Ollama keeps the model resident afterwards. Every endpoint of
+    the pools is warmed, since any of them may serve the first request.
+    """
+
+    def __init__(self, llm_endpoints: Optional[List[str]] = None,
+                 embedding_endpoints: Optional[List[str]] = None,
+                 chat_models: Optional[List[str]] = None,
+                 embedding_models: Optional[List[str]] = None,
+                 keep_alive: int = OLLAMA_KEEP_ALIVE,
+                 timeout: float = MODEL_WARMUP_TIMEOUT):
+        self.llm_endpoints = [url.rstrip("/") for url in llm_endpoints or OLLAMA_LLM_ENDPOINTS]
+        self.embedding_endpoints = [url.rstrip("/") for url in embedding_endpoints or OLLAMA_EMBEDDING_ENDPOINTS]
+        self.chat_models = chat_models or sorted({OLLAMA_MODEL, *(tier['model'] for tier in MODEL_TIERS.values())})
+        self.embedding_models = embedding_models or [OLLAMA_EMBEDDING_MODEL]
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.last_report: Dict[str, Any] = {}
+
+    def warm(self) -> Dict[str, Any]:
+        """Warm every model on every endpoint and return cold/warm latencies"""
+        models = {}
+        for url in self.llm_endpoints:
+            for model in self.chat_models:
+                # An empty prompt only loads the model; the second call generates one token
+                models[f"{model}@{url}"] = self._measure(
+                    "chat", url, "/api/generate",
+                    {'model': model, 'prompt': ""},
+                    {'model': model, 'prompt': "Hi", 'options': {'num_predict': 1}}
+                )
+        for url in self.embedding_endpoints:
+            for model in self.embedding_models:
+                payload = {'model': model, 'input': "warm up"}
+                models[f"{model}@{url}"] = self._measure("embedding", url, "/api/embed", payload, payload)
+
+        self.last_report = {
+            'keep_alive': self.keep_alive,
+            'models': models,
+            'all_warm': all(m['ok'] for m in models.values())
+        }
+        for model, result in models.items():
+            if result['ok']:
+                print(f"🔥 {model} warm: cold {result['cold_ms']}ms -> warm {result['warm_ms']}ms")
+            else:
+                print(f"⚠️ Could not warm {model}: {result['error']}")
+        return self.last_report
+
+    def _measure(self, kind: str, url: str, path: str, cold_payload: Dict[str, Any],
+                 warm_payload: Dict[str, Any]) -> Dict[str, Any]:
+        result = {'kind': kind, 'ok': False, 'cold_ms': None, 'warm_ms': None, 'error': None}
+        try:
+            result['cold_ms'] = self._timed_post(url + path, cold_payload)
+            result['warm_ms'] = self._timed_post(url + path, warm_payload)
+            result['ok'] = True
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+
+    def _timed_post(self, url: str, payload: Dict[str, Any]) -> float:
+        started = time.perf_counter()
+        response = requests.post(
+            url,
+            json={**payload, 'stream': False, 'keep_alive': self.keep_alive},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return round((time.perf_counter() - started) * 1000, 1)
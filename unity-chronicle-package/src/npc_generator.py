@@ -1,22 +1,29 @@
 from typing import Dict, Any, Optional
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 import json
 import uuid
 from datetime import datetime
 
+from config.settings import OLLAMA_MODEL, OLLAMA_KEEP_ALIVE, SUMMARY_CACHE_SIZE
 from models.npc_model import NPCCharacter, WorldSettings, DialogueContext, NPCBehavior
 from src.npc_storage import NPCStorage
+from src.ollama_pool import PooledChatModel, get_llm_pool
+from src.lru_cache import LRUCache
 
 class NPCGenerator:
-    def __init__(self, model_name: str = "llama3"):
-        self.llm = ChatOllama(
+    def __init__(self, model_name: str = OLLAMA_MODEL, storage: Optional[NPCStorage] = None):
+        self.llm = PooledChatModel(
+            get_llm_pool(),
             model=model_name,
-            base_url="http://localhost:11434",
-            temperature=0.8
+            temperature=0.8,
+            keep_alive=OLLAMA_KEEP_ALIVE
         )
-        self.storage = NPCStorage()
+        self.storage = storage or NPCStorage()
+        
+        # Formatted summaries by npc_id, dropped whenever that NPC is written
+        self.summary_cache = LRUCache(maxsize=SUMMARY_CACHE_SIZE)
+        self.storage.add_write_listener(self._invalidate_summaries)
         print(f"NPC Generator initialized with {model_name}")
     
     def generate_npc(self, 
@@ -181,7 +188,23 @@ Format your response as JSON with these exact keys:
         return npc
     
     def get_npc_summary(self, npc_id: str) -> Optional[str]:
-        """Get a formatted summary of an NPC"""
+        """Get a formatted summary of an NPC (cached until the NPC changes)"""
+        generation = self.summary_cache.generation
+        summary = self.summary_cache.get(npc_id)
+        if summary is None:
+            summary = self._format_npc_summary(npc_id)
+            if summary is not None:
+                self.summary_cache.set(npc_id, summary, generation=generation)
+        return summary
+    
+    def memory_usage(self) -> Dict[str, Any]:
+        return {'summary_cache': self.summary_cache.memory_usage()}
+    
+    def _invalidate_summaries(self, npc_ids, searchable: bool):
+        for npc_id in npc_ids:
+            self.summary_cache.invalidate(npc_id)
+    
+    def _format_npc_summary(self, npc_id: str) -> Optional[str]:
         npc_data = self.storage.get_npc(npc_id)
         if not npc_data:
             return None
@@ -201,8 +224,8 @@ Format your response as JSON with these exact keys:
 
 **Backstory**: {npc['backstory'][:200]}...
 
-**Dialogue Style**: {npc.get('dialogue_style', 'Standard')}
-**Motivations**: {npc.get('motivations', 'Unknown')}
+**Dialogue Style**: {npc.get('dialogue_style') or 'Standard'}
+**Motivations**: {npc.get('motivations') or 'Unknown'}
 """
         
         if behavior['gives_quest']:
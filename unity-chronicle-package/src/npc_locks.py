@@ -0,0 +1,144 @@
+import threading
+import time
+from contextlib import contextmanager, ExitStack
+from typing import Dict, Any, Iterable, Optional
+
+from config.settings import NPC_LOCK_TIMEOUT
+
+class NPCBusy(TimeoutError):
+    """Raised when an NPC stays locked longer than the caller is willing to wait"""
+
+class _TicketLock:
+    """FIFO (ticket) lock: waiters are served strictly in arrival order.
+
+    Reentrant for the owning thread so a turn can call helpers that lock the
+    same NPC. A waiter that times out abandons its ticket, which is skipped.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+        self._owner: Optional[int] = None
+        self._depth = 0
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return True
+
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._serving != ticket:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._abandoned.add(ticket)
+                    return False
+                self._cond.wait(remaining)
+
+            self._owner = me
+            self._depth = 1
+            return True
+
+    def release(self):
+        with self._cond:
+            if self._owner != threading.get_ident():
+                raise RuntimeError("NPC lock released by a thread that does not hold it")
+            self._depth -= 1
+            if self._depth:
+                return
+            self._owner = None
+            self._serving += 1
+            while self._serving in self._abandoned:
+                self._abandoned.discard(self._serving)
+                self._serving += 1
+            self._cond.notify_all()
+
+    @property
+    def waiting(self) -> int:
+        with self._cond:
+            held = 1 if self._owner is not None else 0
+            return self._next_ticket - self._serving - len(self._abandoned) - held
+
+class NPCLockRegistry:
+    """One FIFO lock per NPC id, created on demand and dropped when unused.
+
+    Turns for different NPCs never contend; turns for the same NPC run one at
+    a time in arrival order.
+    """
+
+    def __init__(self, default_timeout: Optional[float] = NPC_LOCK_TIMEOUT):
+        self.default_timeout = default_timeout
+        self._locks: Dict[str, list] = {}  # npc_id -> [lock, users]
+        self._mutex = threading.Lock()
+
+    @contextmanager
+    def hold(self, npc_id: str, timeout: Optional[float] = None):
+        """Serialize a block of work on one NPC"""
+        lock = self._checkout(npc_id)
+        try:
+            if not lock.acquire(self.default_timeout if timeout is None else timeout):
+                raise NPCBusy(f"NPC {npc_id} is busy with another conversation")
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            self._checkin(npc_id)
+
+    @contextmanager
+    def hold_many(self, npc_ids: Iterable[str], timeout: Optional[float] = None):
+        """Lock several NPCs; always in sorted order so two callers cannot deadlock"""
+        with ExitStack() as stack:
+            for npc_id in sorted(set(npc_ids)):
+                stack.enter_context(self.hold(npc_id, timeout))
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        with self._mutex:
+            entries = list(self._locks.items())
+        return {
+            'tracked_npcs': len(entries),
+            'waiting': {npc_id: entry[0].waiting for npc_id, entry in entries if entry[0].waiting}
+        }
+
+    def _checkout(self, npc_id: str) -> _TicketLock:
+        with self._mutex:
+            entry = self._locks.get(npc_id)
+            if entry is None:
+                entry = self._locks[npc_id] = [_TicketLock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _checkin(self, npc_id: str):
+        with self._mutex:
+            entry = self._locks[npc_id]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[npc_id]
+
+_registries: Dict[str, NPCLockRegistry] = {}
+_registry_lock = threading.Lock()
+
+def get_npc_locks(scope: str = "") -> NPCLockRegistry:
+    """Registry for one storage scope (its data directory), shared by the engine,
+    context manager and sessions working on that storage.
+
+    NPC ids are only unique within a shard - save slots cloned from one
+    snapshot share them - so each scope gets its own locks.
+    """
+    with _registry_lock:
+        registry = _registries.get(scope)
+        if registry is None:
+            registry = _registries[scope] = NPCLockRegistry()
+        return registry
+
+def npc_lock_stats() -> Dict[str, Any]:
+    """stats() of every scope's registry"""
+    with _registry_lock:
+        registries = dict(_registries)
+    return {scope or "default": registry.stats() for scope, registry in registries.items()}
@@ -0,0 +1,242 @@
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from config.settings import (
+    OLLAMA_LLM_ENDPOINTS, OLLAMA_MODEL, OLLAMA_KEEP_ALIVE, DIALOGUE_TEMPERATURE,
+    SIMULATION_WORKERS, SIMULATION_TURNS, SIMULATION_CHECKPOINT_EVERY, SIMULATION_CHECKPOINT_PATH
+)
+from models.dialogue_model import DialogueEntry
+from src.npc_storage import NPCStorage
+
+PAIRING_KEYS = {"faction": "faction", "location": "location"}
+
+# ------------------------------------------------------------ Worker side
+# Everything below runs inside pool processes; only plain dicts cross the boundary.
+
+_worker_llm = None
+
+def _init_worker(model_name: str, endpoints: List[str], temperature: float):
+    global _worker_llm
+    from src.ollama_pool import OllamaPool, PooledChatModel
+    # Each process routes over all endpoints; ties start at a pid-based offset
+    _worker_llm = PooledChatModel(OllamaPool(endpoints, health_interval=0),
+                                  model=model_name, temperature=temperature, keep_alive=OLLAMA_KEEP_ALIVE)
+
+def _npc_line(speaker: Dict[str, Any], listener: Dict[str, Any], setting: str,
+              transcript: List[Tuple[str, str]]) -> str:
+    history = "\n".join(f"{name}: {line}" for name, line in transcript) or "(nothing yet)"
+    prompt = (
+        f"You are {speaker['name']}, a {speaker.get('race_species', 'Human')} "
+        f"{speaker.get('profession_role', 'Citizen')} ({', '.join(speaker.get('personality', [])) or 'ordinary'}), "
+        f"of the faction {speaker.get('faction', 'None')}.\n"
+        f"You are talking with {listener['name']}, a {listener.get('profession_role', 'Citizen')} "
+        f"of the faction {listener.get('faction', 'None')}, in {setting} while the player is away.\n\n"
+        f"Conversation so far:\n{history}\n\n"
+        f"Reply with ONE or TWO sentences as {speaker['name']}. Talk about local news, rumours, "
+        f"work or each other. No narration."
+    )
+    # Errors propagate: a conversation with a failed turn is not stored and stays pending
+    return _worker_llm.invoke(prompt).content.strip().strip('"')
+
+def _run_conversation(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Multi-turn exchange between two NPCs; returns the transcript"""
+    a, b = task['npc_a'], task['npc_b']
+    setting = f"{task['world'].get('location', 'the village')} ({task['world'].get('world_theme', '')})"
+
+    transcript: List[Tuple[str, str]] = []
+    turns = []
+    speakers = [(a, b), (b, a)]
+    for turn in range(task['turns']):
+        speaker, listener = speakers[turn % 2]
+        line = _npc_line(speaker, listener, setting, transcript)
+        transcript.append((speaker['name'], line))
+        turns.append({'speaker_id': speaker['npc_id'], 'listener_id': listener['npc_id'], 'line': line})
+
+    return {'pair_key': task['pair_key'], 'group': task['group'], 'turns': turns}
+
+# ------------------------------------------------------------ Driver side
+
+class NPCSimulationRunner:
+    """Offline NPC-to-NPC conversations between play sessions.
+
+    NPCs are paired within the same faction or location, conversations run in a
+    process pool across cores, results are written to npc_dialogues in bulk and
+    progress is checkpointed after every bulk write so an interrupted run resumes
+    where it stopped.
+    """
+
+    def __init__(self, storage: NPCStorage,
+                 workers: int = SIMULATION_WORKERS,
+                 turns: int = SIMULATION_TURNS,
+                 checkpoint_every: int = SIMULATION_CHECKPOINT_EVERY,
+                 checkpoint_path: str = SIMULATION_CHECKPOINT_PATH,
+                 model_name: str = OLLAMA_MODEL,
+                 endpoints: Optional[List[str]] = None):
+        self.storage = storage
+        self.workers = max(1, workers)
+        self.turns = max(2, turns)
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.checkpoint_path = checkpoint_path
+        self.model_name = model_name
+        self.endpoints = endpoints or OLLAMA_LLM_ENDPOINTS
+
+    def plan_pairs(self, pair_by: str = "faction", rounds: int = 1, seed: int = 0,
+                   filters: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Pair NPCs that share a faction/location; each round reshuffles partners"""
+        if pair_by not in PAIRING_KEYS:
+            raise ValueError(f"Unknown pairing '{pair_by}'")
+
+        records = []
+        page = 500
+        while True:
+            batch = self.storage.records.find_npcs(filters, limit=page, offset=len(records))
+            records.extend(batch)
+            if len(batch) < page:
+                break
+
+        groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for record in records:
+            source = record['npc'] if pair_by == "faction" else record['world']
+            key = source.get(PAIRING_KEYS[pair_by])
+            if key and key != "None":
+                groups[key].append(record)
+
+        rng = random.Random(seed)
+        tasks = []
+        for group, members in sorted(groups.items()):
+            if len(members) < 2:
+                continue
+            for round_no in range(rounds):
+                shuffled = sorted(members, key=lambda r: r['npc']['npc_id'])
+                rng.shuffle(shuffled)
+                for i in range(0, len(shuffled) - 1, 2):
+                    a, b = shuffled[i], shuffled[i + 1]
+                    tasks.append({
+                        'pair_key': f"{round_no}:{a['npc']['npc_id']}|{b['npc']['npc_id']}",
+                        'group': group,
+                        'npc_a': a['npc'],
+                        'npc_b': b['npc'],
+                        'world': a['world'],
+                        'turns': self.turns
+                    })
+        return tasks
+
+    def run(self, pair_by: str = "faction", rounds: int = 1, seed: int = 0,
+            filters: Optional[Dict[str, str]] = None, reset: bool = False) -> Dict[str, Any]:
+        """Run (or resume) a simulation and return a summary"""
+        config = {'pair_by': pair_by, 'rounds': rounds, 'seed': seed,
+                  'filters': filters or {}, 'turns': self.turns}
+        checkpoint = None if reset else self._load_checkpoint(config)
+        if checkpoint is None:
+            checkpoint = {
+                'run_id': datetime.now().strftime("sim_%Y%m%d_%H%M%S"),
+                'config': config,
+                'completed': [],
+                'dialogues_written': 0,
+                'started_at': datetime.now().isoformat()
+            }
+
+        tasks = self.plan_pairs(pair_by, rounds, seed, filters)
+        done = set(checkpoint['completed'])
+        pending = [task for task in tasks if task['pair_key'] not in done]
+        print(f"🎭 Simulation {checkpoint['run_id']}: {len(tasks)} conversations planned, "
+              f"{len(done)} already done, {len(pending)} to run on {self.workers} workers")
+
+        started = time.perf_counter()
+        failed = 0
+        names = {}
+        for task in tasks:
+            names[task['npc_a']['npc_id']] = task['npc_a']['name']
+            names[task['npc_b']['npc_id']] = task['npc_b']['name']
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.model_name, self.endpoints, DIALOGUE_TEMPERATURE)
+        ) as pool:
+            for i in range(0, len(pending), self.checkpoint_every):
+                chunk = pending[i:i + self.checkpoint_every]
+                futures = {pool.submit(_run_conversation, task): task['pair_key'] for task in chunk}
+                results = []
+                for future in as_completed(futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        # Left out of the checkpoint, so a resumed run retries it
+                        failed += 1
+                        print(f"⚠️ Simulated conversation {futures[future]} failed: {e}")
+
+                entries = self._to_entries(results, names, checkpoint['run_id'])
+                self.storage.store_dialogues(entries)
+
+                checkpoint['completed'].extend(result['pair_key'] for result in results)
+                checkpoint['dialogues_written'] += len(entries)
+                self._save_checkpoint(checkpoint)
+                print(f"   💾 {len(checkpoint['completed'])}/{len(tasks)} conversations stored")
+
+        if failed:
+            # Not marked finished: the next run with the same config resumes and retries them
+            print(f"⚠️ {failed} conversations failed and stay pending in {self.checkpoint_path}")
+        else:
+            checkpoint['finished_at'] = datetime.now().isoformat()
+        self._save_checkpoint(checkpoint)
+        return {
+            'run_id': checkpoint['run_id'],
+            'conversations': len(checkpoint['completed']),
+            'dialogues_written': checkpoint['dialogues_written'],
+            'failed': failed,
+            'duration_seconds': round(time.perf_counter() - started, 2)
+        }
+
+    def _to_entries(self, results: List[Dict[str, Any]], names: Dict[str, str], run_id: str) -> List[DialogueEntry]:
+        """Each turn becomes a dialogue entry of the NPC who spoke, prompted by the partner's last line.
+
+        NPC_CONVERSATION entries stay out of player history, recall and summaries
+        (see NON_PLAYER_DIALOGUE_TYPES).
+        """
+        entries = []
+        for result in results:
+            previous = ""
+            for turn in result['turns']:
+                partner_name = names.get(turn['listener_id'], turn['listener_id'])
+                entries.append(DialogueEntry(
+                    npc_id=turn['speaker_id'],
+                    player_input=f"{partner_name}: {previous}" if previous else "",
+                    npc_response=turn['line'],
+                    context={
+                        'partner_id': turn['listener_id'],
+                        'partner_name': partner_name,
+                        'group': result['group'],
+                        'simulation_run': run_id
+                    },
+                    dialogue_type="NPC_CONVERSATION",
+                    mood="Neutral"
+                ))
+                previous = turn['line']
+        return entries
+
+    def _load_checkpoint(self, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('config') != config or checkpoint.get('finished_at'):
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]):
+        """Write-then-rename so a crash never leaves a torn checkpoint"""
+        checkpoint['updated_at'] = datetime.now().isoformat()
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
@@ -1,43 +1,171 @@
+import atexit
+import copy
 import json
 import uuid
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
 import os
+import threading
 
 from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
 from langchain_core.documents import Document
 
+from config.settings import OLLAMA_EMBEDDING_MODEL, OLLAMA_KEEP_ALIVE, NPC_DATA_DIR, RECORD_STORE_PATH, NPC_INDEX_SETTINGS, DIALOGUE_INDEX_SETTINGS, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL
 from models.npc_model import NPCCharacter, WorldSettings, DialogueContext, NPCBehavior
-from models.dialogue_model import DialogueEntry, ConversationHistory
+from models.dialogue_model import DialogueEntry, ConversationHistory, NON_PLAYER_DIALOGUE_TYPES
+from models.codec import to_record, from_record
+from src.record_store import RecordStore, NPC_FILTER_COLUMNS
+from src.interaction_tracker import InteractionTracker, interaction_deltas
+from src.lexical_index import LexicalIndex
+from src.ollama_pool import PooledEmbeddings, get_embedding_pool
+from src.npc_locks import NPCLockRegistry, get_npc_locks
+from src.memory_report import directory_size
+from src.lru_cache import LRUCache
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+RRF_K = 60  # reciprocal-rank-fusion damping constant
+
+# Fields that feed _npc_to_searchable_text; changing any of them requires re-embedding
+SEARCHABLE_FIELDS = {
+    'npc': {'name', 'race_species', 'profession_role', 'personality', 'alignment',
+            'faction', 'skills', 'backstory', 'traits_flaws'},
+    'world': {'world_theme', 'location', 'environment', 'tech_level'},
+    'behavior': {'combat_role', 'available_services', 'gives_quest', 'quest_id', 'trade_items'}
+}
 
 class NPCStorage:
-    def __init__(self, chroma_host: str = "http://localhost:8000"):
+    def __init__(self, chroma_host: str = "http://localhost:8000", data_dir: Optional[str] = None):
+        """``data_dir`` roots a separate shard (world or save slot); default is NPC_DATA_DIR"""
+        self.data_dir = data_dir or NPC_DATA_DIR
+        
+        # Turn ordering for this storage's NPCs (held for a whole LLM turn), and a
+        # short per-NPC lock for record read-modify-write that never waits on a turn
+        self.locks = get_npc_locks(os.path.abspath(self.data_dir))
+        self._record_locks = NPCLockRegistry()
+        
         # Disable ChromaDB telemetry
         os.environ["ANONYMIZED_TELEMETRY"] = "False"
         
-        self.embeddings = OllamaEmbeddings(
-            model="nomic-embed-text",
-            base_url="http://localhost:11434"
+        self.embeddings = PooledEmbeddings(
+            get_embedding_pool(),
+            model=OLLAMA_EMBEDDING_MODEL,
+            keep_alive=OLLAMA_KEEP_ALIVE
         )
 
         # Separate collections for NPCs and dialogues
         self.npc_store = Chroma(
             embedding_function=self.embeddings,
             collection_name="npc_characters",
-            persist_directory="./npc_data/npcs"
+            persist_directory=os.path.join(self.data_dir, "npcs"),
+            collection_metadata=dict(NPC_INDEX_SETTINGS)
         )
 
         self.dialogue_store = Chroma(
             embedding_function=self.embeddings,
             collection_name="npc_dialogues",
-            persist_directory="./npc_data/dialogues"
+            persist_directory=os.path.join(self.data_dir, "dialogues"),
+            collection_metadata=dict(DIALOGUE_INDEX_SETTINGS)
         )
 
-        print("NPC Storage initialized with ChromaDB")
+        # Canonical payloads live in the record store; Chroma keeps vectors + filter fields
+        self.records = RecordStore(os.path.join(data_dir, "records.db") if data_dir else RECORD_STORE_PATH)
+        self._migrate_legacy_records()
+        
+        # BM25 index over the same searchable text, built lazily on first lexical/hybrid search
+        self.lexical = LexicalIndex()
+        self._lexical_loaded = False
+        self._lexical_lock = threading.Lock()
+        
+        # Search results keyed on the normalized request; NPC writes invalidate them
+        self.search_cache = LRUCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+        self._write_listeners: List[Callable[[List[str], bool], None]] = [self._invalidate_search_cache]
+        
+        self.interactions = InteractionTracker(self.records)
+        if not self.records.get_meta("interaction_stats_backfilled"):
+            self.records.backfill_interaction_stats()
+            self.records.set_meta("interaction_stats_backfilled", datetime.now().isoformat())
+
+        print(f"NPC Storage initialized with ChromaDB at {self.data_dir}")
+    
+    def close(self):
+        """Flush counters and release the record store and Chroma clients.
+
+        Needed before the shard's files are cloned, restored or deleted.
+        """
+        self.interactions.close()
+        atexit.unregister(self.interactions.close)
+        self.records.close()
+        for store in (self.npc_store, self.dialogue_store):
+            try:
+                # Chroma caches one system per persist path; drop it so a reopen starts fresh
+                client = store._client
+                type(client)._identifer_to_system.pop(client._identifier, None)
+                client._system.stop()
+            except Exception as e:
+                print(f"⚠️ Could not release Chroma client: {e}")
+    
+    def memory_usage(self) -> Dict[str, Any]:
+        """Per-subsystem footprint: Chroma collections, record store, BM25 index, pending counters"""
+        return {
+            'collections': {
+                'npc_characters': self._collection_usage(self.npc_store, "npcs"),
+                'npc_dialogues': self._collection_usage(self.dialogue_store, "dialogues")
+            },
+            'records': self.records.memory_usage(),
+            'search_cache': self.search_cache.memory_usage(),
+            'lexical': self.lexical.memory_usage() if self._lexical_loaded else {'loaded': False},
+            'interactions': self.interactions.memory_usage()
+        }
     
+    def _collection_usage(self, store: Chroma, subdir: str) -> Dict[str, Any]:
+        """Vector count plus an HNSW footprint estimate: float32 vectors and 2*M int32 links per node"""
+        usage = {'disk_bytes': directory_size(os.path.join(self.data_dir, subdir))}
+        try:
+            collection = store._collection
+            count = collection.count()
+            dimension = 0
+            if count:
+                embeddings = collection.peek(1).get('embeddings')
+                dimension = len(embeddings[0]) if embeddings is not None and len(embeddings) else 0
+            links = (collection.metadata or {}).get('hnsw:M', 16) * 2
+            usage.update({
+                'vectors': count,
+                'dimension': dimension,
+                'approx_index_bytes': count * (dimension * 4 + links * 4)
+            })
+        except Exception as e:
+            usage['error'] = str(e)
+        return usage
+    
+    def _migrate_legacy_records(self):
+        """Copy payloads embedded in older Chroma metadata into the record store (runs once)"""
+        if self.records.get_meta("legacy_migrated"):
+            return
+
+        try:
+            npc_results = self.npc_store.get(include=["metadatas"])
+            npc_records = [
+                (json.loads(m['npc_data']), json.loads(m['world_data']), json.loads(m['behavior_data']))
+                for m in npc_results['metadatas']
+                if m and 'npc_data' in m and not self.records.has_npc(m['npc_id'])
+            ]
+            self.records.put_npcs(npc_records)
+
+            dialogue_results = self.dialogue_store.get(include=["metadatas"])
+            dialogue_records = [
+                (dialogue_id, json.loads(m['dialogue_data']))
+                for dialogue_id, m in zip(dialogue_results['ids'], dialogue_results['metadatas'])
+                if m and 'dialogue_data' in m
+            ]
+            self.records.put_dialogues(dialogue_records)
 
+            self.records.set_meta("legacy_migrated", datetime.now().isoformat())
+            if npc_records or dialogue_records:
+                print(f"📦 Migrated {len(npc_records)} NPCs and {len(dialogue_records)} dialogues into the record store")
+        except Exception as e:
+            print(f"⚠️ Legacy record migration failed: {e}")
     
+
     def store_npc(self, npc: NPCCharacter, world: WorldSettings, behavior: NPCBehavior) -> str:
         """Store an NPC with all its context"""
         if not npc.npc_id:
@@ -46,114 +174,359 @@ class NPCStorage:
         # Create searchable text for the NPC
         npc_text = self._npc_to_searchable_text(npc, world, behavior)
         
-        # Store in vector database
+        # Vector database only keeps the embedding and filter fields
         document = Document(
             page_content=npc_text,
-            metadata={
-                "npc_id": npc.npc_id,
-                "name": npc.name,
-                "type": "npc_character",
-                "faction": npc.faction,
-                "profession": npc.profession_role,
-                "location": world.location,
-                "world_theme": world.world_theme,
-                "npc_data": json.dumps(npc.to_dict()),
-                "world_data": json.dumps(world.__dict__),
-                "behavior_data": json.dumps(behavior.__dict__),
-                "created_at": datetime.now().isoformat()
-            }
+            metadata=self._npc_metadata(npc, world)
         )
         
         self.npc_store.add_documents([document], ids=[npc.npc_id])
+        self.records.put_npc(npc.to_dict(), to_record(world), to_record(behavior))
+        self._index_lexical(npc.npc_id, npc_text, document.metadata)
+        self._notify_write([npc.npc_id], searchable=True)
         print(f"✅ NPC '{npc.name}' stored with ID: {npc.npc_id}")
         return npc.npc_id
     
+    def update_npc(self, npc_id: str, patch: Dict[str, Dict[str, Any]]) -> str:
+        """Patch fields of a stored NPC in place.
+
+        ``patch`` maps a section ('npc', 'world', 'behavior') to the fields to set.
+        Returns 'not_found', 'unchanged', 'updated' or 'reembedded'.
+        """
+        return self.update_npcs({npc_id: patch})[npc_id]
+    
+    def update_npcs(self, patches: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, str]:
+        """Apply many NPC patches as one record-store write and one embedding batch.
+
+        Only NPCs whose searchable text changed are re-embedded; everything else
+        (mood, relationships, counters...) is a plain record update.
+        """
+        # Read-modify-write: concurrent patches to the same NPC must not lose updates.
+        # Not the turn lock - a per-turn patch must not wait for the NPC's LLM call
+        with self._record_locks.hold_many(patches):
+            return self._apply_patches(patches)
+    
+    def _apply_patches(self, patches: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, str]:
+        records = self.records.get_npcs(list(patches))
+        statuses: Dict[str, str] = {}
+        changed_records = []
+        reembed_ids, reembed_docs = [], []
+        
+        for npc_id, patch in patches.items():
+            record = records.get(npc_id)
+            if not record:
+                statuses[npc_id] = "not_found"
+                continue
+            
+            changed = False
+            needs_embedding = False
+            for section, values in patch.items():
+                if section not in SEARCHABLE_FIELDS:
+                    raise ValueError(f"Unknown NPC section '{section}'")
+                for field_name, value in values.items():
+                    if section == 'npc' and field_name == 'npc_id':
+                        raise ValueError("npc_id cannot be patched")
+                    if record[section].get(field_name) == value:
+                        continue
+                    record[section][field_name] = value
+                    changed = True
+                    if field_name in SEARCHABLE_FIELDS[section]:
+                        needs_embedding = True
+            
+            if not changed:
+                statuses[npc_id] = "unchanged"
+                continue
+            
+            changed_records.append((record['npc'], record['world'], record['behavior']))
+            if needs_embedding:
+                npc, world, behavior = self._record_to_models(record)
+                metadata = self._npc_metadata(npc, world)
+                metadata['created_at'] = record['npc'].get('created_at', metadata['created_at'])
+                reembed_ids.append(npc_id)
+                reembed_docs.append(Document(
+                    page_content=self._npc_to_searchable_text(npc, world, behavior),
+                    metadata=metadata
+                ))
+                statuses[npc_id] = "reembedded"
+            else:
+                statuses[npc_id] = "updated"
+        
+        if reembed_docs:
+            self.npc_store.update_documents(ids=reembed_ids, documents=reembed_docs)
+            for npc_id, document in zip(reembed_ids, reembed_docs):
+                self._index_lexical(npc_id, document.page_content, document.metadata)
+        if changed_records:
+            self.records.put_npcs(changed_records)
+            payload_only = [npc_id for npc_id, status in statuses.items() if status == "updated"]
+            if reembed_ids:
+                self._notify_write(reembed_ids, searchable=True)
+            if payload_only:
+                self._notify_write(payload_only, searchable=False)
+        
+        return statuses
+    
+    def add_write_listener(self, listener: Callable[[List[str], bool], None]):
+        """Call ``listener(npc_ids, searchable)`` after NPCs are stored or patched.
+
+        ``searchable`` is True when the change can affect search ranking or
+        filters (new NPC, re-embedded text), False for payload-only patches.
+        """
+        self._write_listeners.append(listener)
+    
+    def _notify_write(self, npc_ids: List[str], searchable: bool):
+        for listener in self._write_listeners:
+            try:
+                listener(npc_ids, searchable)
+            except Exception as e:
+                print(f"⚠️ NPC write listener failed: {e}")
+    
+    def _invalidate_search_cache(self, npc_ids: List[str], searchable: bool):
+        if searchable:
+            self.search_cache.clear()
+        else:
+            # Light records only carry searchable fields; only full payloads went stale
+            self.search_cache.invalidate_where(lambda key: key[-1])
+    
     def get_npc(self, npc_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve an NPC by ID"""
         try:
-            results = self.npc_store.get(ids=[npc_id])
-            if results['metadatas'] and len(results['metadatas']) > 0:
-                metadata = results['metadatas'][0]
-                return {
-                    'npc': json.loads(metadata['npc_data']),
-                    'world': json.loads(metadata['world_data']),
-                    'behavior': json.loads(metadata['behavior_data'])
-                }
+            npc_data = self.records.get_npc(npc_id)
+            if npc_data:
+                # Live counters are authoritative over the snapshot in the payload
+                stats = self.interactions.get_stats(npc_id)
+                npc_data['npc']['interaction_count'] = stats['interaction_count']
+                npc_data['npc']['last_interaction'] = stats['last_interaction']
+            return npc_data
         except Exception as e:
             print(f"Error retrieving NPC {npc_id}: {e}")
         return None
     
-    def search_npcs(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Search for NPCs based on description"""
-        results = self.npc_store.similarity_search(query, k=limit)
-        npcs = []
-        
-        for doc in results:
-            metadata = doc.metadata
-            npcs.append({
-                'npc_id': metadata['npc_id'],
-                'name': metadata['name'],
-                'profession': metadata['profession'],
-                'faction': metadata['faction'],
-                'location': metadata['location'],
-                'npc_data': json.loads(metadata['npc_data']),
-                'world_data': json.loads(metadata['world_data']),
-                'behavior_data': json.loads(metadata['behavior_data'])
-            })
+    def record_interaction(self, npc_id: str, mood: str, timestamp: Optional[datetime] = None):
+        """Count a player interaction with an NPC (coalesced, flushed in batches; see InteractionTracker)"""
+        self.interactions.record(npc_id, mood, timestamp)
+    
+    def get_interaction_stats(self, npc_id: str) -> Dict[str, Any]:
+        """O(1) interaction counters and mood tallies for an NPC"""
+        return self.interactions.get_stats(npc_id)
+    
+    def search_npcs(self, query: str, limit: int = 5,
+                    filters: Optional[Dict[str, str]] = None,
+                    offset: int = 0,
+                    include_payload: bool = False,
+                    mode: str = "vector") -> List[Dict[str, Any]]:
+        """Search for NPCs based on description.
+
+        ``filters`` restricts by faction, location, world_theme, profession or name
+        before the search runs. ``mode`` is 'vector' (embeddings), 'lexical' (BM25)
+        or 'hybrid' (both, fused by reciprocal rank; exact name matches short-circuit
+        without an embedding call). Results are lightweight records; the full
+        npc/world/behavior payloads are only decoded when ``include_payload`` is set.
+        An empty query with filters is a plain record-store scan (no embedding).
+        """
+        filters = {k: v for k, v in (filters or {}).items() if v not in (None, "")}
+        unknown = set(filters) - set(NPC_FILTER_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unsupported NPC filters: {', '.join(sorted(unknown))}")
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}'")
+        
+        # include_payload stays last in the key; payload-only writes match on it
+        cache_key = (mode, " ".join(query.lower().split()), tuple(sorted(filters.items())),
+                     limit, offset, include_payload)
+        generation = self.search_cache.generation
+        cached = self.search_cache.get(cache_key)
+        # Callers get their own copies, nested payload dicts included, so editing
+        # a result never changes what the next cache hit returns
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
+        npcs = self._search_uncached(query, limit, filters, offset, include_payload, mode)
+        self.search_cache.set(cache_key, npcs, generation=generation)
+        return copy.deepcopy(npcs)
+    
+    def _search_uncached(self, query: str, limit: int, filters: Dict[str, str],
+                         offset: int, include_payload: bool, mode: str) -> List[Dict[str, Any]]:
+        if not query.strip():
+            npcs = self.records.list_npcs(filters, limit=limit, offset=offset)
+        elif mode == "vector":
+            npcs = self._vector_search(query, offset + limit, filters)[offset:]
+        else:
+            npcs = self._lexical_search(query, offset + limit, filters, hybrid=(mode == "hybrid"))[offset:]
+        npcs = npcs[:limit]
+        
+        if include_payload:
+            records = self.records.get_npcs([npc['npc_id'] for npc in npcs])
+            for npc in npcs:
+                record = records.get(npc['npc_id'], {})
+                npc['npc_data'] = record.get('npc')
+                npc['world_data'] = record.get('world')
+                npc['behavior_data'] = record.get('behavior')
         
         return npcs
     
-    def store_dialogue(self, dialogue: DialogueEntry):
+    def _vector_search(self, query: str, k: int, filters: Dict[str, str]) -> List[Dict[str, Any]]:
+        results = self.npc_store.similarity_search(query, k=k, filter=self._chroma_filter(filters))
+        return [self._light_record(doc.metadata) for doc in results]
+    
+    def _lexical_search(self, query: str, k: int, filters: Dict[str, str], hybrid: bool) -> List[Dict[str, Any]]:
+        self._ensure_lexical_index()
+        
+        # Exact name hits answer the query outright - no embedding needed
+        exact_ids = self.lexical.exact_name_matches(query, filters)
+        if exact_ids:
+            return [self._light_record(self.lexical.get_metadata(npc_id)) for npc_id in exact_ids]
+        
+        lexical_ids = [npc_id for npc_id, _ in self.lexical.search(query, k, filters)]
+        if not hybrid:
+            return [self._light_record(self.lexical.get_metadata(npc_id)) for npc_id in lexical_ids]
+        
+        vector_hits = self._vector_search(query, k, filters)
+        fused: Dict[str, float] = {}
+        records: Dict[str, Dict[str, Any]] = {}
+        for rank, npc_id in enumerate(lexical_ids):
+            fused[npc_id] = fused.get(npc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            records[npc_id] = self._light_record(self.lexical.get_metadata(npc_id))
+        for rank, record in enumerate(vector_hits):
+            npc_id = record['npc_id']
+            fused[npc_id] = fused.get(npc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            records.setdefault(npc_id, record)
+        
+        ranked = sorted(fused, key=fused.get, reverse=True)
+        return [records[npc_id] for npc_id in ranked[:k]]
+    
+    def _ensure_lexical_index(self):
+        """Build the BM25 index from the stored searchable text (no embedding calls)"""
+        if self._lexical_loaded:
+            return
+        with self._lexical_lock:
+            if self._lexical_loaded:
+                return
+            results = self.npc_store.get(include=["documents", "metadatas"])
+            for npc_id, text, metadata in zip(results['ids'], results['documents'], results['metadatas']):
+                self.lexical.add(npc_id, text or "", metadata or {})
+            self._lexical_loaded = True
+            print(f"🔤 Lexical NPC index built with {len(self.lexical)} entries")
+    
+    def _index_lexical(self, npc_id: str, text: str, metadata: Dict[str, Any]):
+        """Keep the BM25 index in step with writes (once it has been built)"""
+        with self._lexical_lock:
+            if self._lexical_loaded:
+                self.lexical.add(npc_id, text, metadata)
+    
+    def _light_record(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'npc_id': metadata['npc_id'],
+            'name': metadata.get('name'),
+            'profession': metadata.get('profession'),
+            'faction': metadata.get('faction'),
+            'location': metadata.get('location'),
+            'world_theme': metadata.get('world_theme')
+        }
+    
+    def _chroma_filter(self, filters: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Translate simple equality filters into a Chroma where clause"""
+        if not filters:
+            return None
+        if len(filters) == 1:
+            return dict(filters)
+        return {"$and": [{key: value} for key, value in filters.items()]}
+    
+    def store_dialogue(self, dialogue: DialogueEntry, count_interaction: bool = False):
         """Store a dialogue entry"""
-        dialogue_text = f"Player: {dialogue.player_input}\nNPC: {dialogue.npc_response}"
+        return self.store_dialogues([dialogue], count_interactions=count_interaction)[0]
+    
+    def store_dialogues(self, dialogues: List[DialogueEntry], count_interactions: bool = False) -> List[str]:
+        """Store many dialogue entries with one embedding batch and one record-store write.
+
+        With ``count_interactions`` each entry also counts as an interaction with
+        its NPC, written in the same transaction (durable, unlike record_interaction).
+        """
+        if not dialogues:
+            return []
         
-        document = Document(
-            page_content=dialogue_text,
-            metadata={
-                "npc_id": dialogue.npc_id,
-                "type": "dialogue",
-                "dialogue_type": dialogue.dialogue_type,
-                "mood": dialogue.mood,
-                "timestamp": dialogue.timestamp.isoformat(),
-                "dialogue_data": json.dumps(dialogue.to_dict())
-            }
-        )
+        dialogue_ids, documents = [], []
+        for dialogue in dialogues:
+            if dialogue.player_input:
+                dialogue_text = f"Player: {dialogue.player_input}\nNPC: {dialogue.npc_response}"
+            else:
+                dialogue_text = f"NPC: {dialogue.npc_response}"
+            dialogue_id = f"dialogue_{uuid.uuid4().hex[:8]}"
+            
+            dialogue_ids.append(dialogue_id)
+            documents.append(Document(
+                page_content=dialogue_text,
+                metadata={
+                    "npc_id": dialogue.npc_id,
+                    "dialogue_id": dialogue_id,
+                    "type": "dialogue",
+                    "dialogue_type": dialogue.dialogue_type,
+                    "mood": dialogue.mood,
+                    "timestamp": dialogue.timestamp.isoformat()
+                }
+            ))
         
-        dialogue_id = f"dialogue_{uuid.uuid4().hex[:8]}"
-        self.dialogue_store.add_documents([document], ids=[dialogue_id])
+        self.dialogue_store.add_documents(documents, ids=dialogue_ids)
+        deltas = None
+        if count_interactions:
+            deltas = interaction_deltas((dialogue.npc_id, dialogue.mood, dialogue.timestamp)
+                                        for dialogue in dialogues)
+        self.records.put_dialogues(
+            ((dialogue_id, dialogue.to_dict()) for dialogue_id, dialogue in zip(dialogue_ids, dialogues)),
+            interaction_deltas=deltas
+        )
+        return dialogue_ids
     
-    def get_npc_dialogue_history(self, npc_id: str, limit: int = 10) -> List[DialogueEntry]:
-        """Get recent dialogue history for an NPC"""
+    def get_npc_dialogue_history(self, npc_id: str, limit: int = 10,
+                                 player_only: bool = True) -> List[DialogueEntry]:
+        """Get recent dialogue history for an NPC (exchanges with the player unless player_only=False)"""
         try:
-            # Search for dialogues with this NPC
-            results = self.dialogue_store.similarity_search(
-                f"npc_id:{npc_id}",
-                k=limit,
-                filter={"npc_id": npc_id}
-            )
-            
-            dialogues = []
-            for doc in results:
-                dialogue_data = json.loads(doc.metadata['dialogue_data'])
-                dialogue = DialogueEntry(
-                    npc_id=dialogue_data['npc_id'],
-                    player_input=dialogue_data['player_input'],
-                    npc_response=dialogue_data['npc_response'],
-                    context=dialogue_data['context'],
-                    timestamp=datetime.fromisoformat(dialogue_data['timestamp']),
-                    dialogue_type=dialogue_data['dialogue_type'],
-                    mood=dialogue_data['mood']
-                )
-                dialogues.append(dialogue)
-            
-            # Sort by timestamp (most recent first)
-            dialogues.sort(key=lambda x: x.timestamp, reverse=True)
-            return dialogues[:limit]
+            # Range scan on (npc_id, timestamp) - no vector search needed
+            exclude_types = NON_PLAYER_DIALOGUE_TYPES if player_only else ()
+            return [
+                from_record(DialogueEntry, dialogue_data)
+                for dialogue_data in self.records.get_dialogues(npc_id, limit=limit, exclude_types=exclude_types)
+            ]
             
         except Exception as e:
             print(f"Error retrieving dialogue history: {e}")
             return []
     
+    def get_index_settings(self) -> Dict[str, Dict[str, Any]]:
+        """HNSW settings the collections were actually created with"""
+        return {
+            'npc_characters': dict(self.npc_store._collection.metadata or {}),
+            'npc_dialogues': dict(self.dialogue_store._collection.metadata or {})
+        }
+    
+    def get_dialogue_summaries(self, npc_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Summarized memory records left behind by dialogue compaction"""
+        try:
+            return self.records.get_summaries(npc_id, limit=limit)
+        except Exception as e:
+            print(f"Error retrieving dialogue summaries: {e}")
+            return []
+    
+    def _npc_metadata(self, npc: NPCCharacter, world: WorldSettings) -> Dict[str, Any]:
+        """Filter fields kept alongside the NPC vector"""
+        return {
+            "npc_id": npc.npc_id,
+            "name": npc.name,
+            "type": "npc_character",
+            "faction": npc.faction,
+            "profession": npc.profession_role,
+            "location": world.location,
+            "world_theme": world.world_theme,
+            "created_at": datetime.now().isoformat()
+        }
+    
+    def _record_to_models(self, record: Dict[str, Any]) -> tuple:
+        """Rebuild model objects from a stored record, ignoring unknown keys"""
+        return (
+            from_record(NPCCharacter, record['npc']),
+            from_record(WorldSettings, record['world']),
+            from_record(NPCBehavior, record['behavior'])
+        )
+    
     def _npc_to_searchable_text(self, npc: NPCCharacter, world: WorldSettings, behavior: NPCBehavior) -> str:
         """Convert NPC data to searchable text"""
         text_parts = [
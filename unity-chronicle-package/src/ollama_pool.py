@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Callable
+
+import requests
+from langchain_core.embeddings import Embeddings
+
+from config.settings import (
+    OLLAMA_LLM_ENDPOINTS, OLLAMA_EMBEDDING_ENDPOINTS,
+    OLLAMA_HEALTH_CHECK_INTERVAL, OLLAMA_HEALTH_CHECK_TIMEOUT
+)
+
+try:
+    import httpx
+    _TRANSPORT_ERRORS = (ConnectionError, TimeoutError, OSError, httpx.TransportError)
+except ImportError:
+    _TRANSPORT_ERRORS = (ConnectionError, TimeoutError, OSError)
+
+class NoHealthyEndpoint(RuntimeError):
+    """Raised when every endpoint in a pool is down"""
+
+class OllamaEndpoint:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        self.requests = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        completed = self.requests - self.failures
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+            'avg_ms': round(self.total_seconds / completed * 1000, 1) if completed else None,
+            'last_error': self.last_error
+        }
+
+class OllamaPool:
+    """Least-outstanding-requests routing over several Ollama instances.
+
+    An endpoint that fails at the transport level is marked down and the call
+    fails over to the next one. A background thread polls /api/tags so down
+    endpoints come back once they answer again. Ties rotate from a per-process
+    offset so pool processes (see npc_simulation) spread over the endpoints.
+    """
+
+    def __init__(self, urls: List[str],
+                 health_interval: float = OLLAMA_HEALTH_CHECK_INTERVAL,
+                 health_timeout: float = OLLAMA_HEALTH_CHECK_TIMEOUT):
+        if not urls:
+            raise ValueError("OllamaPool needs at least one endpoint")
+        self.endpoints = [OllamaEndpoint(url) for url in urls]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self._rotation = os.getpid()
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        if health_interval > 0 and len(self.endpoints) > 1:
+            self._health_thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self._health_thread.start()
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def call(self, fn: Callable[[OllamaEndpoint], Any]) -> Any:
+        """Run fn against the least busy healthy endpoint, failing over on transport errors"""
+        tried = set()
+        last_error = None
+        while len(tried) < len(self.endpoints):
+            endpoint = self._acquire(exclude=tried)
+            if endpoint is None:
+                break
+            tried.add(endpoint.url)
+            started = time.perf_counter()
+            try:
+                result = fn(endpoint)
+            except _TRANSPORT_ERRORS as e:
+                last_error = e
+                self._release(endpoint, started, error=e)
+                print(f"⚠️ Ollama endpoint {endpoint.url} failed ({e.__class__.__name__}), failing over")
+                continue
+            except Exception:
+                self._release(endpoint, started)
+                raise
+            self._release(endpoint, started)
+            return result
+        raise NoHealthyEndpoint(f"No Ollama endpoint could serve the request: {last_error}")
+
+    @contextmanager
+    def lease(self):
+        """Hold an endpoint for a multi-step operation such as a token stream"""
+        endpoint = self._acquire(exclude=set())
+        if endpoint is None:
+            raise NoHealthyEndpoint("All Ollama endpoints are down")
+        started = time.perf_counter()
+        try:
+            yield endpoint
+        except _TRANSPORT_ERRORS as e:
+            self._release(endpoint, started, error=e)
+            raise
+        except BaseException:
+            self._release(endpoint, started)
+            raise
+        else:
+            self._release(endpoint, started)
+
+    def check_health(self) -> List[Dict[str, Any]]:
+        """Probe every endpoint now"""
+        for endpoint in self.endpoints:
+            try:
+                response = requests.get(f"{endpoint.url}/api/tags", timeout=self.health_timeout)
+                healthy = response.status_code == 200
+                error = None if healthy else f"HTTP {response.status_code}"
+            except Exception as e:
+                healthy, error = False, str(e)
+            with self._lock:
+                if healthy and not endpoint.healthy:
+                    print(f"✅ Ollama endpoint {endpoint.url} is back")
+                endpoint.healthy = healthy
+                endpoint.last_checked = time.time()
+                if error:
+                    endpoint.last_error = error
+        return self.stats()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [endpoint.to_dict() for endpoint in self.endpoints]
+
+    def close(self):
+        self._stop.set()
+
+    def _acquire(self, exclude: set) -> Optional[OllamaEndpoint]:
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.url not in exclude and e.healthy]
+            if not candidates:
+                # Everything looks down: still try the rest rather than fail without asking
+                candidates = [e for e in self.endpoints if e.url not in exclude]
+            if not candidates:
+                return None
+            self._rotation += 1
+            offset = self._rotation % len(candidates)
+            rotated = candidates[offset:] + candidates[:offset]
+            endpoint = min(rotated, key=lambda e: e.outstanding)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: OllamaEndpoint, started: float, error: Optional[Exception] = None):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if error is not None:
+                endpoint.failures += 1
+                endpoint.healthy = False
+                endpoint.last_error = str(error)
+            else:
+                endpoint.healthy = True
+                endpoint.total_seconds += time.perf_counter() - started
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                print(f"⚠️ Ollama health check failed: {e}")
+
+_pools: Dict[str, OllamaPool] = {}
+_pools_lock = threading.Lock()
+
+def get_llm_pool() -> OllamaPool:
+    """Process-wide pool of chat endpoints, shared so outstanding counts are global"""
+    return _shared_pool("llm", OLLAMA_LLM_ENDPOINTS)
+
+def get_embedding_pool() -> OllamaPool:
+    """Process-wide pool of embedding endpoints"""
+    return _shared_pool("embedding", OLLAMA_EMBEDDING_ENDPOINTS)
+
+def _shared_pool(kind: str, urls: List[str]) -> OllamaPool:
+    with _pools_lock:
+        if kind not in _pools:
+            _pools[kind] = OllamaPool(urls)
+        return _pools[kind]
+
+class PooledChatModel:
+    """ChatOllama-compatible invoke/stream that routes each call through a pool"""
+
+    def __init__(self, pool: OllamaPool, **chat_kwargs):
+        self.pool = pool
+        self.chat_kwargs = chat_kwargs
+        self.model = chat_kwargs.get('model')
+        self._clients: Dict[str, Any] = {}
+        self._clients_lock = threading.Lock()
+
+    def invoke(self, input, **kwargs):
+        return self.pool.call(lambda endpoint: self._client(endpoint).invoke(input, **kwargs))
+
+    def stream(self, input, **kwargs):
+        """Stream chunks; the endpoint is held until the stream is exhausted"""
+        with self.pool.lease() as endpoint:
+            for chunk in self._client(endpoint).stream(input, **kwargs):
+                yield chunk
+
+    def _client(self, endpoint: OllamaEndpoint):
+        with self._clients_lock:
+            client = self._clients.get(endpoint.url)
+            if client is None:
+                from langchain_ollama import ChatOllama
+                client = ChatOllama(base_url=endpoint.url, **self.chat_kwargs)
+                self._clients[endpoint.url] = client
+            return client
+
+class PooledEmbeddings(Embeddings):
+    """OllamaEmbeddings routed through a pool; usable as a Chroma embedding_function"""
+
+    def __init__(self, pool: OllamaPool, **embedding_kwargs):
+        self.pool = pool
+        self.embedding_kwargs = embedding_kwargs
+        self._clients: Dict[str, Any] = {}
+        self._clients_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.pool.call(lambda endpoint: self._client(endpoint).embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.pool.call(lambda endpoint: self._client(endpoint).embed_query(text))
+
+    def _client(self, endpoint: OllamaEndpoint):
+        with self._clients_lock:
+            client = self._clients.get(endpoint.url)
+            if client is None:
+                from langchain_ollama import OllamaEmbeddings
+                client = OllamaEmbeddings(base_url=endpoint.url, **self.embedding_kwargs)
+                self._clients[endpoint.url] = client
+            return client
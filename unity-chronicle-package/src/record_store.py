@@ -0,0 +1,485 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Iterable
+
+from models import codec
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS npcs (
+    npc_id TEXT PRIMARY KEY,
+    name TEXT,
+    faction TEXT,
+    profession TEXT,
+    location TEXT,
+    world_theme TEXT,
+    npc_data TEXT NOT NULL,
+    world_data TEXT NOT NULL,
+    behavior_data TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_npcs_faction ON npcs(faction);
+CREATE INDEX IF NOT EXISTS idx_npcs_location ON npcs(location);
+
+CREATE TABLE IF NOT EXISTS dialogues (
+    dialogue_id TEXT PRIMARY KEY,
+    npc_id TEXT NOT NULL,
+    dialogue_type TEXT,
+    mood TEXT,
+    timestamp TEXT NOT NULL,
+    dialogue_data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_dialogues_npc_time ON dialogues(npc_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_dialogues_timestamp ON dialogues(timestamp);
+
+CREATE TABLE IF NOT EXISTS dialogue_summaries (
+    summary_id TEXT PRIMARY KEY,
+    npc_id TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    exchange_count INTEGER NOT NULL,
+    summary_data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_npc_time ON dialogue_summaries(npc_id, end_time);
+
+CREATE TABLE IF NOT EXISTS npc_stats (
+    npc_id TEXT PRIMARY KEY,
+    interaction_count INTEGER NOT NULL DEFAULT 0,
+    last_interaction TEXT,
+    last_mood TEXT
+);
+
+CREATE TABLE IF NOT EXISTS npc_mood_counts (
+    npc_id TEXT NOT NULL,
+    mood TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (npc_id, mood)
+);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+NPC_FILTER_COLUMNS = ("faction", "profession", "location", "world_theme", "name")
+
+
+class RecordStore:
+    """Embedded SQLite store holding the canonical NPC and dialogue payloads.
+
+    Chroma only keeps vectors and filter fields; everything that is looked up
+    by key, patched or range-scanned lives here.
+    """
+
+    def __init__(self, db_path: str):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    # ------------------------------------------------------------------ NPCs
+
+    def put_npc(self, npc_data: Dict[str, Any], world_data: Dict[str, Any], behavior_data: Dict[str, Any]):
+        """Insert or replace the canonical record for an NPC"""
+        self.put_npcs([(npc_data, world_data, behavior_data)])
+
+    def put_npcs(self, records: Iterable[tuple]):
+        """Insert or replace several NPC records in a single transaction"""
+        now = datetime.now().isoformat()
+        rows = [
+            self._npc_row(npc_data, world_data, behavior_data, now)
+            for npc_data, world_data, behavior_data in records
+        ]
+        with self._lock:
+            with self._transaction():
+                self._conn.executemany("""
+                    INSERT INTO npcs (npc_id, name, faction, profession, location, world_theme,
+                                      npc_data, world_data, behavior_data, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(npc_id) DO UPDATE SET
+                        name = excluded.name,
+                        faction = excluded.faction,
+                        profession = excluded.profession,
+                        location = excluded.location,
+                        world_theme = excluded.world_theme,
+                        npc_data = excluded.npc_data,
+                        world_data = excluded.world_data,
+                        behavior_data = excluded.behavior_data,
+                        updated_at = excluded.updated_at
+                """, rows)
+
+    def get_npc(self, npc_id: str) -> Optional[Dict[str, Any]]:
+        """Point lookup of a single NPC record"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM npcs WHERE npc_id = ?", (npc_id,)).fetchone()
+        return self._decode_npc(row) if row else None
+
+    def get_npcs(self, npc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch several NPC records at once, keyed by npc_id"""
+        if not npc_ids:
+            return {}
+        placeholders = ",".join("?" * len(npc_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM npcs WHERE npc_id IN ({placeholders})", list(npc_ids)
+            ).fetchall()
+        return {row['npc_id']: self._decode_npc(row) for row in rows}
+
+    def find_npcs(self, filters: Optional[Dict[str, str]] = None,
+                  limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Range scan NPC records by their indexed filter columns"""
+        clauses, params = self._filter_clauses(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM npcs {where} ORDER BY created_at LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [self._decode_npc(row) for row in rows]
+
+    def list_npcs(self, filters: Optional[Dict[str, str]] = None,
+                  limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Like find_npcs but only the indexed columns, without decoding payloads"""
+        clauses, params = self._filter_clauses(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT npc_id, name, profession, faction, location, world_theme FROM npcs {where} "
+                f"ORDER BY created_at LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def has_npc(self, npc_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM npcs WHERE npc_id = ?", (npc_id,)).fetchone()
+        return row is not None
+
+    def delete_npc(self, npc_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM npcs WHERE npc_id = ?", (npc_id,))
+
+    # ------------------------------------------------------------- Dialogues
+
+    def put_dialogue(self, dialogue_id: str, dialogue_data: Dict[str, Any]):
+        """Insert a dialogue record"""
+        self.put_dialogues([(dialogue_id, dialogue_data)])
+
+    def put_dialogues(self, records: Iterable[tuple],
+                      interaction_deltas: Optional[Dict[str, Dict[str, Any]]] = None):
+        """Insert several dialogue records in a single transaction.
+
+        ``interaction_deltas`` (see apply_interaction_deltas) are added in the same
+        transaction, so a stored exchange and its interaction count land together.
+        """
+        rows = [
+            (dialogue_id, data['npc_id'], data.get('dialogue_type'), data.get('mood'),
+             data['timestamp'], codec.dumps(data))
+            for dialogue_id, data in records
+        ]
+        with self._lock:
+            with self._transaction():
+                self._conn.executemany("""
+                    INSERT OR REPLACE INTO dialogues
+                        (dialogue_id, npc_id, dialogue_type, mood, timestamp, dialogue_data)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, rows)
+                if interaction_deltas:
+                    self._apply_interaction_deltas(interaction_deltas)
+
+    def get_dialogues(self, npc_id: str, limit: int = 10,
+                      since: Optional[datetime] = None,
+                      until: Optional[datetime] = None,
+                      exclude_types: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Most recent dialogues for an NPC (newest first), optionally within a time range"""
+        clauses = ["npc_id = ?"]
+        params: List[Any] = [npc_id]
+        exclude_types = list(exclude_types)
+        if exclude_types:
+            clauses.append(f"COALESCE(dialogue_type, '') NOT IN ({', '.join('?' * len(exclude_types))})")
+            params.extend(exclude_types)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since.isoformat())
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until.isoformat())
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT dialogue_id, dialogue_data FROM dialogues WHERE {' AND '.join(clauses)} "
+                f"ORDER BY timestamp DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+
+        dialogues = []
+        for row in rows:
+            data = codec.loads(row['dialogue_data'])
+            data['dialogue_id'] = row['dialogue_id']
+            dialogues.append(data)
+        return dialogues
+
+    def dialogue_watermark(self, npc_id: str) -> tuple:
+        """(count, newest timestamp) of an NPC's dialogues - changes whenever they do"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), MAX(timestamp) FROM dialogues WHERE npc_id = ?", (npc_id,)
+            ).fetchone()
+        return row[0], row[1]
+
+    def count_dialogues(self, npc_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM dialogues WHERE npc_id = ?", (npc_id,)
+            ).fetchone()
+        return row[0]
+
+    def npcs_over_retention(self, keep_recent: int) -> List[str]:
+        """NPC ids holding more raw dialogues than the retention window"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT npc_id FROM dialogues GROUP BY npc_id HAVING COUNT(*) > ?", (keep_recent,)
+            ).fetchall()
+        return [row['npc_id'] for row in rows]
+
+    def get_compactable_dialogues(self, npc_id: str, keep_recent: int,
+                                  older_than: datetime) -> List[Dict[str, Any]]:
+        """Dialogues outside the newest ``keep_recent`` and older than a cutoff, oldest first"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT dialogue_id, dialogue_data FROM (
+                    SELECT dialogue_id, dialogue_data, timestamp FROM dialogues
+                    WHERE npc_id = ?
+                    ORDER BY timestamp DESC LIMIT -1 OFFSET ?
+                )
+                WHERE timestamp < ?
+                ORDER BY timestamp ASC
+            """, (npc_id, keep_recent, older_than.isoformat())).fetchall()
+
+        dialogues = []
+        for row in rows:
+            data = codec.loads(row['dialogue_data'])
+            data['dialogue_id'] = row['dialogue_id']
+            dialogues.append(data)
+        return dialogues
+
+    # ----------------------------------------------------- Dialogue summaries
+
+    def delete_dialogues(self, dialogue_ids: List[str]):
+        with self._lock:
+            with self._transaction():
+                self._conn.executemany(
+                    "DELETE FROM dialogues WHERE dialogue_id = ?", [(d,) for d in dialogue_ids]
+                )
+
+    def replace_with_summary(self, dialogue_ids: List[str], summary_id: str, summary_data: Dict[str, Any]):
+        """Atomically drop raw dialogues and insert the summary that replaces them"""
+        with self._lock:
+            with self._transaction():
+                self._conn.executemany(
+                    "DELETE FROM dialogues WHERE dialogue_id = ?", [(d,) for d in dialogue_ids]
+                )
+                self._conn.execute("""
+                    INSERT OR REPLACE INTO dialogue_summaries
+                        (summary_id, npc_id, start_time, end_time, exchange_count, summary_data)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (summary_id, summary_data['npc_id'], summary_data['start_time'],
+                      summary_data['end_time'], summary_data['exchange_count'], codec.dumps(summary_data)))
+
+    def get_summaries(self, npc_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most recent summarized memory records for an NPC (newest first)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT summary_id, summary_data FROM dialogue_summaries WHERE npc_id = ? "
+                "ORDER BY end_time DESC LIMIT ?", (npc_id, limit)
+            ).fetchall()
+
+        summaries = []
+        for row in rows:
+            data = codec.loads(row['summary_data'])
+            data['summary_id'] = row['summary_id']
+            summaries.append(data)
+        return summaries
+
+    # ------------------------------------------------- Interaction counters
+
+    def apply_interaction_deltas(self, deltas: Dict[str, Dict[str, Any]]):
+        """Atomically add coalesced interaction deltas.
+
+        ``deltas`` maps npc_id to {'count', 'last_interaction', 'last_mood', 'moods'}.
+        Counters are incremented in SQL so concurrent writers never lose updates.
+        """
+        with self._lock:
+            with self._transaction():
+                self._apply_interaction_deltas(deltas)
+
+    def _apply_interaction_deltas(self, deltas: Dict[str, Dict[str, Any]]):
+        """Counter upserts; the caller holds the lock and an open transaction"""
+        stats_rows = [
+            (npc_id, delta['count'], delta['last_interaction'], delta['last_mood'])
+            for npc_id, delta in deltas.items()
+        ]
+        mood_rows = [
+            (npc_id, mood, count)
+            for npc_id, delta in deltas.items()
+            for mood, count in delta['moods'].items()
+        ]
+        self._conn.executemany("""
+            INSERT INTO npc_stats (npc_id, interaction_count, last_interaction, last_mood)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(npc_id) DO UPDATE SET
+                interaction_count = interaction_count + excluded.interaction_count,
+                last_mood = CASE
+                    WHEN last_interaction IS NULL OR excluded.last_interaction >= last_interaction
+                    THEN excluded.last_mood ELSE last_mood END,
+                last_interaction = MAX(COALESCE(last_interaction, ''), excluded.last_interaction)
+        """, stats_rows)
+        self._conn.executemany("""
+            INSERT INTO npc_mood_counts (npc_id, mood, count) VALUES (?, ?, ?)
+            ON CONFLICT(npc_id, mood) DO UPDATE SET count = count + excluded.count
+        """, mood_rows)
+
+    def get_interaction_stats(self, npc_id: str) -> Dict[str, Any]:
+        """Persisted interaction counters for an NPC (zeroed if never met)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT interaction_count, last_interaction, last_mood FROM npc_stats WHERE npc_id = ?",
+                (npc_id,)
+            ).fetchone()
+            mood_rows = self._conn.execute(
+                "SELECT mood, count FROM npc_mood_counts WHERE npc_id = ?", (npc_id,)
+            ).fetchall()
+
+        return {
+            'interaction_count': row['interaction_count'] if row else 0,
+            'last_interaction': row['last_interaction'] if row else None,
+            'last_mood': row['last_mood'] if row else None,
+            'mood_counts': {r['mood']: r['count'] for r in mood_rows}
+        }
+
+    def backfill_interaction_stats(self):
+        """Seed counters from stored dialogues for NPCs that have no counters yet"""
+        with self._lock:
+            with self._transaction():
+                self._conn.execute("""
+                    INSERT INTO npc_stats (npc_id, interaction_count, last_interaction, last_mood)
+                    SELECT d.npc_id, COUNT(*), MAX(d.timestamp),
+                           (SELECT mood FROM dialogues WHERE npc_id = d.npc_id
+                            ORDER BY timestamp DESC LIMIT 1)
+                    FROM dialogues d
+                    WHERE d.npc_id NOT IN (SELECT npc_id FROM npc_stats)
+                    GROUP BY d.npc_id
+                """)
+                self._conn.execute("""
+                    INSERT INTO npc_mood_counts (npc_id, mood, count)
+                    SELECT npc_id, mood, COUNT(*) FROM dialogues
+                    WHERE mood IS NOT NULL
+                      AND npc_id NOT IN (SELECT DISTINCT npc_id FROM npc_mood_counts)
+                    GROUP BY npc_id, mood
+                """)
+
+    # ------------------------------------------------------------ Meta flags
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def memory_usage(self) -> Dict[str, Any]:
+        """On-disk size and SQLite page cache budget (rows live on disk, not in the heap)"""
+        with self._lock:
+            page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            cache_size = self._conn.execute("PRAGMA cache_size").fetchone()[0]
+            npcs = self._conn.execute("SELECT COUNT(*) FROM npcs").fetchone()[0]
+            dialogues = self._conn.execute("SELECT COUNT(*) FROM dialogues").fetchone()[0]
+        wal_path = f"{self.db_path}-wal"
+        return {
+            'npcs': npcs,
+            'dialogues': dialogues,
+            'db_bytes': page_size * page_count,
+            'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            # Negative cache_size is a KiB budget, positive is a page count
+            'page_cache_limit_bytes': -cache_size * 1024 if cache_size < 0 else cache_size * page_size
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --------------------------------------------------------------- Helpers
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    def _npc_row(self, npc_data: Dict[str, Any], world_data: Dict[str, Any],
+                 behavior_data: Dict[str, Any], now: str) -> tuple:
+        return (
+            npc_data['npc_id'],
+            npc_data.get('name'),
+            npc_data.get('faction'),
+            npc_data.get('profession_role'),
+            world_data.get('location'),
+            world_data.get('world_theme'),
+            codec.dumps(npc_data),
+            codec.dumps(world_data),
+            codec.dumps(behavior_data),
+            npc_data.get('created_at') or now,
+            now
+        )
+
+    def _decode_npc(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'npc': codec.loads(row['npc_data']),
+            'world': codec.loads(row['world_data']),
+            'behavior': codec.loads(row['behavior_data'])
+        }
+
+    def _filter_clauses(self, filters: Optional[Dict[str, str]]) -> tuple:
+        clauses, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in NPC_FILTER_COLUMNS:
+                raise ValueError(f"Unsupported NPC filter: {column}")
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        return clauses, params
+
+
+class _Transaction:
+    """Explicit BEGIN/COMMIT around a block on an autocommit connection"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.owner = False
+
+    def __enter__(self):
+        # Nested blocks join the enclosing transaction
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+            self.owner = True
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.owner:
+            return False
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
@@ -0,0 +1,180 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from config.settings import PROFILE_REQUESTS, PROFILE_ALLOW_HEADER, PROFILE_SAMPLE_INTERVAL, PROFILE_OUTPUT_DIR
+
+MODES = {'sample': 'sample', 'trace': 'trace', 'deterministic': 'trace'}
+PROFILE_HEADER = "X-Profile"
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+def _label(code) -> str:
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}".replace(";", ",")
+
+class _StackSampler:
+    """Samples one thread's stack every ``interval`` seconds from a helper thread.
+
+    Overhead lands on the helper, so the profiled request runs at nearly full
+    speed; weights are sample counts.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Dict[Tuple[str, ...], int] = defaultdict(int)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Dict[Tuple[str, ...], int]:
+        self._stop.set()
+        self._thread.join()
+        return dict(self.counts)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[tuple(reversed(stack))] += 1
+
+class _CallTracer:
+    """Deterministic profile of the current thread via sys.setprofile.
+
+    Every Python and C call is seen, so the weights (self time in µs per stack)
+    are exact but the request runs several times slower while traced.
+    """
+
+    def __init__(self):
+        self.times: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._stack: Tuple[str, ...] = ()
+        self._last = 0.0
+
+    def start(self):
+        self._last = time.perf_counter()
+        sys.setprofile(self._event)
+
+    def stop(self) -> Dict[Tuple[str, ...], int]:
+        sys.setprofile(None)
+        return {stack: int(seconds * 1_000_000) for stack, seconds in self.times.items() if seconds >= 1e-6}
+
+    def _event(self, frame, event, arg):
+        now = time.perf_counter()
+        if self._stack:
+            self.times[self._stack] += now - self._last
+        if event == 'call':
+            self._stack += (_label(frame.f_code),)
+        elif event == 'c_call':
+            self._stack += (f"<builtin>:{getattr(arg, '__qualname__', repr(arg))}",)
+        elif self._stack:  # return / c_return / c_exception
+            self._stack = self._stack[:-1]
+        self._last = time.perf_counter()
+
+class RequestProfiler:
+    """Opt-in per-request profiling for the Flask app.
+
+    A request is profiled when PROFILE_REQUESTS names a mode, or when it sends
+    ``X-Profile: sample|trace`` and headers are allowed. Each profile is written
+    to PROFILE_OUTPUT_DIR in collapsed-stack format ("a;b;c weight" per line),
+    which flamegraph.pl, speedscope and inferno read directly. The two root
+    frames are the endpoint and the NPC id so profiles can be merged and still
+    split by either. Only the request thread is profiled.
+
+    When neither is enabled, the hooks are not installed at all.
+    """
+
+    def __init__(self, output_dir: str = PROFILE_OUTPUT_DIR,
+                 default_mode: str = PROFILE_REQUESTS,
+                 allow_header: bool = PROFILE_ALLOW_HEADER,
+                 sample_interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.default_mode = MODES.get(default_mode)
+        self.allow_header = allow_header
+        self.sample_interval = sample_interval
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.default_mode or self.allow_header)
+
+    def install(self, app):
+        if not self.enabled:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        print(f"🔬 Request profiling: {self.default_mode or 'off'} by default"
+              f"{', opt-in via ' + PROFILE_HEADER + ' header' if self.allow_header else ''} -> {self.output_dir}")
+
+    def _before(self):
+        from flask import request, g
+        mode = self.default_mode
+        if self.allow_header:
+            mode = MODES.get(request.headers.get(PROFILE_HEADER, "").lower(), mode)
+        if not mode:
+            return
+        if mode == 'sample':
+            profiler = _StackSampler(threading.get_ident(), self.sample_interval)
+        else:
+            profiler = _CallTracer()
+        g.request_profile = (mode, profiler, time.perf_counter())
+        profiler.start()
+
+    def _after(self, response):
+        path = self._finish()
+        if path:
+            response.headers['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    def _teardown(self, _exc):
+        self._finish()  # the view raised, so _after never ran
+
+    def _finish(self) -> Optional[str]:
+        from flask import request, g
+        active = g.pop('request_profile', None)
+        if active is None:
+            return None
+        mode, profiler, started = active
+        stacks = profiler.stop()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        rule = request.url_rule.rule if request.url_rule else request.path
+        endpoint = f"{request.method}:{rule}"
+        npc_id = self._npc_tag(request)
+        try:
+            path = self._write(endpoint, npc_id, mode, stacks)
+        except OSError as e:
+            print(f"⚠️ Could not write profile: {e}")
+            return None
+        print(f"🔬 Profiled {endpoint} [{npc_id}] in {duration_ms:.0f}ms ({mode}, {len(stacks)} stacks) -> {path}")
+        return path
+
+    def _npc_tag(self, request) -> str:
+        npc_id = (request.view_args or {}).get('npc_id')
+        if not npc_id:
+            data = request.get_json(silent=True)
+            if isinstance(data, dict):
+                npc_id = data.get('npc_id') or "+".join(data.get('npc_ids') or [])
+        return npc_id or "no_npc"
+
+    def _write(self, endpoint: str, npc_id: str, mode: str, stacks: Dict[Tuple[str, ...], int]) -> str:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        name = _UNSAFE.sub("_", f"{stamp}_{endpoint}_{npc_id}_{mode}").strip("_")
+        path = os.path.join(self.output_dir, f"{name[:150]}.folded")
+        root = (endpoint.replace(";", ","), f"npc:{npc_id}".replace(";", ","))
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, weight in sorted(stacks.items()):
+                if weight > 0:
+                    f.write(f"{';'.join(root + stack)} {weight}\n")
+        return path
@@ -0,0 +1,99 @@
+import importlib
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable, List, Tuple
+
+from config.settings import STARTUP_REQUEST_TIMEOUT
+
+class ServiceNotReady(RuntimeError):
+    """Raised when a request needs a service that is still warming up"""
+
+class ServiceRegistry:
+    """Deferred construction of the heavy server services.
+
+    Importing LangChain/Chroma and opening the persistent stores takes seconds,
+    so the server binds its port first and builds everything here on a
+    background thread. Each stage (module import or constructor) is timed, which
+    doubles as the import-time profile exposed by /readyz.
+    """
+
+    def __init__(self, request_timeout: float = STARTUP_REQUEST_TIMEOUT):
+        self.request_timeout = request_timeout
+        self.services: Dict[str, Any] = {}
+        self.timings: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.current_stage: Optional[str] = None
+        self.started_at: Optional[str] = None
+        self.ready_at: Optional[str] = None
+
+        self._stages: List[Tuple[str, Callable[[], Any]]] = []
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._created = time.perf_counter()
+
+    def add_import(self, module_name: str):
+        """Import a module as its own timed stage"""
+        self._stages.append((f"import {module_name}", lambda: importlib.import_module(module_name)))
+
+    def add_service(self, name: str, factory: Callable[["ServiceRegistry"], Any]):
+        """Build a service; the factory can use services built by earlier stages"""
+        def build():
+            self.services[name] = factory(self)
+        self._stages.append((name, build))
+
+    def start(self):
+        """Start warming in the background (idempotent)"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.started_at = datetime.now().isoformat()
+            self._thread = threading.Thread(target=self._warm, name="service-warmup", daemon=True)
+            self._thread.start()
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Any:
+        """Return a service, waiting for warm-up up to the request timeout"""
+        if not self._ready.is_set():
+            self.start()
+            self._ready.wait(self.request_timeout if timeout is None else timeout)
+        if self.error:
+            raise ServiceNotReady(f"Startup failed: {self.error}")
+        if name not in self.services:
+            raise ServiceNotReady(f"'{name}' is still warming up (stage: {self.current_stage})")
+        return self.services[name]
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set() and self.error is None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'stage': self.current_stage,
+            'error': self.error,
+            'started_at': self.started_at,
+            'ready_at': self.ready_at,
+            'stages': list(self.timings),
+            'total_seconds': round(sum(t['seconds'] for t in self.timings), 3)
+        }
+
+    def _warm(self):
+        print(f"🔥 Warming {len(self._stages)} startup stages in the background...")
+        for stage, build in self._stages:
+            self.current_stage = stage
+            started = time.perf_counter()
+            try:
+                build()
+            except Exception as e:
+                self.error = f"{stage}: {e}"
+                print(f"❌ Startup stage '{stage}' failed: {e}")
+                break
+            finally:
+                self.timings.append({'stage': stage, 'seconds': round(time.perf_counter() - started, 3)})
+
+        self.current_stage = None
+        self.ready_at = datetime.now().isoformat()
+        self._ready.set()
+        if not self.error:
+            print(f"✅ Services ready {time.perf_counter() - self._created:.2f}s after launch")
@@ -0,0 +1,310 @@
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+from config.settings import SHARD_ROOT, SHARD_SNAPSHOT_ROOT, SHARD_MAX_OPEN, SHARD_IDLE_SECONDS
+from src.npc_storage import NPCStorage
+
+SHARD_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+FICLONE = 0x40049409  # Linux ioctl: share extents with the source file (btrfs, XFS, ...)
+
+def clone_file(src: str, dst: str) -> bool:
+    """Copy-on-write clone where the filesystem supports it, plain copy otherwise.
+
+    Returns True when the file was reflinked.
+    """
+    try:
+        import fcntl
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except (ImportError, OSError):
+        shutil.copy2(src, dst)
+        return False
+
+def clone_tree(src: str, dst: str) -> Dict[str, int]:
+    """Clone a directory tree file by file; returns how many files were reflinked/copied"""
+    counts = {'reflinked': 0, 'copied': 0}
+    for directory, _, files in os.walk(src):
+        target_dir = os.path.join(dst, os.path.relpath(directory, src))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in files:
+            if clone_file(os.path.join(directory, name), os.path.join(target_dir, name)):
+                counts['reflinked'] += 1
+            else:
+                counts['copied'] += 1
+    return counts
+
+class Shard:
+    def __init__(self, shard_id: str, storage: NPCStorage, services: Dict[str, Any]):
+        self.shard_id = shard_id
+        self.storage = storage
+        self.services = services
+        self.users = 0
+        self.last_used = time.monotonic()
+
+class ShardManager:
+    """NPC storage sharded per world or save slot.
+
+    Each shard is its own NPCStorage (Chroma indexes + record store) under
+    SHARD_ROOT/<shard_id>, opened on first use. At most ``max_open`` shards stay
+    open; the least recently used idle one is closed to make room, and a
+    background sweep closes shards idle for ``idle_seconds``. Snapshots are
+    file-level clones of a closed shard, reflinked where the filesystem allows,
+    so saving or loading a game is a directory clone rather than a re-index.
+
+    ``on_open(storage)`` builds per-shard services (engine, generator...) that
+    live and die with the shard.
+    """
+
+    def __init__(self, root: str = SHARD_ROOT,
+                 snapshot_root: str = SHARD_SNAPSHOT_ROOT,
+                 max_open: int = SHARD_MAX_OPEN,
+                 idle_seconds: float = SHARD_IDLE_SECONDS,
+                 on_open: Optional[Callable[[NPCStorage], Dict[str, Any]]] = None):
+        self.root = root
+        self.snapshot_root = snapshot_root
+        self.max_open = max(1, max_open)
+        self.idle_seconds = idle_seconds
+        self.on_open = on_open
+
+        self._open: "OrderedDict[str, Shard]" = OrderedDict()
+        self._lock = threading.Condition()
+        self._transitioning = set()  # shards being opened, closed or cloned
+        self._stop = threading.Event()
+        if idle_seconds > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="shard-sweeper", daemon=True)
+            self._sweeper.start()
+
+    # ------------------------------------------------------------- Access
+
+    @contextmanager
+    def use(self, shard_id: str):
+        """Borrow an open shard; it cannot be closed while borrowed"""
+        shard = self._checkout(shard_id)
+        try:
+            yield shard
+        finally:
+            with self._lock:
+                shard.users -= 1
+                shard.last_used = time.monotonic()
+                self._lock.notify_all()
+
+    def list_shards(self) -> List[Dict[str, Any]]:
+        shard_ids = sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []
+        with self._lock:
+            open_ids = set(self._open)
+        return [
+            {'shard_id': shard_id, 'open': shard_id in open_ids, 'snapshots': self.list_snapshots(shard_id)}
+            for shard_id in shard_ids if SHARD_ID_PATTERN.match(shard_id)
+        ]
+
+    def memory_usage(self) -> Dict[str, Any]:
+        """Footprint of every open shard's storage and services"""
+        with self._lock:
+            shards = list(self._open.values())
+        report = {}
+        for shard in shards:
+            try:
+                usage = {'users': shard.users, 'storage': shard.storage.memory_usage()}
+                for name, service in shard.services.items():
+                    if name != 'storage' and hasattr(service, 'memory_usage'):
+                        usage[name] = service.memory_usage()
+            except Exception as e:
+                usage = {'error': str(e)}  # closed underneath us by eviction
+            report[shard.shard_id] = usage
+        return {'open': len(shards), 'max_open': self.max_open, 'shards': report}
+
+    def close(self, shard_id: str):
+        """Close a shard once nobody is using it"""
+        with self._exclusive(shard_id):
+            pass
+
+    def close_all(self):
+        self._stop.set()
+        for shard_id in list(self._open):
+            self.close(shard_id)
+
+    # ---------------------------------------------------------- Snapshots
+
+    def snapshot(self, shard_id: str, name: Optional[str] = None) -> Dict[str, Any]:
+        """Clone the shard's files into a named snapshot"""
+        self._validate(shard_id)
+        name = name or datetime.now().strftime("snap_%Y%m%d_%H%M%S")
+        self._validate(name)
+        source = self._shard_dir(shard_id)
+        if not os.path.isdir(source):
+            raise ValueError(f"Shard '{shard_id}' does not exist")
+        target = self._snapshot_dir(shard_id, name)
+        if os.path.exists(target):
+            raise ValueError(f"Snapshot '{name}' already exists for shard '{shard_id}'")
+
+        started = time.perf_counter()
+        # Cloned under a hidden name and renamed into place, so a failure midway
+        # (ENOSPC...) never leaves a partial snapshot that could be restored
+        staging = os.path.join(os.path.dirname(target), f".tmp-{uuid.uuid4().hex[:8]}")
+        with self._exclusive(shard_id):
+            try:
+                counts = clone_tree(source, staging)
+                os.replace(staging, target)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+        return {'shard_id': shard_id, 'snapshot': name,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 1), **counts}
+
+    def restore(self, shard_id: str, name: str) -> Dict[str, Any]:
+        """Replace the shard's files with a snapshot (the snapshot itself is kept)"""
+        self._validate(shard_id)
+        self._validate(name)
+        source = self._snapshot_dir(shard_id, name)
+        if not os.path.isdir(source):
+            raise ValueError(f"Snapshot '{name}' not found for shard '{shard_id}'")
+
+        started = time.perf_counter()
+        target = self._shard_dir(shard_id)
+        with self._exclusive(shard_id):
+            staging = f"{target}.restore-{uuid.uuid4().hex[:8]}"
+            try:
+                counts = clone_tree(source, staging)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            trash = None
+            if os.path.exists(target):
+                trash = f"{target}.old-{uuid.uuid4().hex[:8]}"
+                os.replace(target, trash)
+            os.replace(staging, target)
+        if trash:
+            shutil.rmtree(trash, ignore_errors=True)
+        return {'shard_id': shard_id, 'snapshot': name,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 1), **counts}
+
+    def list_snapshots(self, shard_id: str) -> List[str]:
+        directory = os.path.join(self.snapshot_root, shard_id)
+        if not os.path.isdir(directory):
+            return []
+        # Skips .tmp-* staging directories (in progress, or left by a crash)
+        return sorted(name for name in os.listdir(directory) if SHARD_ID_PATTERN.match(name))
+
+    def delete_snapshot(self, shard_id: str, name: str):
+        self._validate(shard_id)
+        self._validate(name)
+        shutil.rmtree(self._snapshot_dir(shard_id, name))
+
+    # ------------------------------------------------------------ Helpers
+
+    def _checkout(self, shard_id: str) -> Shard:
+        self._validate(shard_id)
+        with self._lock:
+            while shard_id in self._transitioning:
+                self._lock.wait()  # another thread is opening, closing or cloning it
+            shard = self._open.get(shard_id)
+            if shard is not None:
+                self._open.move_to_end(shard_id)
+                shard.users += 1
+                return shard
+            self._transitioning.add(shard_id)
+
+        try:
+            storage = NPCStorage(data_dir=self._shard_dir(shard_id))
+            try:
+                services = self.on_open(storage) if self.on_open else {}
+            except Exception:
+                storage.close()
+                raise
+        except Exception:
+            with self._lock:
+                self._transitioning.discard(shard_id)
+                self._lock.notify_all()
+            raise
+
+        shard = Shard(shard_id, storage, services)
+        shard.users = 1
+        with self._lock:
+            self._transitioning.discard(shard_id)
+            self._open[shard_id] = shard
+            evicted = self._evict_locked()
+            self._lock.notify_all()
+        self._close_shards(evicted)
+        print(f"🗂️ Opened shard '{shard_id}' ({len(self._open)}/{self.max_open} open)")
+        return shard
+
+    def _evict_locked(self) -> List[Shard]:
+        """Pop least recently used idle shards beyond max_open (caller holds the lock)"""
+        evicted = []
+        for shard_id in list(self._open):
+            if len(self._open) <= self.max_open:
+                break
+            shard = self._open[shard_id]
+            if shard.users == 0:
+                evicted.append(self._open.pop(shard_id))
+                self._transitioning.add(shard_id)
+        return evicted
+
+    @contextmanager
+    def _exclusive(self, shard_id: str):
+        """Close the shard and keep it from reopening while its files are cloned"""
+        with self._lock:
+            while shard_id in self._transitioning:
+                self._lock.wait()
+            self._transitioning.add(shard_id)
+            # Borrowers already inside finish first; new ones wait on _transitioning
+            while shard_id in self._open and self._open[shard_id].users:
+                self._lock.wait()
+            shard = self._open.pop(shard_id, None)
+        try:
+            if shard is not None:
+                self._close_shard(shard)
+            yield
+        finally:
+            with self._lock:
+                self._transitioning.discard(shard_id)
+                self._lock.notify_all()
+
+    def _close_shards(self, shards: List[Shard]):
+        """Close shards popped by eviction/sweep, then let waiters reopen them"""
+        for shard in shards:
+            try:
+                self._close_shard(shard)
+            except Exception as e:
+                print(f"⚠️ Closing shard '{shard.shard_id}' failed: {e}")
+            finally:
+                with self._lock:
+                    self._transitioning.discard(shard.shard_id)
+                    self._lock.notify_all()
+
+    def _close_shard(self, shard: Shard):
+        for service in shard.services.values():
+            stop = getattr(service, 'stop_background', None)
+            if stop:
+                stop()
+        shard.storage.close()
+        print(f"🗂️ Closed shard '{shard.shard_id}'")
+
+    def _sweep_loop(self):
+        while not self._stop.wait(min(60.0, self.idle_seconds)):
+            cutoff = time.monotonic() - self.idle_seconds
+            with self._lock:
+                idle = [sid for sid, shard in self._open.items() if shard.users == 0 and shard.last_used < cutoff]
+                closing = [self._open.pop(sid) for sid in idle]
+                self._transitioning.update(idle)
+            self._close_shards(closing)
+
+    def _validate(self, name: str):
+        if not SHARD_ID_PATTERN.match(name or ""):
+            raise ValueError(f"Invalid shard/snapshot name '{name}' (letters, digits, _ and - only)")
+
+    def _shard_dir(self, shard_id: str) -> str:
+        return os.path.join(self.root, shard_id)
+
+    def _snapshot_dir(self, shard_id: str, name: str) -> str:
+        return os.path.join(self.snapshot_root, shard_id, name)
@@ -0,0 +1,65 @@
+import json
+import re
+import threading
+import time
+from typing import Dict, Any, Iterator
+
+# Path segments that are ids, so /get_npc_summary/npc_1a2b groups under one endpoint
+_ID_SEGMENT = re.compile(r"/npc_[0-9a-f]+")
+
+def endpoint_name(method: str, path: str) -> str:
+    """Group key for reports, e.g. 'GET /get_npc_summary/<npc_id>'"""
+    return f"{method} {_ID_SEGMENT.sub('/<npc_id>', path)}"
+
+class TraceRecorder:
+    """Appends one JSON line per request: arrival offset, request and outcome.
+
+    The npc_id returned by /create_npc is kept so a replay can map the ids it
+    creates onto the ones used later in the trace. Flask is imported lazily so
+    the replay tool can read traces without it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def install(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        print(f"📼 Recording request trace to {self.path}")
+
+    def _before(self):
+        from flask import g
+        g.trace_started = time.monotonic()
+
+    def _after(self, response):
+        from flask import request, g
+        started = getattr(g, 'trace_started', None)
+        if started is None:
+            return response
+        body = response.get_json(silent=True) if response.is_json else None
+        entry = {
+            'offset': round(started - self._started, 4),
+            'method': request.method,
+            'path': request.path,
+            'query': request.query_string.decode("utf-8"),
+            'body': request.get_json(silent=True),
+            'status': response.status_code,
+            'success': body.get('success') if isinstance(body, dict) else None,
+            'duration_ms': round((time.monotonic() - started) * 1000, 1)
+        }
+        if isinstance(body, dict) and body.get('npc_id'):
+            entry['created_npc_id'] = body['npc_id']
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+        return response
+
+def read_trace(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
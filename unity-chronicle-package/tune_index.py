@@ -0,0 +1,167 @@
+"""Measure recall@k and query latency of the NPC vector indexes.
+
+Pulls the stored embeddings out of a live collection, computes exact
+neighbours with brute-force NumPy search, then:
+  * times and scores the live collection as it is configured today, and
+  * rebuilds the vectors into scratch in-memory collections for every
+    combination of M / construction_ef / search_ef given on the command line.
+
+Example:
+    python tune_index.py --collection npc_dialogues --k 10 --M 8,16,32 --search-ef 10,50,100
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import uuid
+
+# Disable ChromaDB telemetry FIRST
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+import chromadb
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+from config.settings import NPC_DATA_DIR
+
+COLLECTIONS = {
+    "npc_characters": "npcs",
+    "npc_dialogues": "dialogues"
+}
+
+def parse_int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+def load_vectors(collection, sample: int):
+    """Read up to ``sample`` stored ids and embeddings from a collection"""
+    results = collection.get(include=["embeddings"], limit=sample)
+    return results["ids"], np.asarray(results["embeddings"], dtype=np.float32)
+
+def brute_force_neighbours(base: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Exact top-k neighbour indices into ``base`` for every query"""
+    if space == "cosine":
+        base = base / np.linalg.norm(base, axis=1, keepdims=True).clip(min=1e-12)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True).clip(min=1e-12)
+        distances = -queries @ base.T
+    elif space == "ip":
+        distances = -queries @ base.T
+    else:
+        distances = (
+            (queries ** 2).sum(axis=1, keepdims=True)
+            - 2 * queries @ base.T
+            + (base ** 2).sum(axis=1)[None, :]
+        )
+
+    k = min(k, base.shape[0])
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+def measure(collection, queries: np.ndarray, truth_ids, k: int) -> dict:
+    """Recall@k and per-query latency of a Chroma collection"""
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth_ids):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(set(result["ids"][0]) & set(expected))
+
+    latencies = np.asarray(latencies)
+    return {
+        "recall": round(hits / (len(truth_ids) * k), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "qps": round(len(latencies) / (latencies.sum() / 1000), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune HNSW settings for NPC collections")
+    parser.add_argument("--collection", choices=sorted(COLLECTIONS), default="npc_dialogues")
+    parser.add_argument("--data-dir", default=NPC_DATA_DIR)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="held-out query vectors")
+    parser.add_argument("--sample", type=int, default=50000, help="max vectors pulled from the live collection")
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], help="defaults to the live collection's space")
+    parser.add_argument("--M", type=parse_int_list, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=parse_int_list, default=[100, 200])
+    parser.add_argument("--search-ef", type=parse_int_list, default=[10, 50, 100])
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=os.path.join(args.data_dir, COLLECTIONS[args.collection]))
+    live = client.get_collection(args.collection)
+    live_settings = {k: v for k, v in (live.metadata or {}).items() if k.startswith("hnsw:")}
+    space = args.space or live_settings.get("hnsw:space", "l2")
+
+    total = live.count()
+    live_ids, vectors = load_vectors(live, args.sample)
+    if len(vectors) <= args.k + 1:
+        print(f"❌ '{args.collection}' only has {len(vectors)} vectors - nothing to tune")
+        return
+
+    print(f"📐 {args.collection}: {total} vectors, dim {vectors.shape[1]}, space {space}")
+    print(f"   Live settings: {live_settings or 'Chroma defaults'}")
+
+    rng = np.random.default_rng(42)
+    n_queries = min(args.queries, len(vectors) // 10 or 1)
+    query_idx = rng.choice(len(vectors), size=n_queries, replace=False)
+    queries = vectors[query_idx]
+    base = np.delete(vectors, query_idx, axis=0)
+    base_ids = [f"v{i}" for i in range(len(base))]
+
+    started = time.perf_counter()
+    truth = brute_force_neighbours(base, queries, args.k, space)
+    brute_ms = (time.perf_counter() - started) * 1000 / n_queries
+    truth_ids = [[base_ids[i] for i in row] for row in truth]
+    print(f"   Brute-force NumPy: {brute_ms:.3f} ms/query over {len(base)} vectors")
+
+    results = []
+
+    # Live collection, as configured today (only exact when we pulled every vector)
+    if total <= args.sample:
+        full_truth = brute_force_neighbours(vectors, queries, args.k, space)
+        live_truth = [[live_ids[i] for i in row] for row in full_truth]
+        row = {"config": "live", **live_settings, **measure(live, queries, live_truth, args.k)}
+        results.append(row)
+    else:
+        print(f"⚠️ Live collection larger than --sample ({args.sample}); skipping live recall")
+
+    # Scratch rebuilds for each candidate configuration
+    scratch = chromadb.EphemeralClient()
+    for m, construction_ef, search_ef in itertools.product(args.M, args.construction_ef, args.search_ef):
+        settings = {
+            "hnsw:space": space,
+            "hnsw:M": m,
+            "hnsw:construction_ef": construction_ef,
+            "hnsw:search_ef": search_ef
+        }
+        name = f"tune_{uuid.uuid4().hex[:8]}"
+        collection = scratch.create_collection(name, metadata=settings)
+
+        started = time.perf_counter()
+        batch = 5000
+        for i in range(0, len(base), batch):
+            collection.add(ids=base_ids[i:i + batch], embeddings=base[i:i + batch].tolist())
+        build_s = time.perf_counter() - started
+
+        row = {"config": "candidate", **settings, "build_s": round(build_s, 2),
+               **measure(collection, queries, truth_ids, args.k)}
+        results.append(row)
+        scratch.delete_collection(name)
+
+    print(f"\n{'config':<10} {'M':>4} {'c_ef':>6} {'s_ef':>6} {'recall@' + str(args.k):>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'qps':>8} {'build s':>8}")
+    for row in results:
+        print(f"{row['config']:<10} {row.get('hnsw:M', '-'):>4} {row.get('hnsw:construction_ef', '-'):>6} "
+              f"{row.get('hnsw:search_ef', '-'):>6} {row['recall']:>10} {row['p50_ms']:>8} "
+              f"{row['p95_ms']:>8} {row['qps']:>8} {row.get('build_s', '-'):>8}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"collection": args.collection, "k": args.k, "results": results}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -73,6 +73,11 @@ public class DialogueGeneratorWindow : EditorWindow
     private string generatedDialogue = "";
     private string currentNpcId = ""; // Store the current NPC ID for dialogue generation
 
+    // Pre-baked lines (see bake_dialogue.py); looked up before calling the server
+    private TextAsset bakedDialogueAsset;
+    private BakedDialogueTable bakedDialogue;
+    private bool useBakedDialogue = true;
+
 
     [MenuItem("Tools/NPC Dialogue Generator")]
     public static void ShowWindow()
@@ -102,6 +107,16 @@ public class DialogueGeneratorWindow : EditorWindow
         scrollPos = EditorGUILayout.BeginScrollView(scrollPos);
         GUILayout.Label("NPC Dialogue Generator", EditorStyles.boldLabel);
         npcRegistry = (NPCRegistrySO)EditorGUILayout.ObjectField("NPC Registry", npcRegistry, typeof(NPCRegistrySO), false);
+        var asset = (TextAsset)EditorGUILayout.ObjectField("Baked Dialogue", bakedDialogueAsset, typeof(TextAsset), false);
+        if (asset != bakedDialogueAsset)
+        {
+            bakedDialogueAsset = asset;
+            bakedDialogue = BakedDialogueTable.Load(bakedDialogueAsset);
+        }
+        if (bakedDialogue != null)
+        {
+            useBakedDialogue = EditorGUILayout.Toggle("Use Baked Lines First", useBakedDialogue);
+        }
         DrawSection("CHARACTER PROFILE", () =>
         {
             npcName = TextField("Name", npcName);
@@ -199,6 +214,20 @@ public class DialogueGeneratorWindow : EditorWindow
         string npcId = currentNpcId;
         string playerInput = _player_input;
 
+        if (useBakedDialogue && bakedDialogue != null &&
+            bakedDialogue.TryGetLine(npcId,
+                                     dialogueTypeOptions[dialogueTypeIndex],
+                                     dialogueStageOptions[dialogueStageIndex],
+                                     moodOptions[moodIndex],
+                                     playerReputationOptions[playerReputationIndex],
+                                     playerInput,
+                                     out string bakedLine))
+        {
+            generatedDialogue = bakedLine;
+            Repaint();
+            return;
+        }
+
         var requestData = new Dictionary<string, object> {
         { "npc_id", npcId },
         { "player_input", playerInput },
@@ -0,0 +1,104 @@
+using UnityEngine;
+using System.Collections.Generic;
+
+// Lookup over the asset written by bake_dialogue.py.
+// Contexts are resolved to "type.stage.mood.reputation" index keys locally.
+// A baked line answers only the canned player prompt it was generated for (or
+// no input at all); anything else the player types still goes to /talk_to_npc.
+public class BakedDialogueTable
+{
+    private static readonly string[] Axes = { "dialogue_type", "dialogue_stage", "mood", "player_reputation" };
+
+    private readonly List<Dictionary<string, int>> axisIndex = new List<Dictionary<string, int>>();
+    private readonly List<object> strings;
+    private readonly Dictionary<string, object> npcs;
+    private readonly Dictionary<string, object> playerPrompts;
+    private readonly System.Random random = new System.Random();
+
+    public int NpcCount => npcs != null ? npcs.Count : 0;
+    public int LineCount => strings != null ? strings.Count : 0;
+
+    private BakedDialogueTable(Dictionary<string, object> root)
+    {
+        var axes = root["axes"] as Dictionary<string, object>;
+        foreach (var axis in Axes)
+        {
+            var lookup = new Dictionary<string, int>(System.StringComparer.OrdinalIgnoreCase);
+            var values = axes[axis] as List<object>;
+            for (int i = 0; i < values.Count; i++)
+            {
+                lookup[values[i].ToString()] = i;
+            }
+            axisIndex.Add(lookup);
+        }
+
+        strings = root["strings"] as List<object>;
+        npcs = root["npcs"] as Dictionary<string, object>;
+        // Older assets have no prompts; they only answer empty input
+        playerPrompts = root.ContainsKey("player_prompts")
+            ? root["player_prompts"] as Dictionary<string, object>
+            : null;
+    }
+
+    public static BakedDialogueTable Load(TextAsset asset)
+    {
+        if (asset == null) return null;
+
+        var root = MiniJSON.Json.Deserialize(asset.text) as Dictionary<string, object>;
+        if (root == null || !root.ContainsKey("axes"))
+        {
+            Debug.LogWarning("Baked dialogue asset is not in the expected format.");
+            return null;
+        }
+        return new BakedDialogueTable(root);
+    }
+
+    public bool TryGetLine(string npcId, string dialogueType, string dialogueStage,
+                           string mood, string playerReputation, string playerInput, out string line)
+    {
+        line = null;
+        if (!IsCannedInput(dialogueType, playerInput)) return false;
+        if (npcs == null || !npcs.TryGetValue(npcId, out var npcObj)) return false;
+
+        string key = BuildKey(dialogueType, dialogueStage, mood, playerReputation);
+        if (key == null) return false;
+
+        var lines = (npcObj as Dictionary<string, object>)["lines"] as Dictionary<string, object>;
+        if (!lines.TryGetValue(key, out var variantsObj)) return false;
+
+        var variants = variantsObj as List<object>;
+        if (variants == null || variants.Count == 0) return false;
+
+        int stringIdx = System.Convert.ToInt32(variants[random.Next(variants.Count)]);
+        line = strings[stringIdx].ToString();
+        return true;
+    }
+
+    // True when the player said nothing or exactly the prompt the lines were baked for
+    private bool IsCannedInput(string dialogueType, string playerInput)
+    {
+        if (string.IsNullOrWhiteSpace(playerInput)) return true;
+        if (playerPrompts == null || dialogueType == null) return false;
+
+        foreach (var entry in playerPrompts)
+        {
+            if (string.Equals(entry.Key, dialogueType, System.StringComparison.OrdinalIgnoreCase))
+            {
+                return string.Equals(entry.Value?.ToString().Trim(), playerInput.Trim(),
+                                     System.StringComparison.OrdinalIgnoreCase);
+            }
+        }
+        return false;
+    }
+
+    private string BuildKey(params string[] values)
+    {
+        var parts = new string[values.Length];
+        for (int i = 0; i < values.Length; i++)
+        {
+            if (values[i] == null || !axisIndex[i].TryGetValue(values[i], out int idx)) return null;
+            parts[i] = idx.ToString();
+        }
+        return string.Join(".", parts);
+    }
+}